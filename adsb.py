@@ -0,0 +1,175 @@
+# ============================================================
+# adsb.py
+# Flight data providers for readsb-style JSON:
+#
+# - "adsb_api": an ADS-B Exchange v2 style point query
+#     GET /v2/lat/<lat>/lon/<lon>/dist/<nm>/  ->  {"ac": [...]}
+#   (api.adsb.lol by default; ADSBx itself via RapidAPI with a key)
+# - "local": dump1090-fa / readsb aircraft.json on the LAN
+#     GET /tar1090/data/aircraft.json  ->  {"aircraft": [...]}
+#   plain HTTP, no rate limit, refreshed every second
+#
+# Both lists are scanned one aircraft at a time into a scratch
+# record; the airborne one nearest the centre of the bounds box
+# is copied to flights.rec. There is no details call: the route
+# is not in these feeds, so the display shows registration and
+# type instead (plus operator/description when the feed has them).
+# ============================================================
+
+import math
+
+import flights
+import jsonscan
+import tracing
+from jsonscan import key, EV_VALUE, EV_OPEN, EV_CLOSE
+
+NAME = "adsb_api"
+HAS_DETAILS = False
+
+API_HOST = "api.adsb.lol"
+LOCAL_PATH = "/tar1090/data/aircraft.json"
+MAX_SEEN_POS = 30  # seconds; older positions are stale
+
+search = None
+_box = None
+
+def _radius_nm(box):
+    """Smallest circle (nm) around the box centre that holds the box."""
+    lat = (box[0] + box[1]) / 2 / 10 ** flights.SCALE
+    half_h = (box[0] - box[1]) / 2 / 10 ** flights.SCALE * 60
+    half_w = (box[3] - box[2]) / 2 / 10 ** flights.SCALE * 60 * math.cos(lat * math.pi / 180)
+    return max(1, int(math.sqrt(half_h * half_h + half_w * half_w)) + 1)
+
+def configure_api(bounds_box, host=API_HOST, api_key=None, port=443, tls=True, search_box=None):
+    """search_box (predict.py) widens the query; the pick stays inside bounds_box."""
+    global NAME, search, _box
+    NAME = "adsb_api"
+    _box = flights.parse_box(bounds_box)
+    area = flights.parse_box(search_box) if search_box else _box
+    path = ("/v2/lat/", flights.fmt_fixed((_box[0] + _box[1]) // 2),
+            "/lon/", flights.fmt_fixed((_box[2] + _box[3]) // 2),
+            "/dist/", str(_radius_nm(area)), "/")
+    headers = b"Accept: application/json\r\n"
+    if api_key:
+        headers += b"X-RapidAPI-Key: " + api_key.encode() + b"\r\nX-RapidAPI-Host: " + host.encode() + b"\r\n"
+    search = (host, path, port, tls, headers, tracing.EP_ADSB_API)
+
+def configure_local(bounds_box, host, port=80, path=LOCAL_PATH, search_box=None):
+    """aircraft.json has everything the receiver hears; search_box changes nothing."""
+    global NAME, search, _box
+    NAME = "local"
+    _box = flights.parse_box(bounds_box)
+    search = (host, path, port, False, b"Accept: application/json\r\n", tracing.EP_LOCAL_FEED)
+
+_K_AC = key("ac")
+_K_AIRCRAFT = key("aircraft")
+_K_HEX = key("hex")
+_K_FLIGHT = key("flight")
+_K_REG = key("r")
+_K_TYPE = key("t")
+_K_DESC = key("desc")
+_K_OWNOP = key("ownOp")
+_K_LAT = key("lat")
+_K_LON = key("lon")
+_K_ALT_BARO = key("alt_baro")
+_K_ALTITUDE = key("altitude")  # older dump1090
+_K_GS = key("gs")
+_K_SPEED = key("speed")        # older dump1090
+_K_TRACK = key("track")
+_K_SEEN_POS = key("seen_pos")
+
+_cand = None  # flights.cand (an arena slot), picked up by search_begin()
+_skip = False  # on the ground or stale position
+_best = 0
+_found = False
+aircraft_seen = 0
+
+def _in_list():
+    k = jsonscan.at(0)
+    return k == _K_AC or k == _K_AIRCRAFT
+
+def _on_search(ev):
+    global _skip, _best, _found, aircraft_seen
+    d = jsonscan.depth
+    if ev == EV_VALUE:
+        if d != 3 or not _in_list():
+            return
+        k = jsonscan.at(2)
+        r = _cand
+        if k == _K_LAT:
+            flights.put_num(r, flights.N_LAT, flights.SCALE)
+        elif k == _K_LON:
+            flights.put_num(r, flights.N_LON, flights.SCALE)
+        elif k == _K_ALT_BARO or k == _K_ALTITUDE:
+            if jsonscan.value_kind == jsonscan.T_STR:
+                _skip = True  # "ground"
+            else:
+                flights.put_num(r, flights.N_ALT)
+        elif k == _K_GS or k == _K_SPEED:
+            flights.put_num(r, flights.N_SPEED)
+        elif k == _K_TRACK:
+            flights.put_num(r, flights.N_TRACK)
+        elif k == _K_HEX:
+            flights.put(r, flights.F_ID)
+        elif k == _K_FLIGHT:
+            flights.put(r, flights.F_CALLSIGN)
+        elif k == _K_REG:
+            flights.put(r, flights.F_REG)
+        elif k == _K_TYPE:
+            flights.put(r, flights.F_TYPE)
+        elif k == _K_DESC:
+            flights.put(r, flights.F_MODEL)
+        elif k == _K_OWNOP:
+            flights.put(r, flights.F_AIRLINE)
+        elif k == _K_SEEN_POS:
+            v = jsonscan.number()
+            if v is not None and v > MAX_SEEN_POS:
+                _skip = True
+    elif ev == EV_OPEN:
+        if d == 2 and _in_list():
+            flights.clear(_cand)
+            _skip = False
+    elif ev == EV_CLOSE:
+        if d == 2 and _in_list():
+            aircraft_seen += 1
+            nums = _cand[2]
+            lat = nums[flights.N_LAT]
+            lon = nums[flights.N_LON]
+            if _skip or lat == flights.NO_VALUE or lon == flights.NO_VALUE:
+                return
+            flights.seen(_cand)
+            if not flights.in_box(_box, lat, lon):
+                return
+            dist = flights.box_distance(_box, lat, lon)
+            if not _found or dist < _best:
+                flights.copy(flights.rec, _cand)
+                _best = dist
+                _found = True
+
+def search_begin():
+    global _cand, _found, aircraft_seen
+    _cand = flights.cand
+    _found = False
+    aircraft_seen = 0
+    jsonscan.begin(_on_search)
+
+def search_sink(mv):
+    jsonscan.feed(mv)
+    return False  # the nearest one can be anywhere in the list
+
+def search_end(status):
+    if status != 200 or not _found or not flights.has(flights.rec, flights.F_ID):
+        return False
+    return flights.text(flights.rec, flights.F_ID)
+
+def details_target(fid):
+    return None
+
+def details_begin(r=None):
+    pass
+
+def details_sink(mv):
+    return True
+
+def details_end(status):
+    return True
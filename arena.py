@@ -0,0 +1,97 @@
+# ============================================================
+# arena.py
+# One memory arena allocated at boot and never freed
+#
+# - Shared region at offset 0: the HTTP body buffer (json_bytes),
+#   used by whichever mode is running
+# - Mode region after it: enter() rewinds a bump pointer, then the
+#   mode takes its buffers and record slots from it (modes.py)
+# - Switching modes reuses the same bytes, so the big blocks never
+#   go back to the heap to be fragmented
+# ============================================================
+
+import gc
+
+buf = None  # the arena itself (bytearray, so .find() works on the body)
+_mv = None
+_size = 0
+_base = 0  # end of the shared region
+_top = 0
+_limit = 0  # end of the current mode's budget
+_mode = None
+largest = 0  # last largest_free_block() result
+
+def init(size, shared):
+    """Allocate the arena once; the first `shared` bytes are common to all modes."""
+    global buf, _mv, _size, _base, _top, _limit
+    if buf is not None:
+        return
+    if shared > size:
+        raise ValueError("arena: shared region larger than arena")
+    gc.collect()
+    buf = bytearray(size)
+    _mv = memoryview(buf)
+    _size = size
+    _base = _top = shared
+    _limit = size
+
+def shared():
+    """memoryview of the shared region."""
+    return _mv[0:_base]
+
+def enter(mode, budget=None):
+    """Start a mode: every region taken by the previous mode is reclaimed.
+
+    budget caps how many mode-region bytes this mode may take.
+    """
+    global _top, _limit, _mode
+    _top = _base
+    _limit = _size if budget is None else min(_size, _base + budget)
+    _mode = mode
+
+def take_at(n):
+    """Take n bytes from the current mode's region; returns their offset in buf.
+
+    For users that need bytearray methods (.find()) on their bytes.
+    """
+    global _top
+    if _top + n > _limit:
+        raise MemoryError("arena: " + str(_mode) + " needs " + str(n) + ", " + str(_limit - _top) + " left")
+    start = _top
+    _top += n
+    return start
+
+def take(n):
+    """Take n bytes from the current mode's region as a memoryview."""
+    start = take_at(n)
+    return _mv[start:start + n]
+
+def mode():
+    return _mode
+
+def used():
+    return _top
+
+def free():
+    return _limit - _top
+
+def largest_free_block(limit=65536, step=64):
+    """Largest heap block that can be allocated right now (binary search probe).
+
+    The probes churn the heap they measure and can themselves run out:
+    call it at boot and on request (console "heap"), never from a loop.
+    """
+    global largest
+    gc.collect()
+    lo = 0
+    hi = limit
+    while hi - lo > step:
+        mid = (lo + hi) // 2
+        try:
+            bytearray(mid)
+            lo = mid
+        except MemoryError:
+            hi = mid
+    gc.collect()
+    largest = lo
+    return lo
@@ -0,0 +1,44 @@
+# ============================================================
+# bus511.py
+# 511 StopMonitoring response helpers (route names, ETAs)
+# (no hardware imports, so host tools can use it too)
+# ============================================================
+
+from timeutil import iso8601_to_epoch
+
+def norm_route(s):
+    if not s:
+        return ""
+    r = str(s).strip().upper().replace(" ", "")
+    if r.endswith("X"):
+        base = r[:-1]
+        if base.isdigit():
+            base = str(int(base))
+        return base + "X"
+    if r.isdigit():
+        return str(int(r))
+    return r
+
+def extract_etas_seconds(data, route, n=3):
+    sd = data["ServiceDelivery"]
+    resp_epoch = iso8601_to_epoch(sd["ResponseTimestamp"])
+    visits = sd["StopMonitoringDelivery"]["MonitoredStopVisit"]
+    if isinstance(visits, dict):
+        visits = [visits]
+    secs = []
+    for v in visits:
+        mvj = v["MonitoredVehicleJourney"]
+        if norm_route(mvj.get("LineRef", "")) != route:
+            continue
+        call = mvj.get("MonitoredCall", {})
+        t = call.get("ExpectedArrivalTime") or call.get("AimedArrivalTime")
+        if not t:
+            continue
+        eta = iso8601_to_epoch(t) - resp_epoch
+        if 0 <= eta <= 180 * 60:
+            secs.append(int(eta))
+    secs.sort()
+    out = secs[:n]
+    while len(out) < n:
+        out.append(None)
+    return out
@@ -3,6 +3,8 @@
 # - Starts in Program 2 (Flight) at boot
 # - UP: Bus mode (Program 1)
 # - DOWN: Flight mode (Program 2)
+# - default_mode = "combined" (128x32 / 64x64 panels): both on one
+#   screen, DOWN returns to it
 #
 # Bus:
 # - ONLY Route 1X inbound, one line, NO SCROLL
@@ -24,18 +26,33 @@ import displayio
 import framebufferio
 import rgbmatrix
 import terminalio
+import vectorio
 from adafruit_display_text import label
 
 import busio
 from digitalio import DigitalInOut, Direction, Pull
 import neopixel
 
+import microcontroller
 from microcontroller import watchdog as w
 from watchdog import WatchDogMode, WatchDogTimeout
 
 from adafruit_esp32spi import adafruit_esp32spi
-import adafruit_connection_manager
-import adafruit_requests
+
+import arena
+import console
+import eta_model
+import flights
+import http_client
+import modes
+import power
+import predict
+import schedule
+import sprites
+import telemetry
+import tracing
+from bus511 import extract_etas_seconds
+from timeutil import iso8601_to_epoch, get_pacific_hm_wday, fmt_pacific_time
 
 # -----------------------------
 # Watchdog (same as Program 2)
@@ -57,6 +74,16 @@ AGENCY = "SF"
 BOUNDS_BOX = os.getenv("bounds_box") or ""
 status_led_value = os.getenv("status_leds", "True").lower()
 USE_LEDS = status_led_value in ["true", "1", "yes", "on"]
+TELEMETRY_BREADCRUMBS = os.getenv("telemetry_breadcrumbs", "False").lower() in ["true", "1", "yes", "on"]
+tracing.set_enabled(os.getenv("trace", "False").lower() in ["true", "1", "yes", "on"])
+eta_model.enabled = os.getenv("eta_model", "True").lower() in ["true", "1", "yes", "on"]
+console.enabled = os.getenv("console", "True").lower() in ["true", "1", "yes", "on"]
+
+# -----------------------------
+# Crash telemetry: count this boot, print the crash ring
+# -----------------------------
+telemetry.boot(TELEMETRY_BREADCRUMBS)
+telemetry.dump()
 
 # -----------------------------
 # Buttons (UP/DOWN preferred, A/B fallback)
@@ -88,21 +115,33 @@ def down_pressed():
     return not btn_down.value
 
 # -----------------------------
-# Display setup (64x32)
+# Display setup (64x32 by default; chained 128x32 or 64x64 via settings.toml)
 # -----------------------------
+MATRIX_WIDTH = int(os.getenv("matrix_width", "64"))
+MATRIX_HEIGHT = int(os.getenv("matrix_height", "32"))
+MATRIX_BIT_DEPTH = int(os.getenv("matrix_bit_depth", "3"))
+MATRIX_TILE = int(os.getenv("matrix_tile", "1"))  # panels stacked vertically in the chain
+MATRIX_SERPENTINE = os.getenv("matrix_serpentine", "True").lower() in ["true", "1", "yes", "on"]
+
+_addr_pins = [board.MTX_ADDRA, board.MTX_ADDRB, board.MTX_ADDRC, board.MTX_ADDRD]
+if MATRIX_HEIGHT // MATRIX_TILE > 32:
+    _addr_pins.append(board.MTX_ADDRE)  # 1/32 scan panels (64 rows)
+
 displayio.release_displays()
 matrix = rgbmatrix.RGBMatrix(
-    width=64,
-    height=32,
-    bit_depth=3,
+    width=MATRIX_WIDTH,
+    height=MATRIX_HEIGHT,
+    bit_depth=MATRIX_BIT_DEPTH,
     rgb_pins=[
         board.MTX_R1, board.MTX_G1, board.MTX_B1,
         board.MTX_R2, board.MTX_G2, board.MTX_B2,
     ],
-    addr_pins=[board.MTX_ADDRA, board.MTX_ADDRB, board.MTX_ADDRC, board.MTX_ADDRD],
+    addr_pins=_addr_pins,
     clock_pin=board.MTX_CLK,
     latch_pin=board.MTX_LAT,
     output_enable_pin=board.MTX_OE,
+    tile=MATRIX_TILE,
+    serpentine=MATRIX_SERPENTINE,
 )
 display = framebufferio.FramebufferDisplay(matrix, auto_refresh=True)
 
@@ -140,26 +179,38 @@ def set_led_color(status_light, color_name):
     return False
 
 # -----------------------------
-# requests session (shared)
+# HTTP client (shared by both modes)
 # -----------------------------
-pool = None
-ssl_context = None
-requests = None
-
-def rebuild_requests():
-    global pool, ssl_context, requests
-    pool = adafruit_connection_manager.get_radio_socketpool(radio)
-    ssl_context = adafruit_connection_manager.get_radio_ssl_context(radio)
-    requests = adafruit_requests.Session(pool, ssl_context)
+http_client.init(radio, w.feed, power.sleep)
 
 # ============================================================
 # Shared reusable buffers (avoid allocations)
 # ============================================================
 
+def budget_ok(mode):
+    """True if the heap has room for one fetch + parse under mode's budget (modes.BUDGET)."""
+    gc.collect()
+    need = modes.BUDGET[mode][1]
+    free = gc.mem_free()
+    if free < need:
+        print("MEM: " + mode + " needs " + str(need) + " free, have " + str(free) + "; fetch deferred")
+        return False
+    return True
+
 json_size = 14336
-json_bytes = None  # allocated only while flight mode runs
+ARENA_SIZE = json_size + modes.REGION_SIZE  # + HTTP buffers and flight records (modes.py)
+json_bytes = None  # = arena.buf, set at boot; first json_size bytes hold every HTTP body
 json_bytes_len = 0
 
+def _fill_json_bytes(mv):
+    """http_client body callback: append the chunk to json_bytes."""
+    global json_bytes_len
+    n = len(mv)
+    if json_bytes_len + n > json_size:
+        raise ValueError("Exceeded max string size while parsing JSON")
+    json_bytes[json_bytes_len:json_bytes_len + n] = mv  # type: ignore
+    json_bytes_len += n
+
 # ============================================================
 # Program 2 (Flight)
 # ============================================================
@@ -177,21 +228,76 @@ NUM_LIGHT_GREEN = 0x66FF99
 PAUSE_BETWEEN_LABEL_SCROLLING = 3
 PLANE_SPEED = 0.04
 TEXT_SPEED = 0.04
+PLANE_HEADINGS = 16 if int(os.getenv("plane_headings", "8")) == 16 else 8
 
-FLIGHT_SEARCH_HEAD = "https://data-cloud.flightradar24.com/zones/fcgi/feed.js?bounds="
-FLIGHT_SEARCH_TAIL = "&faa=1&satellite=1&mlat=1&flarm=1&adsb=1&gnd=0&air=1&vehicles=0&estimated=0&maxage=14400&gliders=0&stats=0&ems=1&limit=1"
-FLIGHT_SEARCH_URL = FLIGHT_SEARCH_HEAD + BOUNDS_BOX + FLIGHT_SEARCH_TAIL
-FLIGHT_LONG_DETAILS_HEAD = "https://data-live.flightradar24.com/clickhandler/?flight="
-
-rheaders = {
-     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0",
-     "cache-control": "no-store, no-cache, must-revalidate, post-check=0, pre-check=0",
-     "accept": "application/json",
-     "Connection": "close"
-}
+# -----------------------------
+# Flight data provider (fr24, adsb_api or local); see flights.py
+# -----------------------------
+FLIGHT_PROVIDER = (os.getenv("flight_provider") or "fr24").lower()
+# "host:port" of tools/flight_mock.py: same provider, served over plain HTTP
+FLIGHT_MOCK = os.getenv("flight_mock") or ""
+
+# Predictive mode: search a larger box, dead-reckon who enters the
+# bounds box next, prefetch its details and show it on arrival
+PREDICT = os.getenv("predict", "False").lower() in ["true", "1", "yes", "on"]
+SEARCH_BOX = None
+if PREDICT:
+    SEARCH_BOX = predict.configure(BOUNDS_BOX, int(os.getenv("predict_box_scale", "3")),
+                                   int(os.getenv("predict_horizon", "120")))
+    flights.on_seen = predict.consider
+
+def _host_port(spec, default_port):
+    if ":" in spec:
+        host, port = spec.split(":")
+        return host, int(port)
+    return spec, default_port
+
+if FLIGHT_PROVIDER == "fr24":
+    import fr24 as provider
+    # flights per search; above 1 the one nearest the box centre is shown
+    _limit = int(os.getenv("flight_search_limit", "1"))
+    if FLIGHT_MOCK:
+        _h, _p = _host_port(FLIGHT_MOCK, 80)
+        provider.configure(BOUNDS_BOX, host=_h, details_host=_h, port=_p, tls=False,
+                           search_box=SEARCH_BOX, limit=_limit)
+    else:
+        provider.configure(BOUNDS_BOX, search_box=SEARCH_BOX, limit=_limit)
+elif FLIGHT_PROVIDER == "adsb_api":
+    import adsb as provider
+    if FLIGHT_MOCK:
+        _h, _p = _host_port(FLIGHT_MOCK, 80)
+        provider.configure_api(BOUNDS_BOX, host=_h, port=_p, tls=False, search_box=SEARCH_BOX)
+    else:
+        provider.configure_api(BOUNDS_BOX, host=os.getenv("adsb_api_host") or provider.API_HOST,
+                               api_key=os.getenv("adsb_api_key"), search_box=SEARCH_BOX)
+elif FLIGHT_PROVIDER == "local":
+    import adsb as provider
+    _h, _p = _host_port(FLIGHT_MOCK or os.getenv("local_feed_host") or "", 80)
+    if not _h:
+        raise RuntimeError("flight_provider = \"local\" needs local_feed_host in settings.toml")
+    provider.configure_local(BOUNDS_BOX, _h, _p, os.getenv("local_feed_path") or provider.LOCAL_PATH,
+                             search_box=SEARCH_BOX)
+else:
+    raise RuntimeError("unknown flight_provider: " + FLIGHT_PROVIDER)
+print("Flight provider: " + provider.NAME + " (" + provider.search[0] + ")")
+
+# latency spans for the render step go with the last fetch before it
+FLIGHT_RENDER_EP = tracing.EP_FR24_DETAILS if provider.HAS_DETAILS else provider.search[5]
+
+def flight_request(target, sink):
+    host, path, port, tls, headers, ep = target
+    return http_client.request(host, path, sink, tls=tls, headers=headers,
+                               timeout=12, ep=ep, port=port)
+
+# Width of the area the flight rows live in (whole panel, or half in combined mode)
+flight_width = display.width
 
 def should_exit_flight():
-    return up_pressed()
+    console.poll()
+    if up_pressed():
+        schedule.set_override("bus")
+        return True
+    return console.want_mode is not None
 
 # labels
 label1 = label.Label(FONT, color=ROW_ONE_COLOUR, text="")
@@ -240,33 +346,36 @@ planeBmp[1,4]=planeBmp[2,4]=planeBmp[3,4]=planeBmp[4,4]=planeBmp[5,4]=planeBmp[6
 planeBmp[1,5]=planeBmp[2,5]=planeBmp[3,5]=planeBmp[4,5]=planeBmp[5,5]=planeBmp[6,5]=planeBmp[7,5]=planeBmp[8,5]=planeBmp[9,5]=1
 planeBmp[9,6]=planeBmp[5,6]=planeBmp[4,6]=planeBmp[3,6]=1
 planeBmp[6,9]=planeBmp[6,8]=planeBmp[5,8]=planeBmp[4,7]=planeBmp[5,7]=planeBmp[6,7]=1
-planeTg = displayio.TileGrid(planeBmp, pixel_shader=planePalette)
-planeG = displayio.Group(x=display.width + 12, y=10)
+# every heading in one sheet, turned from the bitmap above once at boot
+planeSheet = displayio.Bitmap(sprites.SIZE * PLANE_HEADINGS, sprites.SIZE, 2)
+sprites.build_sheet(planeBmp, planeSheet, PLANE_HEADINGS)
+planeBmp = None
+planeTg = displayio.TileGrid(planeSheet, pixel_shader=planePalette,
+                             tile_width=sprites.SIZE, tile_height=sprites.SIZE, x=display.width)
+planeG = displayio.Group()
 planeG.append(planeTg)
+plane_paths = sprites.paths(display.width, display.height, PLANE_HEADINGS)
+sprites.pace(int(PLANE_SPEED * 1000))
 
 def plane_animation():
+    """Fly the plane across the panel the way the shown aircraft is heading."""
+    k = sprites.heading_index(flights.rec[2][flights.N_TRACK], PLANE_HEADINGS)
     display.root_group = planeG
-    for i in range(display.width + 24, -12, -1):
-        planeG.x = i
-        w.feed()
-        if should_exit_flight():
-            return False
-        time.sleep(PLANE_SPEED)
-    return True
+    return sprites.fly(planeTg, plane_paths, k, w.feed, should_exit_flight)
 
 def scroll(line):
-    line.x = display.width
-    for i in range(display.width + 1, 0 - line.bounding_box[2], -1):
+    line.x = flight_width
+    for i in range(flight_width + 1, 0 - line.bounding_box[2], -1):
         line.x = i
         w.feed()
         if should_exit_flight():
             return False
-        time.sleep(TEXT_SPEED)
+        power.sleep(TEXT_SPEED)
     return True
 
 def _right_align_label(lbl, right_pad=1):
     text_w = lbl.bounding_box[2]
-    x = display.width - right_pad - text_w
+    x = flight_width - right_pad - text_w
     if x < 0:
         x = 0
     lbl.x = x
@@ -275,6 +384,7 @@ def display_flight():
     global label1_short, label1_long, label2_short, label2_long, label3_short, label3_long
     global flight_speed_text, flight_alt_text
 
+    t = tracing.start()
     display.root_group = flight_group
 
     # SHORT display: show speed + altitude (right-aligned)
@@ -287,14 +397,15 @@ def display_flight():
 
     label3_alt.text = flight_alt_text or ""
     _right_align_label(label3_alt)
+    tracing.span(FLIGHT_RENDER_EP, tracing.PH_RENDER, t)
 
-    time.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
+    power.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
 
     # Top row scroll: HIDE speed during scroll
     label1_speed.text = ""
     _right_align_label(label1_speed)
 
-    label1.x = display.width + 1
+    label1.x = flight_width + 1
     label1.text = label1_long
     if not scroll(label1): return False
     label1.text = label1_short
@@ -304,21 +415,21 @@ def display_flight():
     label1_speed.text = flight_speed_text or ""
     _right_align_label(label1_speed)
 
-    time.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
+    power.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
 
     # Middle row scroll unchanged
-    label2.x = display.width + 1
+    label2.x = flight_width + 1
     label2.text = label2_long
     if not scroll(label2): return False
     label2.text = label2_short
     label2.x = 1
-    time.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
+    power.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
 
     # Bottom row scroll: HIDE altitude during scroll
     label3_alt.text = ""
     _right_align_label(label3_alt)
 
-    label3.x = display.width + 1
+    label3.x = flight_width + 1
     label3.text = label3_long
     if not scroll(label3): return False
     label3.text = label3_short
@@ -328,7 +439,7 @@ def display_flight():
     label3_alt.text = flight_alt_text or ""
     _right_align_label(label3_alt)
 
-    time.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
+    power.sleep(PAUSE_BETWEEN_LABEL_SCROLLING)
     return True
 
 def clear_flight():
@@ -338,111 +449,71 @@ def clear_flight():
     label1_speed.text = ""
     label3_alt.text = ""
 
-def clear_json_bytes():
-    global json_bytes
-    if json_bytes is None:
-        return
-    mv = memoryview(json_bytes)
-    chunk = b"\x00" * 256
-    for i in range(0, json_size, 256):
-        mv[i:i+256] = chunk
-
-def get_flight_details(fn):
-    global json_bytes, json_size, json_bytes_len
-    byte_counter = 0
-    chunk_length = 1024
-
-    clear_json_bytes()
-
-    response = None
+def get_flight_details(fn, r=None):
+    """Stream the provider's details for fn into r (default flights.rec)."""
+    if not provider.HAS_DETAILS:
+        return True  # the search already filled the record
+    provider.details_begin(r)
+    telemetry.net(telemetry.PH_FLIGHT_DETAILS)
     try:
         gc.collect()
-        response = requests.get(url=FLIGHT_LONG_DETAILS_HEAD + fn, headers=rheaders, timeout=12)
-        for chunk in response.iter_content(chunk_size=chunk_length):
-            w.feed()
-            if (byte_counter + len(chunk) <= json_size):
-                json_bytes[byte_counter:byte_counter + len(chunk)] = chunk  # type: ignore
-            else:
-                print("Exceeded max string size while parsing JSON")
-                return False
-
-            trail_start = json_bytes.find((b"\"trail\":"))  # type: ignore
-            byte_counter += len(chunk)
-
-            if trail_start != -1:
-                trail_end = json_bytes[trail_start:].find((b"}"))  # type: ignore
-                if trail_end != -1:
-                    trail_end += trail_start
-                    closing_bytes = b'}]}'
-                    json_bytes[trail_end:trail_end + len(closing_bytes)] = closing_bytes  # type: ignore
-                    json_bytes_len = trail_end + 3
-                    print("Details lookup saved " + str(trail_end) + " bytes.")
-                    return True
-
-    except (RuntimeError, OSError, WatchDogTimeout) as e:
+        status = flight_request(provider.details_target(fn), provider.details_sink)
+    except (RuntimeError, OSError, ValueError, WatchDogTimeout) as e:
         w.feed()
         print("Error--------------------------------------------------")
         print(e)
         return False
-    finally:
-        if response is not None:
-            response.close()
 
-    print("Failed to find a valid trail entry in JSON")
+    if provider.details_end(status):
+        return True
+
+    print("Failed to find a valid trail entry in details (HTTP " + str(status) + ")")
     return False
 
-def parse_details_json():
+def set_flight_labels():
+    """Label texts from flights.rec (the only place the record becomes str)."""
     global label1_short, label1_long, label2_short, label2_long, label3_short, label3_long
     global flight_speed_text, flight_alt_text
 
-    try:
-        if json_bytes is None:
-            return False
-
-        # Parse using memoryview to avoid copying the buffer
-        long_json = json.loads(memoryview(json_bytes)[:json_bytes_len])
-
-        number_info = long_json["identification"]["number"]
-        flight_number = number_info["default"] if number_info else None
-        flight_callsign = long_json["identification"]["callsign"]
-        aircraft_code = long_json["aircraft"]["model"]["code"]
-        aircraft_model = long_json["aircraft"]["model"]["text"]
-        airline_name = long_json["airline"]["name"]
-        airport_origin_name = long_json["airport"]["origin"]["name"].replace(" Airport","")
-        airport_origin_code = long_json["airport"]["origin"]["code"]["iata"]
-        airport_destination_name = long_json["airport"]["destination"]["name"].replace(" Airport","")
-        airport_destination_code = long_json["airport"]["destination"]["code"]["iata"]
-
-        altitude = long_json["trail"][0]["alt"]
-        speed_knots = long_json["trail"][0]["spd"]
-        speed_mph = int(speed_knots * 115078 // 100000)  # mph integer, no float allocs
-
-        # Free the parsed dict immediately after extracting fields
-        long_json = None
-
-        if flight_number:
-            print("Flight is called " + flight_number)
-        elif flight_callsign:
-            print("No flight number, callsign is " + flight_callsign)
-        else:
-            print("No number or callsign for this flight.")
-
-        label1_short = (flight_number or flight_callsign or "")
-        label1_long  = airline_name or ""
-
-        flight_speed_text = str(speed_mph)
-        label2_short = (airport_origin_code + "-" + airport_destination_code) if airport_origin_code and airport_destination_code else ""
-        label2_long  = (airport_origin_name + "-" + airport_destination_name) if airport_origin_name and airport_destination_name else ""
-
-        label3_short = aircraft_code or ""
-        flight_alt_text = str(altitude)
-        label3_long  = aircraft_model or ""
-        return True
-
-    except (KeyError, ValueError, TypeError, IndexError) as e:
-        print("JSON error")
-        print(e)
-        return False
+    r = flights.rec
+    flight_number = flights.text(r, flights.F_FLIGHT)
+    flight_callsign = flights.text(r, flights.F_CALLSIGN)
+    registration = flights.text(r, flights.F_REG)
+    aircraft_code = flights.text(r, flights.F_TYPE)
+    aircraft_model = flights.text(r, flights.F_MODEL)
+    airline_name = flights.text(r, flights.F_AIRLINE)
+    airport_origin_code = flights.text(r, flights.F_ORIG)
+    airport_destination_code = flights.text(r, flights.F_DEST)
+    airport_origin_name = flights.text(r, flights.F_ORIG_NAME).replace(" Airport", "")
+    airport_destination_name = flights.text(r, flights.F_DEST_NAME).replace(" Airport", "")
+
+    if flight_number:
+        print("Flight is called " + flight_number)
+    elif flight_callsign:
+        print("No flight number, callsign is " + flight_callsign)
+    else:
+        print("No number or callsign for this flight.")
+
+    label1_short = flight_number or flight_callsign or registration
+    label1_long = airline_name or registration
+
+    speed_knots = r[2][flights.N_SPEED]
+    altitude = r[2][flights.N_ALT]
+    flight_speed_text = str(speed_knots * 115078 // 100000) if speed_knots != flights.NO_VALUE else ""  # mph
+    flight_alt_text = str(altitude) if altitude != flights.NO_VALUE else ""
+
+    if airport_origin_code and airport_destination_code:
+        label2_short = airport_origin_code + "-" + airport_destination_code
+    else:
+        label2_short = registration  # ADS-B feeds have no route
+    if airport_origin_name and airport_destination_name:
+        label2_long = airport_origin_name + "-" + airport_destination_name
+    else:
+        label2_long = label2_short
+
+    label3_short = aircraft_code
+    label3_long = aircraft_model or aircraft_code
+    return bool(label1_short or label3_short)
 
 def checkConnection():
     print("Connecting to AP...")
@@ -456,93 +527,244 @@ def checkConnection():
             print("could not connect to AP, retrying:", e)
             if attempts % 3 == 0:
                 radio.reset()
-                time.sleep(2)
+                power.sleep(2)
             else:
-                time.sleep(1)
+                power.sleep(1)
             w.feed()
     print("Connected")
     set_led_color(status_light, 'green')
 
 def get_flights():
+    """One search; returns the chosen flight's id (record filled) or False."""
     gc.collect()
-    with requests.get(url=FLIGHT_SEARCH_URL, headers=rheaders, timeout=12) as response:
-        data = response.json()
-        if len(data) == 3:
-            for flight_id, flight_info in data.items():
-                if not (flight_id == "version" or flight_id == "full_count"):
-                    if len(flight_info) > 13:
-                        return flight_id
+    if PREDICT:
+        predict.begin()
+    provider.search_begin()
+    status = flight_request(provider.search, provider.search_sink)
+    found = provider.search_end(status)
+    if PREDICT and status == 200:
+        predict.end()
+    if status != 200:
+        print("Flight search HTTP " + str(status))
+    return found
+
+# -----------------------------
+# Idle: dark matrix + slow polling when nothing is on screen
+# -----------------------------
+IDLE_AFTER_EMPTY_POLLS = int(os.getenv("idle_after_empty_polls", "10"))  # 0 = never
+IDLE_POLL_SECONDS = int(os.getenv("idle_poll_seconds", "300"))
+QUIET_HOURS = power.parse_hours(os.getenv("quiet_hours") or "")
+POWER_REPORT_SECONDS = 3600
+
+_next_power_report = time.monotonic() + POWER_REPORT_SECONDS
+
+def power_tick():
+    global _next_power_report
+    now = time.monotonic()
+    if now >= _next_power_report:
+        _next_power_report = now + POWER_REPORT_SECONDS
+        power.report("hourly")
+
+def display_sleep():
+    """Stop refreshing the matrix (brightness 0 pauses the refresh timer)."""
+    if power.is_idle():
+        return
+    matrix.brightness = 0
+    display.auto_refresh = False
+    power.set_idle(True)
+    power.report("idle")
+
+def display_wake():
+    if not power.is_idle():
+        return
+    display.auto_refresh = True
+    matrix.brightness = 1.0
+    power.set_idle(False)
+    power.report("wake")
+
+def in_quiet_hours():
+    epoch = current_utc_epoch()
+    if epoch is None or QUIET_HOURS is None:
         return False
+    hh, mm, _ = get_pacific_hm_wday(epoch)
+    return power.in_hours(QUIET_HOURS, hh, mm)
+
+def flight_wait(seconds):
+    """Sleep between polls. Returns "exit" (UP / bus window / console mode),
+    "wake" (DOWN while dark), "refresh" (console) or None."""
+    end = time.monotonic() + seconds
+    next_check = 0
+    while time.monotonic() < end:
+        w.feed()
+        if should_exit_flight():
+            return "exit"
+        if power.is_idle() and down_pressed():
+            return "wake"
+        if console.take_refresh():
+            return "refresh"
+        if wanted_mode() != "flight":
+            return "exit"
+        now = time.monotonic()
+        if now >= next_check:
+            next_check = now + 5
+            power_tick()
+        power.sleep(0.1)
+    return None
 
-def run_flight_mode():
-    global json_bytes
+def prefetch_ahead():
+    """Fetch the predicted flight's details while the current one stays on screen."""
+    if not PREDICT or not predict.pending() or predict.ready:
+        return
+    fid = flights.text(predict.ahead, flights.F_ID)
+    print("Next overhead in " + str(predict.ahead_in) + "s: " + fid + ", prefetching details")
+    telemetry.phase(telemetry.PH_FLIGHT_DETAILS)
+    predict.ready = get_flight_details(fid, predict.ahead)
+
+def show_new_flight(flight_id):
+    """Details (prefetched ones if it was predicted), labels, plane, rows.
+
+    Returns True if shown, False if skipped, None if UP was pressed.
+    """
+    print("New flight " + flight_id + " found, clear display")
+    clear_flight()
+    telemetry.phase(telemetry.PH_FLIGHT_DETAILS)
+    if PREDICT and predict.take(flights.rec):
+        print("Details were prefetched")
+    elif not get_flight_details(flight_id):
+        w.feed()
+        print("error loading details, skip displaying this flight")
+        return False
+    w.feed()
+    gc.collect()
+    telemetry.phase(telemetry.PH_FLIGHT_PARSE)
+    if not set_flight_labels():
+        print("nothing to show for this flight, skip it")
+        return False
+    gc.collect()
+    if PREDICT:
+        predict.exclude(flights.rec)
+    telemetry.phase(telemetry.PH_FLIGHT_DISPLAY)
+    if not plane_animation():
+        return None
+    if not display_flight():
+        return None
+    return True
 
+def run_flight_mode():
+    console.current = "flight"
+    telemetry.checkpoint(telemetry.PH_FLIGHT_ENTER)
+    modes.enter("flight")
     set_led_color(status_light, 'yellow')
     checkConnection()
-    rebuild_requests()
-
-    if json_bytes is None:
-        gc.collect()
-        json_bytes = bytearray(json_size)
 
     display.root_group = flight_group
     clear_flight()
+    try:
+        _flight_loop()
+    finally:
+        display_wake()
 
+def _flight_loop():
     last_flight = ''
+    empty_polls = 0
+    woken = False  # DOWN pressed during quiet hours: stay lit until idle again
     while True:
-        if should_exit_flight() or should_auto_bus():
+        if should_exit_flight() or wanted_mode() != "flight":
             return
 
+        quiet = in_quiet_hours()
+        if not quiet:
+            woken = False
+        elif not woken:
+            # Quiet hours: dark and no polling until they end or DOWN is pressed
+            clear_flight()
+            last_flight = ''
+            display_sleep()
+            r = flight_wait(IDLE_POLL_SECONDS)
+            if r == "exit":
+                return
+            if r == "wake":
+                woken = True
+                empty_polls = 0
+                display_wake()
+            continue
+
         if not radio.is_connected:
             set_led_color(status_light, 'yellow')
             checkConnection()
-            rebuild_requests()
 
         w.feed()
 
         flight_id = None
-        try:
-            flight_id = get_flights()
-        except Exception as e:
-            w.feed()
-            print("Flight search error:", e)
-            rebuild_requests()
-            flight_id = False
+        telemetry.net(telemetry.PH_FLIGHT_SEARCH)
+        if not budget_ok("flight"):
+            flight_id = last_flight  # no room to fetch; keep what is on screen
+        else:
+            try:
+                flight_id = get_flights()
+            except Exception as e:
+                w.feed()
+                print("Flight search error:", e)
+                flight_id = False
 
         w.feed()
         if should_exit_flight():
             return
 
+        if flight_id:
+            empty_polls = 0
+            display_wake()
+        else:
+            empty_polls += 1
+
         if flight_id:
             if flight_id == last_flight:
                 print("Same flight found, so keep showing it")
             else:
-                print("New flight " + flight_id + " found, clear display")
-                clear_flight()
-                if get_flight_details(flight_id):
-                    w.feed()
-                    gc.collect()
-                    if parse_details_json():
-                        gc.collect()
-                        if not plane_animation():
-                            return
-                        if not display_flight():
-                            return
-                        last_flight = flight_id
-                    else:
-                        print("error parsing JSON, skip displaying this flight")
-                else:
-                    w.feed()
-                    print("error loading details, skip displaying this flight")
+                shown = show_new_flight(flight_id)
+                if shown is None:
+                    return
+                if shown:
+                    last_flight = flight_id
         else:
             clear_flight()
 
-        time.sleep(5)
-        for i in range(0, QUERY_DELAY, +5):
-            if should_exit_flight() or should_auto_bus():
+        if IDLE_AFTER_EMPTY_POLLS and empty_polls >= IDLE_AFTER_EMPTY_POLLS:
+            woken = False
+            display_sleep()
+
+        prefetch_ahead()
+
+        telemetry.phase(telemetry.PH_FLIGHT_WAIT)
+        wait = IDLE_POLL_SECONDS if power.is_idle() else QUERY_DELAY + 5
+        due = -1
+        if PREDICT and predict.ready and predict.pending():
+            due = max(0, int(predict.ahead_at - time.monotonic()))
+            if due < wait:
+                wait = due
+            else:
+                due = -1  # the next search comes first
+        r = flight_wait(wait)
+        if r == "exit":
+            return
+        if r == "wake":
+            empty_polls = 0
+            woken = True
+            display_wake()
+        elif r is None and due >= 0:
+            # The predicted flight should be entering the box: show it now,
+            # dead-reckoned to here, and let the next search confirm it
+            flights.copy(flights.rec, predict.ahead)
+            predict.position_at(predict.ahead, predict.ahead_in, flights.rec[2])  # N_LAT, N_LON
+            flight_id = flights.text(flights.rec, flights.F_ID)
+            print("Predicted flight " + flight_id + " arriving")
+            empty_polls = 0
+            display_wake()
+            shown = show_new_flight(flight_id)
+            if shown is None:
                 return
-            time.sleep(5)
-            w.feed()
+            if shown:
+                last_flight = flight_id
         gc.collect()
 
 # ============================================================
@@ -550,191 +772,44 @@ def run_flight_mode():
 # ============================================================
 
 STOP_1X_IN = "13876"  # inbound stop for 1X
+STOP_1X_IN_SLOT = 0    # eta_model table slot for this stop
 MAX_STOP_VISITS = 10
-HEADERS_511 = {"Accept-Encoding": "identity", "Connection": "close", "Accept": "application/json"}
+HOST_511 = "api.511.org"
+PATH_511_HEAD = "/transit/StopMonitoring?api_key=" + (API_KEY_511 or "") + "&agency=" + AGENCY + "&stopCode="
+PATH_511_TAIL = "&format=json&MaximumStopVisits=" + str(MAX_STOP_VISITS)
+HEADERS_511 = b"Accept: application/json\r\nAccept-Encoding: identity\r\n"
 BUS_REFRESH_SECONDS = 120
 
 LEFT_MARGIN = 0
 BUS_MID_LIGHTBLUE = 0x66CCFF
 
+BUS_TITLE = "JEN BUS ALERT"
+
 bus_group = displayio.Group()
-bus_title = label.Label(FONT, text="JEN BUS ALERT", color=0xFF6600, x=LEFT_MARGIN, y=5)
+bus_title = label.Label(FONT, text=BUS_TITLE, color=0xFF6600, x=LEFT_MARGIN, y=5)
 row1x    = label.Label(FONT, text="1X:--,--,--",   color=BUS_MID_LIGHTBLUE, x=LEFT_MARGIN, y=16)
 bus_time_lbl = label.Label(FONT, text="--:--",     color=0xFFFFFF, x=LEFT_MARGIN, y=26)
 bus_group.append(bus_title)
 bus_group.append(row1x)
 bus_group.append(bus_time_lbl)
 
-def _is_leap(y):
-    return (y % 4 == 0 and y % 100 != 0) or (y % 400 == 0)
-
-_year_days_cache = {}
-
-def _days_before_year(y):
-    if y in _year_days_cache:
-        return _year_days_cache[y]
-    d = 0
-    for yy in range(1970, y):
-        d += 366 if _is_leap(yy) else 365
-    _year_days_cache[y] = d
-    return d
-
-def _days_before_month(y, m):
-    mdays = [31, 28 + (1 if _is_leap(y) else 0), 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    s = 0
-    for i in range(m - 1):
-        s += mdays[i]
-    return s
-
-def iso8601_to_epoch(s):
-    y = int(s[0:4]); mo = int(s[5:7]); d = int(s[8:10])
-    hh = int(s[11:13]); mm = int(s[14:16]); ss = int(s[17:19])
-    tz = s[19:]
-    off = 0
-    if tz not in ("", "Z"):
-        sign = -1 if tz[0] == "-" else 1
-        off = sign * (int(tz[1:3]) * 60 + int(tz[4:6]))
-    days = _days_before_year(y) + _days_before_month(y, mo) + (d - 1)
-    return days * 86400 + hh * 3600 + mm * 60 + ss - off * 60
-
-def norm_route(s):
-    if not s:
-        return ""
-    r = str(s).strip().upper().replace(" ", "")
-    if r.endswith("X"):
-        base = r[:-1]
-        if base.isdigit():
-            base = str(int(base))
-        return base + "X"
-    if r.isdigit():
-        return str(int(r))
-    return r
-
-def get_pacific_hm_wday(epoch):
-    """Return (hour, minute, weekday) in Pacific time. weekday: 0=Mon, 6=Sun."""
-    # Find year
-    days_total = epoch // 86400
-    year = 1970 + days_total // 365
-    while _days_before_year(year + 1) <= days_total:
-        year += 1
-    while _days_before_year(year) > days_total:
-        year -= 1
-    # Find month (1-indexed)
-    day_of_year = days_total - _days_before_year(year)
-    mdays = [31, 28 + (1 if _is_leap(year) else 0), 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    month = 0
-    while month < 11 and day_of_year >= mdays[month]:
-        day_of_year -= mdays[month]
-        month += 1
-    month += 1
-    # UTC-7 (PDT) March-October, UTC-8 (PST) November-February
-    local_epoch = epoch + (-7 * 3600 if 3 <= month <= 10 else -8 * 3600)
-    hh = (local_epoch % 86400) // 3600
-    mm = (local_epoch % 3600) // 60
-    wday = (local_epoch // 86400 + 3) % 7  # 0=Mon, 4=Fri, 6=Sun
-    return int(hh), int(mm), int(wday)
-
-def fmt_pacific_time(epoch):
-    hh, mm, _ = get_pacific_hm_wday(epoch)
-    ampm = "AM" if hh < 12 else "PM"
-    h12 = hh % 12 or 12
-    return "{:d}:{:02d}{}".format(h12, mm, ampm)
-
 def fetch_stop_511_raw(stop_code):
-    """Fetch 511 API using raw sockets, bypassing adafruit_requests entirely."""
+    """Fetch 511 StopMonitoring through the shared client into json_bytes."""
+    global json_bytes_len
+    json_bytes_len = 0
     gc.collect()
-    path = (
-        "/transit/StopMonitoring?api_key=" + API_KEY_511
-        + "&agency=" + AGENCY
-        + "&stopCode=" + stop_code
-        + "&format=json&MaximumStopVisits=" + str(MAX_STOP_VISITS)
+    status = http_client.request(
+        HOST_511, (PATH_511_HEAD, stop_code, PATH_511_TAIL), _fill_json_bytes,
+        headers=HEADERS_511, timeout=10, ep=tracing.EP_511_STOP,
     )
-    host = "api.511.org"
-
-    from adafruit_esp32spi.adafruit_esp32spi_socketpool import SocketPool as _SP
-    _pool = _SP(radio)
-    sock = _pool.socket(_pool.AF_INET, _pool.SOCK_STREAM)
-    sock.settimeout(5)
-
-    w.feed()
-    addr = radio.get_host_by_name(host)
-    sock.connect((addr, 80))
-    w.feed()
-
-    request = (
-        "GET " + path + " HTTP/1.0\r\n"
-        "Host: " + host + "\r\n"
-        "Connection: close\r\n"
-        "Accept: application/json\r\n"
-        "Accept-Encoding: identity\r\n"
-        "\r\n"
-    )
-    sock.send(request.encode())
-    w.feed()
-
-    # Read response in chunks
-    chunks = []
-    while True:
-        w.feed()
-        try:
-            buf = bytearray(1024)
-            n = sock.recv_into(buf)
-            if n == 0:
-                break
-            chunks.append(bytes(buf[:n]))
-        except OSError:
-            break
-
-    sock.close()
-
-    # Join and split headers from body
-    raw = b"".join(chunks)
-    chunks = None
-    header_end = raw.find(b"\r\n\r\n")
-    if header_end == -1:
-        raise ValueError("No HTTP header end found")
-    body = raw[header_end + 4:]
-    raw = None
+    if status != 200:
+        raise ValueError("511 HTTP " + str(status))
     # Strip BOM if present
-    if body[:3] == b"\xef\xbb\xbf":
-        body = body[3:]
-    return json.loads(body)
-
-def extract_etas_seconds(data, route, n=3):
-    sd = data["ServiceDelivery"]
-    resp_epoch = iso8601_to_epoch(sd["ResponseTimestamp"])
-    visits = sd["StopMonitoringDelivery"]["MonitoredStopVisit"]
-    if isinstance(visits, dict):
-        visits = [visits]
-    secs = []
-    for v in visits:
-        mvj = v["MonitoredVehicleJourney"]
-        if norm_route(mvj.get("LineRef", "")) != route:
-            continue
-        call = mvj.get("MonitoredCall", {})
-        t = call.get("ExpectedArrivalTime") or call.get("AimedArrivalTime")
-        if not t:
-            continue
-        eta = iso8601_to_epoch(t) - resp_epoch
-        if 0 <= eta <= 180 * 60:
-            secs.append(int(eta))
-    secs.sort()
-    out = secs[:n]
-    while len(out) < n:
-        out.append(None)
-    return out
-
-def tick_etas(dt, arrays):
-    if dt <= 0:
-        return
-    for arr in arrays:
-        for i in range(3):
-            v = arr[i]
-            if v is None:
-                continue
-            if v > 0:
-                nv = v - dt
-                arr[i] = nv if nv > 0 else 0
+    off = 3 if json_bytes[:3] == b"\xef\xbb\xbf" else 0  # type: ignore
+    t = tracing.start()
+    data = json.loads(memoryview(json_bytes)[off:json_bytes_len])
+    tracing.span(tracing.EP_511_STOP, tracing.PH_PARSE, t)
+    return data
 
 def fmt3_from_etas(arr):
     out = []
@@ -743,12 +818,121 @@ def fmt3_from_etas(arr):
         out.append(str(v // 60) if v is not None else "--")
     return ",".join(out)
 
-def run_bus_mode(auto=False):
-    global json_bytes
+# Bus board state, shared by bus mode and combined mode
+# bus_raw: ETAs as of the last refresh; bus_etas: corrected countdown shown
+bus_raw = [None, None, None]
+bus_rate = [0, 0, 0]
+bus_etas = [None, None, None]
+bus_raw_epoch = None
+bus_raw_mono = 0.0
+bus_last_tick = 0.0
+bus_last_eta_snap = None
+bus_last_time_str = None
+
+# Time base: synced from 511 API ResponseTimestamp on each successful fetch
+bus_time_base = [None, 0.0]  # [utc_epoch, monotonic_at_sync]
+
+def bus_reset():
+    global bus_raw_epoch, bus_raw_mono, bus_last_tick, bus_last_eta_snap, bus_last_time_str
+    for i in range(3):
+        bus_raw[i] = None
+        bus_rate[i] = 0
+        bus_etas[i] = None
+    bus_raw_epoch = None
+    bus_raw_mono = bus_last_tick = time.monotonic()
+    bus_time_base[0] = None
+    bus_last_eta_snap = None
+    bus_last_time_str = None
+    row1x.text = "1X:--,--,--"
+    bus_time_lbl.text = "--:--"
 
-    print("BUS: enter auto=" + str(auto))
-    # Free big flight buffer while bus runs
-    json_bytes = None
+def bus_time_str():
+    if bus_time_base[0] is None:
+        return "--:--"
+    elapsed = int(time.monotonic() - bus_time_base[1])
+    return fmt_pacific_time(bus_time_base[0] + elapsed)
+
+def bus_update_labels():
+    global bus_last_eta_snap, bus_last_time_str
+    snap = tuple((v // 60) if v is not None else None for v in bus_etas)
+    if snap != bus_last_eta_snap:
+        bus_last_eta_snap = snap
+        row1x.text = "1X:" + fmt3_from_etas(bus_etas)
+    t = bus_time_str()
+    if t != bus_last_time_str:
+        bus_last_time_str = t
+        bus_time_lbl.text = t
+
+def bus_tick():
+    """Advance the countdown once per whole second."""
+    global bus_last_tick
+    now = time.monotonic()
+    dt = int(now - bus_last_tick)
+    if dt:
+        bus_last_tick += dt
+        eta_model.project(bus_raw, int(now - bus_raw_mono), bus_rate, bus_etas)
+        bus_update_labels()
+
+def _bus_new_etas(etas, resp_epoch):
+    global bus_raw_epoch, bus_raw_mono
+    hour = get_pacific_hm_wday(resp_epoch)[0]
+    if bus_raw_epoch is not None:
+        eta_model.observe(STOP_1X_IN_SLOT, hour, bus_raw, etas, resp_epoch - bus_raw_epoch)
+        eta_model.maybe_save()
+    bus_raw[:] = etas
+    bus_raw_epoch = resp_epoch
+    bus_raw_mono = time.monotonic()
+    eta_model.rates(STOP_1X_IN_SLOT, hour, bus_raw, bus_rate)
+    eta_model.project(bus_raw, 0, bus_rate, bus_etas)
+
+def bus_refresh():
+    """One 511 fetch + parse into the bus board; resets the radio on failure."""
+    global bus_last_eta_snap, bus_last_time_str
+    gc.collect()
+
+    if not radio.is_connected:
+        set_led_color(status_light, 'yellow')
+        checkConnection()
+        w.feed()
+
+    w.feed()
+    try:
+        telemetry.net(telemetry.PH_BUS_FETCH)
+        d_in = fetch_stop_511_raw(STOP_1X_IN)
+        telemetry.phase(telemetry.PH_BUS_PARSE)
+        try:
+            resp_ts = d_in["ServiceDelivery"]["ResponseTimestamp"]
+            bus_time_base[0] = iso8601_to_epoch(resp_ts)
+            bus_time_base[1] = time.monotonic()
+        except Exception:
+            pass
+        etas = extract_etas_seconds(d_in, "1X")
+        d_in = None
+        # extract_etas_seconds needs ResponseTimestamp, so bus_time_base is fresh
+        _bus_new_etas(etas, bus_time_base[0])
+    except (RuntimeError, OSError, MemoryError, KeyError, ValueError, TypeError, WatchDogTimeout) as e:
+        w.feed()
+        print("Bus fetch error:", e)
+        try:
+            radio.reset()
+            w.feed()
+            checkConnection()
+        except Exception as e2:
+            print("Bus recovery error:", e2)
+        w.feed()
+
+    telemetry.phase(telemetry.PH_BUS_WAIT)
+    bus_last_eta_snap = None
+    bus_last_time_str = None
+    t = tracing.start()
+    bus_update_labels()
+    tracing.span(tracing.EP_511_STOP, tracing.PH_RENDER, t)
+
+def run_bus_mode():
+    print("BUS: enter")
+    console.current = "bus"
+    telemetry.checkpoint(telemetry.PH_BUS_ENTER)
+    modes.enter("bus")
     gc.collect()
     w.feed()
     # Reset ESP32 to clear all held socket slots from flight mode HTTPS connections
@@ -758,23 +942,11 @@ def run_bus_mode(auto=False):
     w.feed()
     print("BUS: gc done")
 
-    row1x.text = "1X:--,--,--"
-    bus_time_lbl.text = "--:--"
+    bus_reset()
     bus_title.x = display.width  # start off-screen right, will scroll in
     display.root_group = bus_group
     print("BUS: display set")
 
-    etas_1xi = [None, None, None]
-
-    # Time base: synced from 511 API ResponseTimestamp on each successful fetch
-    time_base = [None, time.monotonic()]  # [utc_epoch, monotonic_at_sync]
-
-    def current_time_str():
-        if time_base[0] is None:
-            return "--:--"
-        elapsed = int(time.monotonic() - time_base[1])
-        return fmt_pacific_time(time_base[0] + elapsed)
-
     # Title scroll state
     title_x = display.width
     last_scroll_t = time.monotonic()
@@ -790,78 +962,264 @@ def run_bus_mode(auto=False):
             bus_title.x = title_x
 
     last_fetch = -999999
-    last_tick = time.monotonic()
-    last_eta_snap = None
-    last_time_str = None
-
-    def update_labels():
-        nonlocal last_eta_snap, last_time_str, etas_1xi
-        snap = tuple((v // 60) if v is not None else None for v in etas_1xi)
-        if snap != last_eta_snap:
-            last_eta_snap = snap
-            row1x.text = "1X:" + fmt3_from_etas(etas_1xi)
-        t = current_time_str()
-        if t != last_time_str:
-            last_time_str = t
-            bus_time_lbl.text = t
-
-    def tick_and_update():
-        nonlocal last_tick, etas_1xi
-        now = time.monotonic()
-        dt = int(now - last_tick)
-        if dt:
-            last_tick += dt
-            tick_etas(dt, (etas_1xi,))
-            update_labels()
-
-    auto_entered = auto
 
     while True:
         w.feed()
+        console.poll()
         if down_pressed():
+            schedule.set_override(DEFAULT_MODE)
+            break
+        if console.want_mode is not None:
             break
-        if auto_entered and not should_auto_bus():
-            print("BUS: auto-bus window ended, returning to flight")
+        if console.take_refresh():
+            last_fetch = -999999
+        if wanted_mode() != "bus":
+            print("BUS: scheduled window ended")
             break
 
-        tick_and_update()
+        bus_tick()
         advance_title()
+        power_tick()
 
         if time.monotonic() - last_fetch >= BUS_REFRESH_SECONDS:
             last_fetch = time.monotonic()
-            gc.collect()
+            if budget_ok("bus"):
+                bus_refresh()
+            else:
+                last_fetch -= BUS_REFRESH_SECONDS - 10  # try again shortly
+
+        power.sleep(0.05)
+
+    # Keep whatever this visit taught the ETA model
+    eta_model.save()
+
+# ============================================================
+# Combined mode - flight rows and bus board side by side (128x32)
+# or stacked (64x64), one fetch in flight at a time
+# ============================================================
+
+COMBINED_LAYOUT = (os.getenv("combined_layout") or "auto").lower()
+if COMBINED_LAYOUT not in ("side", "stacked"):
+    COMBINED_LAYOUT = "side" if display.width >= 2 * display.height else "stacked"
+
+if COMBINED_LAYOUT == "side":
+    COMBINED_OK = display.width >= 128 and display.height >= 32
+    COMBINED_HALF_W = display.width // 2
+    COMBINED_BUS_X = COMBINED_HALF_W
+    COMBINED_BUS_Y = 0
+    COMBINED_BUS_H = display.height
+else:
+    COMBINED_OK = display.height >= 64
+    COMBINED_HALF_W = display.width
+    COMBINED_BUS_X = 0
+    COMBINED_BUS_Y = display.height // 2
+    COMBINED_BUS_H = display.height - COMBINED_BUS_Y
+
+DEFAULT_MODE = (os.getenv("default_mode") or "flight").lower()
+if DEFAULT_MODE == "combined" and not COMBINED_OK:
+    print("combined mode needs a 128x32 or 64x64 panel; using flight mode")
+    DEFAULT_MODE = "flight"
+if COMBINED_OK:
+    console.modes = ("flight", "bus", "combined")
+
+# Mode schedule (schedule.py). Without a `schedule` setting this is the
+# original weekday-morning bus window; combined mode already shows the
+# bus board, so it has none by default.
+_DEFAULT_SCHEDULE = "" if DEFAULT_MODE == "combined" else "bus mon-fri 07:15-08:15"
+schedule.load(os.getenv("schedule", _DEFAULT_SCHEDULE), os.getenv("schedule_holidays") or "", console.modes)
+
+def wanted_mode():
+    """The mode that should be running: button/console choice, schedule, else default."""
+    return schedule.check(time.monotonic()) or DEFAULT_MODE
+
+COMBINED_BUS_TITLE = "JEN BUS"
+
+# Black backing for the bus half: flight rows scrolling in from the
+# right edge of their half are hidden behind it (displayio doesn't clip)
+_mask_palette = displayio.Palette(1)
+_mask_palette[0] = 0x000000
+bus_mask = vectorio.Rectangle(
+    pixel_shader=_mask_palette, width=max(1, display.width - COMBINED_BUS_X),
+    height=max(1, COMBINED_BUS_H), x=COMBINED_BUS_X, y=COMBINED_BUS_Y,
+)
+combined_group = displayio.Group()
+
+def _combined_attach():
+    global flight_width
+    flight_width = COMBINED_HALF_W
+    flight_group.x = flight_group.y = 0
+    bus_group.x = COMBINED_BUS_X
+    bus_group.y = COMBINED_BUS_Y
+    bus_title.text = COMBINED_BUS_TITLE
+    bus_title.x = LEFT_MARGIN
+    # the root group counts as "in a group": let go of it before appending
+    display.root_group = None
+    combined_group.append(flight_group)
+    combined_group.append(bus_mask)
+    combined_group.append(bus_group)
+    display.root_group = combined_group
+
+def _combined_detach():
+    global flight_width
+    # flight_group / bus_group must leave this group before they can be root again
+    while len(combined_group):
+        combined_group.pop()
+    flight_width = display.width
+    bus_group.x = bus_group.y = 0
+    bus_title.text = BUS_TITLE
+
+def run_combined_mode():
+    print("COMBINED: enter " + COMBINED_LAYOUT)
+    console.current = "combined"
+    telemetry.checkpoint(telemetry.PH_COMBINED_ENTER)
+    modes.enter("combined")
+    set_led_color(status_light, 'yellow')
+    checkConnection()
+
+    clear_flight()
+    bus_reset()
+
+    # Flight rows: same sequence as display_flight(), stepped from the loop
+    # row = -1 idle, 0..2 the row being shown/scrolled
+    row = -1
+    scrolling = False
+    next_step = 0.0
+
+    def row_texts(i):
+        if i == 0:
+            return label1, label1_short, label1_long, label1_speed, flight_speed_text
+        if i == 1:
+            return label2, label2_short, label2_long, None, ""
+        return label3, label3_short, label3_long, label3_alt, flight_alt_text
+
+    def show_flight():
+        nonlocal row, scrolling, next_step
+        t = tracing.start()
+        label1.text = label1_short
+        label2.text = label2_short
+        label3.text = label3_short
+        label1.x = label2.x = label3.x = 1
+        label1_speed.text = flight_speed_text or ""
+        _right_align_label(label1_speed)
+        label3_alt.text = flight_alt_text or ""
+        _right_align_label(label3_alt)
+        tracing.span(FLIGHT_RENDER_EP, tracing.PH_RENDER, t)
+        row = 0
+        scrolling = False
+        next_step = time.monotonic() + PAUSE_BETWEEN_LABEL_SCROLLING
+
+    def step_flight(now):
+        nonlocal row, scrolling, next_step
+        if row < 0 or now < next_step:
+            return
+        lbl, short, long_text, num, num_text = row_texts(row)
+        if not scrolling:
+            # hide the number while its row scrolls, like display_flight()
+            if num is not None:
+                num.text = ""
+            lbl.text = long_text
+            lbl.x = flight_width + 1
+            scrolling = True
+            next_step = now + TEXT_SPEED
+            return
+        # catch up if a fetch kept us away for a while
+        lbl.x -= max(1, int((now - next_step) / TEXT_SPEED) + 1)
+        if lbl.x >= -lbl.bounding_box[2]:
+            next_step = now + TEXT_SPEED
+            return
+        lbl.text = short
+        lbl.x = 1
+        if num is not None:
+            num.text = num_text or ""
+            _right_align_label(num)
+        scrolling = False
+        row = row + 1 if row < 2 else -1
+        next_step = now + PAUSE_BETWEEN_LABEL_SCROLLING
+
+    def pump():
+        step_flight(time.monotonic())
+        bus_tick()
+        console.poll()
+
+    last_flight = ''
+    pending = None  # flight id whose details are due
+    next_search = 0.0
+    next_bus = 0.0
+
+    http_client.set_idle(pump)
+    try:
+        _combined_attach()  # inside the try: a failed attach is detached again
+        while True:
+            w.feed()
+            if up_pressed():
+                schedule.set_override("bus")
+                return
+            if console.want_mode is not None or wanted_mode() != "combined":
+                return
+            pump()
+            if console.take_refresh():
+                next_search = next_bus = 0.0
+
+            now = time.monotonic()
+            if pending is None and now < next_bus and now < next_search:
+                power.sleep(0.02)
+                continue
 
             if not radio.is_connected:
                 set_led_color(status_light, 'yellow')
                 checkConnection()
-                w.feed()
 
-            w.feed()
-            try:
-                d_in = fetch_stop_511_raw(STOP_1X_IN)
-                try:
-                    resp_ts = d_in["ServiceDelivery"]["ResponseTimestamp"]
-                    time_base[0] = iso8601_to_epoch(resp_ts)
-                    time_base[1] = time.monotonic()
-                except Exception:
-                    pass
-                etas_1xi = extract_etas_seconds(d_in, "1X")
-            except (RuntimeError, OSError, MemoryError, KeyError, ValueError, TypeError, WatchDogTimeout) as e:
-                w.feed()
-                print("Bus fetch error:", e)
+            # One fetch per pass, so only one response is ever in memory
+            if not budget_ok("combined"):
+                next_search = max(next_search, now + 5)
+                next_bus = max(next_bus, now + 5)
+                continue
+
+            if pending is not None:
+                flight_id = pending
+                pending = None
+                print("New flight " + flight_id + " found, clear display")
+                clear_flight()
+                row = -1
+                telemetry.phase(telemetry.PH_FLIGHT_DETAILS)
+                if get_flight_details(flight_id):
+                    w.feed()
+                    gc.collect()
+                    telemetry.phase(telemetry.PH_FLIGHT_PARSE)
+                    if set_flight_labels():
+                        gc.collect()
+                        telemetry.phase(telemetry.PH_FLIGHT_DISPLAY)
+                        show_flight()
+                        last_flight = flight_id
+                    else:
+                        print("nothing to show for this flight, skip it")
+                else:
+                    print("error loading details, skip displaying this flight")
+            elif now >= next_bus:
+                next_bus = now + BUS_REFRESH_SECONDS
+                bus_refresh()
+            else:
+                next_search = now + QUERY_DELAY + 5
+                telemetry.net(telemetry.PH_FLIGHT_SEARCH)
                 try:
-                    radio.reset()
+                    flight_id = get_flights()
+                except Exception as e:
                     w.feed()
-                    checkConnection()
-                except Exception as e2:
-                    print("Bus recovery error:", e2)
-                w.feed()
-
-            last_eta_snap = None
-            last_time_str = None
-            update_labels()
-
-        time.sleep(0.05)
+                    print("Flight search error:", e)
+                    flight_id = False
+                if flight_id:
+                    if flight_id != last_flight:
+                        pending = flight_id
+                else:
+                    clear_flight()
+                    row = -1
+                    last_flight = ''
+            telemetry.phase(telemetry.PH_FLIGHT_WAIT)
+            gc.collect()
+    finally:
+        http_client.set_idle(None)
+        _combined_detach()
+        eta_model.save()
 
 # ============================================================
 # MAIN: start in Flight mode at boot
@@ -870,60 +1228,39 @@ def run_bus_mode(auto=False):
 # Global time tracking: synced once at startup via 511 API, then tracked with monotonic()
 _time_sync = [None, 0.0]  # [utc_epoch, monotonic_at_sync]
 
+_TS_MARKER = b'"ResponseTimestamp":"'
+_TS_SCAN_LIMIT = 2048
+
+def _time_sink(mv):
+    """Buffer the head of the 511 body until ResponseTimestamp is complete."""
+    _fill_json_bytes(mv)
+    idx = json_bytes.find(_TS_MARKER, 0, json_bytes_len)  # type: ignore
+    if idx != -1 and json_bytes.find(b'"', idx + len(_TS_MARKER), json_bytes_len) != -1:  # type: ignore
+        return True
+    return json_bytes_len >= _TS_SCAN_LIMIT
+
 def sync_time_from_511():
     """Quick 511 fetch — extract ResponseTimestamp without full JSON parse."""
+    global json_bytes_len
+    telemetry.net(telemetry.PH_TIME_SYNC)
     try:
         gc.collect()
-        path = (
-            "/transit/StopMonitoring?api_key=" + API_KEY_511
-            + "&agency=" + AGENCY
-            + "&stopCode=" + STOP_1X_IN
-            + "&format=json&MaximumStopVisits=1"
-        )
-        host = "api.511.org"
-        from adafruit_esp32spi.adafruit_esp32spi_socketpool import SocketPool as _SP
-        _pool = _SP(radio)
-        sock = _pool.socket(_pool.AF_INET, _pool.SOCK_STREAM)
-        sock.settimeout(5)
-        w.feed()
-        addr = radio.get_host_by_name(host)
-        sock.connect((addr, 80))
-        w.feed()
-        req = (
-            "GET " + path + " HTTP/1.0\r\n"
-            "Host: " + host + "\r\n"
-            "Connection: close\r\n"
-            "Accept-Encoding: identity\r\n"
-            "\r\n"
+        json_bytes_len = 0
+        http_client.request(
+            HOST_511, (PATH_511_HEAD, STOP_1X_IN, "&format=json&MaximumStopVisits=1"),
+            _time_sink, headers=HEADERS_511, timeout=10, ep=tracing.EP_511_TIME,
         )
-        sock.send(req.encode())
-        w.feed()
-        # Read into fixed buffer to avoid fragmentation
-        raw = bytearray(2048)
-        raw_len = 0
-        while raw_len < 2048:
-            w.feed()
-            try:
-                mv = memoryview(raw)[raw_len:]
-                n = sock.recv_into(mv)
-                if n == 0:
-                    break
-                raw_len += n
-            except OSError:
-                break
-        sock.close()
         # Find ResponseTimestamp in raw bytes
-        marker = b'"ResponseTimestamp":"'
-        idx = raw.find(marker, 0, raw_len)
+        idx = json_bytes.find(_TS_MARKER, 0, json_bytes_len)
         if idx == -1:
             print("TIME SYNC: no timestamp found")
             return
-        start = idx + len(marker)
-        end = raw.index(b'"', start)
-        ts = raw[start:end].decode()
-        raw = None
+        start = idx + len(_TS_MARKER)
+        end = json_bytes.index(b'"', start, json_bytes_len)
+        ts = bytes(json_bytes[start:end]).decode()
         _time_sync[0] = iso8601_to_epoch(ts)
         _time_sync[1] = time.monotonic()
+        schedule.resync(_time_sync[0], _time_sync[1])
         hh, mm, wday = get_pacific_hm_wday(_time_sync[0])
         print("TIME SYNC: " + str(hh) + ":" + str(mm) + " wday=" + str(wday))
         gc.collect()
@@ -935,50 +1272,70 @@ def current_utc_epoch():
         return None
     return _time_sync[0] + int(time.monotonic() - _time_sync[1])
 
-def should_auto_bus():
-    """Return True if current Pacific time is in the auto-bus window."""
-    epoch = current_utc_epoch()
-    if epoch is None:
-        return False
-    hh, mm, wday = get_pacific_hm_wday(epoch)
-    is_weekday = wday <= 4  # Mon=0 .. Fri=4
-    mins = hh * 60 + mm
-    return is_weekday and (7 * 60 + 15) <= mins < (8 * 60 + 15)
-
 checkConnection()
-rebuild_requests()
 
-# Pre-allocate the large flight buffer BEFORE time sync to avoid fragmentation
-gc.collect()
-json_bytes = bytearray(json_size)
+eta_model.load(microcontroller.nvm)
+
+# Allocate the arena BEFORE time sync to avoid fragmentation; it is never freed
+arena.init(ARENA_SIZE, json_size)
+json_bytes = arena.buf
+print("ARENA: heap free " + str(gc.mem_free()) + ", largest block " + str(arena.largest_free_block()) + " after the arena")
+modes.enter("bus")  # HTTP buffers for the boot-time 511 sync
 
 sync_time_from_511()
 
 display.root_group = flight_group
 set_led_color(status_light, 'purple')
 
-# manual_flight: user pressed DOWN to exit bus mode during auto-bus window;
-# stay in flight mode until the window ends or they press UP.
-manual_flight = False
+# Console: poll intervals can be changed at run time (not saved)
+POLL_MIN = {"flight": 5, "bus": 60, "idle": 30}
+
+def _console_poll(args):
+    global QUERY_DELAY, BUS_REFRESH_SECONDS, IDLE_POLL_SECONDS
+    if args:
+        which = args[0].lower()
+        if len(args) != 2 or which not in POLL_MIN:
+            raise ValueError("poll flight|bus|idle <seconds>")
+        sec = int(args[1])
+        if sec < POLL_MIN[which]:
+            raise ValueError(which + " poll must be >= " + str(POLL_MIN[which]) + "s")
+        if which == "flight":
+            QUERY_DELAY = sec - 5  # the flight loop waits QUERY_DELAY + 5
+        elif which == "bus":
+            BUS_REFRESH_SECONDS = sec
+        else:
+            IDLE_POLL_SECONDS = sec
+    return "flight={},bus={},idle={}".format(QUERY_DELAY + 5, BUS_REFRESH_SECONDS, IDLE_POLL_SECONDS)
+
+console.add("poll", _console_poll)
 
+# Buttons and the console pick a mode until the next scheduled change
 while True:
     try:
         w.feed()
+        console.poll()
+        asked = console.take_mode()
         if up_pressed():
-            manual_flight = False
-            run_bus_mode()
+            asked = "bus"
         elif down_pressed():
-            manual_flight = True
-            run_flight_mode()
-        elif should_auto_bus() and not manual_flight:
-            run_bus_mode(auto=True)
+            asked = DEFAULT_MODE
+        if asked is not None:
+            schedule.set_override(asked)
+        mode = wanted_mode()
+        if mode == "bus":
+            run_bus_mode()
+        elif mode == "combined":
+            run_combined_mode()
         else:
-            manual_flight = False  # outside auto window; reset override flag
             run_flight_mode()
-    except WatchDogTimeout:
+    except WatchDogTimeout as e:
         w.feed()
         print("Watchdog timeout at top level")
+        telemetry.record_exception(e)
+        power.sleep(1)
     except Exception as e:
         w.feed()
         print("Top level error:", e)
+        telemetry.record_exception(e)
+        power.sleep(1)  # an error that repeats at once must not spin the loop
 
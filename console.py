@@ -0,0 +1,178 @@
+# ============================================================
+# console.py
+# Command console on the USB serial port, polled from the loops
+#
+# - poll() never blocks: it only reads the bytes that
+#   supervisor.runtime.serial_bytes_available says are waiting
+#   (at most READ_MAX per call) into a fixed line buffer
+# - A line ending in CR or LF runs one command
+# - Every reply is one CSV line, easy to grep or parse:
+#     CON,<cmd>,<key>=<value>,...
+#     CON,ERR,<cmd>,<reason>
+# - Mode switches and refreshes are only requested here
+#   (want_mode / want_refresh); the loops in code.py act on them
+# - code.py adds its own commands with add(name, fn); fn(args)
+#   returns the reply fields as a str, or raises ValueError
+#
+# Commands: help, heap, cache, quota, trace on|off|dump,
+#   mode flight|bus|combined, refresh, poll [flight|bus|idle <s>]
+# ============================================================
+
+import gc
+import sys
+import time
+
+import arena
+import flights
+import http_client
+import predict
+import tracing
+
+try:
+    from supervisor import runtime as _runtime
+except ImportError:
+    _runtime = None  # host: nothing to read
+
+LINE_SIZE = 64
+READ_MAX = 16  # bytes per poll(), so a paste can't stall the display
+
+LIMIT_511 = 60  # 511.org requests per hour per API key
+
+enabled = True
+modes = ("flight", "bus")  # what `mode` accepts; code.py adds "combined"
+current = None             # mode running now, set by code.py
+want_mode = None
+want_refresh = False
+
+_line = bytearray(LINE_SIZE)
+_len = 0
+_overflow = False
+_start = time.monotonic()
+_commands = {}
+
+def add(name, fn):
+    _commands[name] = fn
+
+def reply(cmd, fields=""):
+    if fields:
+        print("CON," + cmd + "," + fields)
+    else:
+        print("CON," + cmd + ",ok")
+
+def error(cmd, reason):
+    print("CON,ERR," + cmd + "," + reason)
+
+def poll():
+    """Read what has arrived and run a complete line, if any."""
+    global _len, _overflow
+    if not enabled or _runtime is None:
+        return
+    n = 0
+    while n < READ_MAX and _runtime.serial_bytes_available:
+        c = sys.stdin.read(1)
+        n += 1
+        if c == "\r" or c == "\n":
+            if _len and not _overflow:
+                run(bytes(_line[:_len]).decode())
+            elif _overflow:
+                error("-", "line too long")
+            _len = 0
+            _overflow = False
+        elif _len < LINE_SIZE:
+            _line[_len] = ord(c) & 0x7F
+            _len += 1
+        else:
+            _overflow = True
+
+def run(line):
+    args = line.split()
+    if not args:
+        return
+    cmd = args[0].lower()
+    fn = _commands.get(cmd)
+    if fn is None:
+        error(cmd, "unknown command")
+        return
+    try:
+        out = fn(args[1:])
+    except ValueError as e:
+        error(cmd, str(e))
+        return
+    reply(cmd, out)
+
+def take_mode():
+    """The mode asked for on the console (once), or None."""
+    global want_mode
+    m = want_mode
+    want_mode = None
+    return m
+
+def take_refresh():
+    global want_refresh
+    r = want_refresh
+    want_refresh = False
+    return r
+
+def _help(args):
+    return "commands=" + " ".join(sorted(_commands))
+
+def _heap(args):
+    gc.collect()
+    return ("free={},alloc={},largest={},arena_mode={},arena_used={},arena_free={}"
+            .format(gc.mem_free(), gc.mem_alloc(), arena.largest_free_block(),
+                    arena.mode(), arena.used(), arena.free()))
+
+def _cache(args):
+    """The prefetched next flight (predict.py) is the only cache on the board."""
+    ahead = "-"
+    if predict.pending():
+        ahead = flights.text(predict.ahead, flights.F_ID)
+    total = predict.hits + predict.misses
+    rate = predict.hits * 100 // total if total else 0
+    return ("prefetch={},in={},ready={},hits={},misses={},hit_pct={}"
+            .format(ahead, predict.ahead_in, int(predict.ready), predict.hits, predict.misses, rate))
+
+def _quota(args):
+    """No token bucket: requests per endpoint and the 511 hourly rate since boot."""
+    up = int(time.monotonic() - _start)
+    out = "uptime={},requests={}".format(up, http_client.request_count)
+    for i in range(1, len(tracing.EP_NAMES)):
+        out += "," + tracing.EP_NAMES[i] + "=" + str(http_client.ep_requests[i])
+    n511 = http_client.ep_requests[tracing.EP_511_STOP] + http_client.ep_requests[tracing.EP_511_TIME]
+    return out + ",511_per_h={},511_limit={}".format(n511 * 3600 // max(up, 1), LIMIT_511)
+
+def _trace(args):
+    """stall_max_ms: the longest a fetch held the display loop (http_client)."""
+    if args:
+        a = args[0].lower()
+        if a == "dump":
+            tracing.dump()
+        elif a in ("on", "off"):
+            tracing.set_enabled(a == "on")
+        else:
+            raise ValueError("trace on|off|dump")
+    return "on={},stall_max_ms={}".format(int(tracing.enabled), http_client.stall_max_ms)
+
+def _mode(args):
+    global want_mode
+    if not args:
+        return "mode=" + str(current)
+    m = args[0].lower()
+    if m not in modes:
+        raise ValueError("mode " + "|".join(modes))
+    if m != current:
+        want_mode = m
+    return "mode=" + m
+
+def _refresh(args):
+    global want_refresh
+    want_refresh = True
+    return ""
+
+add("help", _help)
+add("heap", _heap)
+add("cache", _cache)
+add("quota", _quota)
+add("trace", _trace)
+add("mode", _mode)
+add("refresh", _refresh)
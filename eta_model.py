@@ -0,0 +1,155 @@
+# ============================================================
+# eta_model.py
+# Per-stop, per-hour ETA drift correction learned on the device
+#
+# Every 511 refresh shows how far the plain countdown was off:
+#     error = new_eta - (old_eta - elapsed)
+# That error per second of countdown (the drift rate, in permille)
+# is averaged per stop, per Pacific hour, and per kind of bus:
+#     kind 0 = normal headway
+#     kind 1 = bunched (within BUNCH_SECONDS of the bus ahead)
+# The countdown then runs at (1000 - rate)/1000 of real time.
+#
+# The table is 2 stops x 24 hours x 2 kinds x 3 bytes, kept in RAM
+# and written to NVM at most once per SAVE_EVERY updates.
+# ============================================================
+
+import struct
+
+NVM_BASE = 512  # telemetry.py owns the start of NVM
+MAX_STOPS = 2
+HOURS = 24
+KINDS = 2
+_MAGIC = b"E1"
+_HDR_SIZE = 4
+_ENTRY = 3  # i16 mean rate (permille), u8 sample count
+TABLE_SIZE = _HDR_SIZE + MAX_STOPS * HOURS * KINDS * _ENTRY
+
+BUNCH_SECONDS = 180   # buses closer than this are "bunched"
+MIN_ELAPSED = 30      # refreshes closer together than this teach nothing
+MIN_ETA = 60          # a bus this close is at the stop; its ETA is noise
+MATCH_SECONDS = 150   # max distance to pair an old bus with a new one
+MAX_RATE = 900
+MIN_SAMPLES = 3       # don't correct until a slot has this many samples
+EMA_WEIGHT = 8        # after EMA_WEIGHT samples the mean becomes an EMA
+SAVE_EVERY = 30
+
+_table = bytearray(TABLE_SIZE)
+_nvm = None
+_dirty = 0
+enabled = True
+
+def load(nvm=None):
+    """Load the table from NVM (or start empty); nvm=None keeps it in RAM."""
+    global _nvm, _dirty
+    _nvm = nvm
+    if nvm is not None and len(nvm) >= NVM_BASE + TABLE_SIZE:
+        _table[:] = nvm[NVM_BASE:NVM_BASE + TABLE_SIZE]
+    else:
+        _nvm = None
+    if _table[0:2] != _MAGIC:
+        reset()
+    _dirty = 0
+
+def reset():
+    """Forget everything learned."""
+    global _dirty
+    for i in range(TABLE_SIZE):
+        _table[i] = 0
+    _table[0:2] = _MAGIC
+    _dirty = SAVE_EVERY
+
+def save():
+    global _dirty
+    if _nvm is not None and _dirty:
+        _nvm[NVM_BASE:NVM_BASE + TABLE_SIZE] = _table
+    _dirty = 0
+
+def maybe_save():
+    """Persist only after enough updates, to spare the flash."""
+    if _dirty >= SAVE_EVERY:
+        save()
+
+def _off(stop, hour, kind):
+    return _HDR_SIZE + ((stop * HOURS + hour) * KINDS + kind) * _ENTRY
+
+def slot(stop, hour, kind):
+    """(mean rate permille, sample count) for one slot."""
+    off = _off(stop, hour, kind)
+    return struct.unpack_from("<h", _table, off)[0], _table[off + 2]
+
+def _learn(stop, hour, kind, rate):
+    global _dirty
+    off = _off(stop, hour, kind)
+    mean = struct.unpack_from("<h", _table, off)[0]
+    n = _table[off + 2]
+    if n < 255:
+        n += 1
+    w = min(n, EMA_WEIGHT)
+    d = rate - mean
+    # rounded, not floored: // alone pulls the mean down a little every sample
+    mean += (d + w // 2) // w if d >= 0 else -((w // 2 - d) // w)
+    struct.pack_into("<h", _table, off, mean)
+    _table[off + 2] = n
+    _dirty += 1
+
+def _kind(etas, i):
+    if i > 0 and etas[i - 1] is not None and etas[i] - etas[i - 1] < BUNCH_SECONDS:
+        return 1
+    return 0
+
+def observe(stop, hour, prev, new, elapsed):
+    """Learn from the previous raw ETAs `prev`, `elapsed` seconds before `new`.
+
+    Both lists are sorted seconds (None = no bus). Returns samples learned.
+    """
+    if elapsed < MIN_ELAPSED or stop >= MAX_STOPS:
+        return 0
+    learned = 0
+    used = 0  # bitmask of matched entries in new
+    for i in range(len(prev)):
+        p = prev[i]
+        if p is None or p < MIN_ETA:
+            continue
+        pred = p - elapsed
+        best = -1
+        best_d = MATCH_SECONDS + 1
+        for j in range(len(new)):
+            v = new[j]
+            if v is None or used & (1 << j):
+                continue
+            d = v - pred if v >= pred else pred - v
+            if d < best_d:
+                best = j
+                best_d = d
+        if best < 0:
+            continue
+        used |= 1 << best
+        rate = (new[best] - pred) * 1000 // elapsed
+        if rate > MAX_RATE:
+            rate = MAX_RATE
+        elif rate < -MAX_RATE:
+            rate = -MAX_RATE
+        _learn(stop, hour, _kind(prev, i), rate)
+        learned += 1
+    return learned
+
+def rates(stop, hour, etas, out):
+    """Fill out[i] with the drift rate (permille) to apply to etas[i]."""
+    for i in range(len(etas)):
+        r = 0
+        if enabled and etas[i] is not None and stop < MAX_STOPS:
+            mean, n = slot(stop, hour, _kind(etas, i))
+            if n >= MIN_SAMPLES:
+                r = mean
+        out[i] = r
+
+def project(raw, elapsed, rate, out):
+    """Countdown `elapsed` seconds after the refresh that produced raw."""
+    for i in range(len(raw)):
+        v = raw[i]
+        if v is None:
+            out[i] = None
+            continue
+        nv = v - elapsed * (1000 - rate[i]) // 1000
+        out[i] = nv if nv > 0 else 0
@@ -0,0 +1,191 @@
+# ============================================================
+# flights.py
+# The fixed flight display record and the search box, shared by
+# every flight data provider
+#
+# A record is three preallocated buffers: fixed-width text slots,
+# their lengths, and ints (position in 1e-5 degrees, feet, knots).
+# Providers fill `rec` straight from the JSON scanner; code.py only
+# turns it into label strings when a flight is shown. The text and
+# lengths of `rec` and `cand` live in the arena (place()).
+#
+# Provider modules (fr24.py, adsb.py) all have:
+#   NAME, HAS_DETAILS
+#   search                       (host, path, port, tls, headers, ep)
+#   search_begin() / search_sink(mv) / search_end(status)
+#       -> flight id (str) with rec filled, or False
+#   details_target(fid)          same tuple as search
+#   details_begin(r) / details_sink(mv) / details_end(status) -> bool
+# and call seen(r) for every complete aircraft a search scans.
+# ============================================================
+
+from array import array
+
+import jsonscan
+
+# text fields
+F_ID = 0         # provider's flight id (FR24 id, ICAO hex)
+F_FLIGHT = 1     # flight number
+F_CALLSIGN = 2
+F_REG = 3
+F_AIRLINE = 4
+F_ORIG = 5       # IATA code
+F_ORIG_NAME = 6
+F_DEST = 7
+F_DEST_NAME = 8
+F_TYPE = 9       # ICAO type code
+F_MODEL = 10
+WIDTHS = (12, 10, 10, 10, 32, 4, 40, 4, 40, 6, 40)
+N_FIELDS = len(WIDTHS)
+
+# int fields
+N_LAT = 0        # 1e-5 degrees
+N_LON = 1
+N_ALT = 2        # feet
+N_SPEED = 3      # knots
+N_TRACK = 4      # degrees
+N_NUMS = 5
+NO_VALUE = -0x3FFFFFFF
+
+SCALE = 5  # decimals kept for lat/lon
+
+_OFFS = []
+_off = 0
+for _w in WIDTHS:
+    _OFFS.append(_off)
+    _off += _w
+_OFFS = tuple(_OFFS)
+TEXT_SIZE = _off
+RECORD_SIZE = TEXT_SIZE + N_FIELDS  # text + lengths of one record
+
+def new_record(mem=None):
+    """[text, lengths, nums], all preallocated.
+
+    Text and lengths are slices of mem (a RECORD_SIZE memoryview) when given.
+    """
+    if mem is None:
+        return [bytearray(TEXT_SIZE), bytearray(N_FIELDS), array("l", [NO_VALUE] * N_NUMS)]
+    r = unplaced()
+    point(r, mem)
+    return r
+
+def unplaced():
+    """A record with its own nums; point() gives it text and lengths."""
+    return [None, None, array("l", [NO_VALUE] * N_NUMS)]
+
+def point(r, mem):
+    """Re-point r's text and lengths at mem and clear it; nums stay r's own."""
+    r[0] = mem[0:TEXT_SIZE]
+    r[1] = mem[TEXT_SIZE:RECORD_SIZE]
+    clear(r)
+
+def heap(n):
+    """take() for host tools: a slot on the heap instead of the arena."""
+    return memoryview(bytearray(n))
+
+# allocated once; place() only re-points their text and lengths
+rec = unplaced()   # what the display shows next
+cand = unplaced()  # the aircraft a provider's search is scanning
+on_seen = None  # hook(r) for every aircraft a search scans (predict.consider)
+
+def place(take):
+    """Point rec and cand at slots from take(n) (arena.take), cleared."""
+    point(rec, take(RECORD_SIZE))
+    point(cand, take(RECORD_SIZE))
+
+def seen(r):
+    if on_seen is not None:
+        on_seen(r)
+
+def clear(r):
+    lens = r[1]
+    nums = r[2]
+    for i in range(N_FIELDS):
+        lens[i] = 0
+    for i in range(N_NUMS):
+        nums[i] = NO_VALUE
+
+def copy(dst, src):
+    dst[0][:] = src[0]
+    dst[1][:] = src[1]
+    nums = dst[2]
+    for i in range(N_NUMS):
+        nums[i] = src[2][i]
+
+def put(r, f):
+    """Store the scanner's current scalar in text field f (null -> empty)."""
+    if jsonscan.is_null():
+        r[1][f] = 0
+        return
+    n = jsonscan.copy_value(r[0], _OFFS[f], WIDTHS[f])
+    # callsigns come space padded from ADS-B feeds
+    while n and r[0][_OFFS[f] + n - 1] == 32:
+        n -= 1
+    r[1][f] = n
+
+def put_num(r, n, scale=0):
+    """Store the scanner's current scalar in int field n (not a number -> NO_VALUE)."""
+    v = jsonscan.number(scale)
+    r[2][n] = NO_VALUE if v is None else v
+
+def put_bytes(r, f, b, n):
+    n = min(n, WIDTHS[f])
+    off = _OFFS[f]
+    r[0][off:off + n] = b[:n]
+    r[1][f] = n
+
+def has(r, f):
+    return r[1][f] > 0
+
+def text(r, f):
+    """Field f as a str ("" if empty). Allocates; call when displaying."""
+    n = r[1][f]
+    if not n:
+        return ""
+    off = _OFFS[f]
+    raw = bytes(r[0][off:off + n])
+    try:
+        return raw.decode()
+    except UnicodeError:
+        # a multi-byte character cut at the field width
+        return "".join(chr(c) if c < 128 else "?" for c in raw)
+
+def parse_fixed(s, scale=SCALE):
+    """"-122.15" -> -12215000 at scale 5, without going through float."""
+    s = s.strip()
+    neg = s.startswith("-")
+    if neg or s.startswith("+"):
+        s = s[1:]
+    parts = s.split(".")
+    whole = parts[0]
+    frac = ((parts[1] if len(parts) > 1 else "") + "0" * scale)[:scale]
+    v = int(whole or "0") * 10 ** scale + int(frac or "0")
+    return -v if neg else v
+
+def fmt_fixed(v, scale=SCALE):
+    neg = v < 0
+    v = -v if neg else v
+    d = 10 ** scale
+    s = str(v // d) + "." + ("0" * scale + str(v % d))[-scale:]
+    return "-" + s if neg else s
+
+def parse_box(spec):
+    """bounds_box "top,bottom,left,right" -> (top, bottom, left, right) fixed ints."""
+    parts = [p for p in spec.split(",") if p.strip()]
+    if len(parts) != 4:
+        raise ValueError("bounds_box needs top,bottom,left,right")
+    top, bottom, left, right = [parse_fixed(p) for p in parts]
+    if top < bottom:
+        top, bottom = bottom, top
+    if right < left:
+        left, right = right, left
+    return top, bottom, left, right
+
+def in_box(box, lat, lon):
+    return box[1] <= lat <= box[0] and box[2] <= lon <= box[3]
+
+def box_distance(box, lat, lon):
+    """Manhattan distance (fixed units) from the box centre; no long ints."""
+    dlat = lat - (box[0] + box[1]) // 2
+    dlon = lon - (box[2] + box[3]) // 2
+    return (dlat if dlat >= 0 else -dlat) + (dlon if dlon >= 0 else -dlon)
@@ -0,0 +1,240 @@
+# ============================================================
+# fr24.py
+# Flight data provider: flightradar24 feed.js + clickhandler
+#
+# (unofficial endpoints; see the README note about them going paid)
+# - Search: feed.js for the bounds box. With limit=1 the first
+#   flight array (at least 14 fields) becomes the record and the
+#   rest of the body is not read; its key is the FR24 flight id
+#   used for the details lookup
+# - With a larger limit, or a search_box (predict.py, at least
+#   PREDICT_LIMIT), each flight is scanned into one reused record
+#   and dropped as soon as it is outside the bounds box or on the
+#   ground; the one nearest the centre wins. Memory use is the
+#   same for 1 or 200 flights
+# - Details: clickhandler JSON is scanned for the handful of fields
+#   the display needs; reading stops once trail[0] is complete,
+#   so the rest of the (long) trail is never downloaded
+# ============================================================
+
+import flights
+import jsonscan
+import tracing
+from jsonscan import key, EV_VALUE, EV_OPEN, EV_CLOSE
+
+NAME = "fr24"
+HAS_DETAILS = True
+
+SEARCH_HOST = "data-cloud.flightradar24.com"
+SEARCH_HEAD = "/zones/fcgi/feed.js?bounds="
+SEARCH_TAIL = "&faa=1&satellite=1&mlat=1&flarm=1&adsb=1&gnd=0&air=1&vehicles=0&estimated=0&maxage=14400&gliders=0&stats=0&ems=1&limit="
+DETAILS_HOST = "data-live.flightradar24.com"
+DETAILS_HEAD = "/clickhandler/?flight="
+PREDICT_LIMIT = 30
+MAX_LIMIT = 200
+
+# Pre-encoded header block sent with every FR24 request
+HEADERS = (
+    b"User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:106.0) Gecko/20100101 Firefox/106.0\r\n"
+    b"cache-control: no-store, no-cache, must-revalidate, post-check=0, pre-check=0\r\n"
+    b"accept: application/json\r\n"
+)
+
+search = None
+_details_host = DETAILS_HOST
+_port = 443
+_tls = True
+_box = None   # bounds box to pick from; None = limit=1, take the first flight and stop
+_drop = True  # skip the rest of a flight once it fails the filter (no on_seen hook)
+
+def configure(bounds_box, host=SEARCH_HOST, details_host=DETAILS_HOST, port=443, tls=True,
+              search_box=None, limit=1):
+    """bounds_box is the settings.toml string, sent as-is (or search_box if given)."""
+    global search, _details_host, _port, _tls, _box
+    _details_host = details_host
+    _port = port
+    _tls = tls
+    limit = min(max(1, limit), MAX_LIMIT)
+    if search_box:
+        limit = max(limit, PREDICT_LIMIT)
+    # with limit=1 the feed has already done the bounds filtering
+    _box = flights.parse_box(bounds_box) if limit > 1 else None
+    search = (host, (SEARCH_HEAD, search_box or bounds_box, SEARCH_TAIL, str(limit)),
+              port, tls, HEADERS, tracing.EP_FR24_FEED)
+
+# feed.js: "<id>": [hex, lat, lon, track, alt, speed, squawk, radar, type,
+#                   reg, time, origin, destination, flight, ground, vspeed, callsign, ...]
+_K_FULL_COUNT = key("full_count")
+_K_VERSION = key("version")
+_K_STATS = key("stats")
+_MIN_FIELDS = 14
+
+_cand = None  # flights.cand (an arena slot), picked up by search_begin()
+_in_flight = False
+_ground = False  # the flight being scanned is on the ground: never shown
+_fields = 0
+_found = False
+_best = 0
+aircraft_seen = 0     # flights scanned by the last search
+aircraft_dropped = 0  # of those, left half-read: outside the box or on the ground
+
+def _reject():
+    """Stop filling _cand: this flight can't be shown and nobody else wants it."""
+    global _in_flight, aircraft_dropped
+    _in_flight = False
+    aircraft_dropped += 1
+
+def _on_search(ev):
+    global _in_flight, _ground, _fields, _found, _best, aircraft_seen
+    d = jsonscan.depth
+    if ev == EV_VALUE:
+        if _in_flight and d == 2:
+            i = jsonscan.at(1)
+            _fields = i + 1
+            r = _cand
+            if i == 1:
+                flights.put_num(r, flights.N_LAT, flights.SCALE)
+            elif i == 2:
+                flights.put_num(r, flights.N_LON, flights.SCALE)
+                if _drop and _box is not None and not flights.in_box(
+                        _box, r[2][flights.N_LAT], r[2][flights.N_LON]):
+                    _reject()
+            elif i == 3:
+                flights.put_num(r, flights.N_TRACK)
+            elif i == 4:
+                flights.put_num(r, flights.N_ALT)
+            elif i == 5:
+                flights.put_num(r, flights.N_SPEED)
+            elif i == 8:
+                flights.put(r, flights.F_TYPE)
+            elif i == 9:
+                flights.put(r, flights.F_REG)
+            elif i == 11:
+                flights.put(r, flights.F_ORIG)
+            elif i == 12:
+                flights.put(r, flights.F_DEST)
+            elif i == 13:
+                flights.put(r, flights.F_FLIGHT)
+            elif i == 14:
+                if jsonscan.number():  # on the ground (gnd=0 should already leave these out)
+                    _ground = True
+                    if _drop:
+                        _reject()
+            elif i == 16:
+                flights.put(r, flights.F_CALLSIGN)
+    elif ev == EV_OPEN:
+        if d == 1 and jsonscan.value_kind == jsonscan.T_ARR and not (_found and _box is None):
+            k = jsonscan.at(0)
+            if k != _K_FULL_COUNT and k != _K_VERSION and k != _K_STATS:
+                flights.clear(_cand)
+                flights.put_bytes(_cand, flights.F_ID, jsonscan.keybuf, jsonscan.key_len)
+                _in_flight = True
+                _ground = False
+                _fields = 0
+                aircraft_seen += 1
+    elif ev == EV_CLOSE:
+        if d == 1 and _in_flight:
+            _in_flight = False
+            if _fields < _MIN_FIELDS:
+                return
+            flights.seen(_cand)
+            if _ground:
+                return
+            nums = _cand[2]
+            lat = nums[flights.N_LAT]
+            lon = nums[flights.N_LON]
+            if _box is None:
+                flights.copy(flights.rec, _cand)
+                _found = True
+                return
+            if not flights.in_box(_box, lat, lon):
+                return
+            dist = flights.box_distance(_box, lat, lon)
+            if not _found or dist < _best:
+                flights.copy(flights.rec, _cand)
+                _best = dist
+                _found = True
+
+def search_begin():
+    global _cand, _in_flight, _found, _drop, aircraft_seen, aircraft_dropped
+    _cand = flights.cand
+    _in_flight = _found = False
+    _drop = flights.on_seen is None  # predict.py wants every flight in full
+    aircraft_seen = aircraft_dropped = 0
+    jsonscan.begin(_on_search)
+
+def search_sink(mv):
+    jsonscan.feed(mv)
+    return _found and _box is None  # limit=1: nothing else to read
+
+def search_end(status):
+    if status != 200 or not _found:
+        return False
+    return flights.text(flights.rec, flights.F_ID)
+
+# clickhandler paths -> record fields
+_DETAILS = (
+    ((key("identification"), key("number"), key("default")), flights.F_FLIGHT),
+    ((key("identification"), key("callsign")), flights.F_CALLSIGN),
+    ((key("aircraft"), key("model"), key("code")), flights.F_TYPE),
+    ((key("aircraft"), key("model"), key("text")), flights.F_MODEL),
+    ((key("aircraft"), key("registration")), flights.F_REG),
+    ((key("airline"), key("name")), flights.F_AIRLINE),
+    ((key("airport"), key("origin"), key("name")), flights.F_ORIG_NAME),
+    ((key("airport"), key("origin"), key("code"), key("iata")), flights.F_ORIG),
+    ((key("airport"), key("destination"), key("name")), flights.F_DEST_NAME),
+    ((key("airport"), key("destination"), key("code"), key("iata")), flights.F_DEST),
+)
+_K_TRAIL = key("trail")
+_P_TRAIL0 = (_K_TRAIL, 0)
+_K_ALT = key("alt")
+_K_SPD = key("spd")
+_K_HD = key("hd")
+_K_LAT = key("lat")
+_K_LNG = key("lng")
+
+_done = False
+_drec = None  # set by details_begin()
+
+def _on_details(ev):
+    global _done
+    d = jsonscan.depth
+    if ev == EV_VALUE:
+        if d == 3 and jsonscan.at(0) == _K_TRAIL and jsonscan.at(1) == 0:
+            k = jsonscan.at(2)
+            r = _drec
+            if k == _K_ALT:
+                flights.put_num(r, flights.N_ALT)
+            elif k == _K_SPD:
+                flights.put_num(r, flights.N_SPEED)
+            elif k == _K_HD:
+                flights.put_num(r, flights.N_TRACK)
+            elif k == _K_LAT:
+                flights.put_num(r, flights.N_LAT, flights.SCALE)
+            elif k == _K_LNG:
+                flights.put_num(r, flights.N_LON, flights.SCALE)
+            return
+        if 2 <= d <= 4:
+            for p, f in _DETAILS:
+                if jsonscan.path(p):
+                    flights.put(_drec, f)
+                    return
+    elif ev == EV_CLOSE and d == 2 and jsonscan.path(_P_TRAIL0):
+        _done = True
+
+def details_target(fid):
+    return (_details_host, (DETAILS_HEAD, fid), _port, _tls, HEADERS, tracing.EP_FR24_DETAILS)
+
+def details_begin(r=None):
+    """Details go into r (default flights.rec) over what the search filled in."""
+    global _done, _drec
+    _done = False
+    _drec = flights.rec if r is None else r
+    jsonscan.begin(_on_details)
+
+def details_sink(mv):
+    jsonscan.feed(mv)
+    return _done
+
+def details_end(status):
+    return status == 200 and _done
@@ -0,0 +1,356 @@
+# ============================================================
+# http_client.py
+# Shared HTTP/1.1 client for both modes (ESP32SPI sockets)
+#
+# - One request buffer and one receive ring, reused by every
+#   request (no per-request buffers, no string joins); both are
+#   slots in the arena's mode region, placed by place()
+# - Incremental header parsing, chunked + identity bodies
+# - Body bytes go to a callback as memoryview slices of the ring
+# - Per-request deadline; the watchdog is fed on every read
+# - Optional idle hook so the display keeps animating during a fetch:
+#   reads wait at most RECV_SLICE before the hook runs again. DNS
+#   and connect (+ TLS) are single blocking calls into the ESP32;
+#   stall_max_ms is the longest the hook was held off since boot
+# - Retries with backoff, only before any body byte was delivered
+# - DNS / connect / TLS / TTFB / body spans go to tracing.py
+# ============================================================
+
+import time
+from array import array
+
+import tracing
+
+REQ_SIZE = 640
+RING_SIZE = 1024
+SOCK_TIMEOUT = 5     # a read fails after this long without a byte
+RECV_SLICE = 0.1     # socket timeout per recv_into; the idle hook runs between
+DEFAULT_TIMEOUT = 12
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+_req = None      # memoryview, REQ_SIZE bytes
+_ring = None     # bytearray holding the ring at [_r0, _r1) (.find() needs a bytearray)
+_ring_mv = None
+_r0 = 0
+_r1 = 0
+
+_radio = None
+_pool = None
+_feed = None
+_sleep_fn = time.sleep
+_idle = None
+_body_started = False
+_t_first = -1
+request_count = 0  # attempts, including retries
+stall_max_ms = 0   # longest gap between two idle hook calls in a request
+_t_tick = -1
+ep_requests = array("L", [0] * len(tracing.EP_NAMES))  # the same, per tracing endpoint
+
+# parser states
+_ST_STATUS = 0
+_ST_HEADERS = 1
+_ST_BODY = 2
+_ST_CHUNK_SIZE = 3
+_ST_CHUNK_DATA = 4
+_ST_CHUNK_CRLF = 5
+
+_HDR_CONTENT_LENGTH = b"content-length:"
+_HDR_TRANSFER_ENCODING = b"transfer-encoding:"
+
+def _no_feed():
+    pass
+
+def init(radio, feed=None, sleep=None):
+    """Bind the client to the ESP32SPI radio; feed() is called while waiting.
+
+    sleep(seconds) waits out retry backoff (power.sleep, so it counts as idle).
+    """
+    global _radio, _pool, _feed, _sleep_fn
+    from adafruit_esp32spi.adafruit_esp32spi_socketpool import SocketPool
+    _radio = radio
+    _pool = SocketPool(radio)
+    _feed = feed or _no_feed
+    _sleep_fn = sleep or time.sleep
+
+def place(req, ring, ring_off):
+    """Use req (a REQ_SIZE memoryview) for requests and
+    ring[ring_off:ring_off + RING_SIZE] as the receive ring.
+
+    modes.enter() places both in the arena on every mode entry.
+    """
+    global _req, _ring, _ring_mv, _r0, _r1
+    _req = req
+    _ring = ring
+    _ring_mv = memoryview(ring)
+    _r0 = ring_off
+    _r1 = ring_off + RING_SIZE
+
+def set_idle(fn):
+    """fn() is called whenever the client waits (None to remove)."""
+    global _idle
+    _idle = fn
+
+try:
+    _TIMEOUT = TimeoutError  # socketpool's "timed out"
+except NameError:
+    _TIMEOUT = ()
+
+def _tick():
+    global _t_tick, stall_max_ms
+    now = tracing.ticks_ms()
+    if _t_tick >= 0:
+        gap = tracing.ticks_diff(now, _t_tick)
+        if gap > stall_max_ms:
+            stall_max_ms = gap
+    _t_tick = now
+    _feed()
+    if _idle is not None:
+        _idle()
+
+def _put(pos, s):
+    """Copy str/bytes s into the request buffer at pos, return the new pos."""
+    n = len(s)
+    if pos + n > REQ_SIZE:
+        raise ValueError("HTTP request too large")
+    if isinstance(s, str):
+        for i in range(n):
+            _req[pos + i] = ord(s[i])
+    else:
+        _req[pos:pos + n] = s
+    return pos + n
+
+def _build_request(host, port, path, headers):
+    pos = _put(0, b"GET ")
+    if isinstance(path, tuple):
+        for part in path:
+            pos = _put(pos, part)
+    else:
+        pos = _put(pos, path)
+    pos = _put(pos, b" HTTP/1.1\r\nHost: ")
+    pos = _put(pos, host)
+    if port is not None:
+        pos = _put(pos, b":")
+        pos = _put(pos, str(port))
+    pos = _put(pos, b"\r\nConnection: close\r\n")
+    if headers:
+        pos = _put(pos, headers)
+    return _put(pos, b"\r\n")
+
+def _sleep(seconds):
+    """Sleep in short slices so the watchdog keeps getting fed."""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        _tick()
+        _sleep_fn(0.05 if _idle is not None else 0.25)
+
+def _open(host, port, tls, ep):
+    sock = _pool.socket(_pool.AF_INET, _pool.SOCK_STREAM)
+    sock.settimeout(RECV_SLICE)
+    _tick()
+    try:
+        t = tracing.start()
+        if tls:
+            # ESP32 firmware does the TLS handshake; it needs the hostname
+            sock.connect((host, port or 443), _radio.TLS_MODE)
+            tracing.span(ep, tracing.PH_TLS, t)
+        else:
+            addr = _radio.get_host_by_name(host)
+            t = tracing.span(ep, tracing.PH_DNS, t)
+            _tick()
+            sock.connect((addr, port or 80))
+            tracing.span(ep, tracing.PH_CONNECT, t)
+    except BaseException:
+        sock.close()
+        raise
+    _tick()
+    return sock
+
+def _timed_out(e):
+    """A recv slice that ended without data."""
+    return isinstance(e, _TIMEOUT) or (len(e.args) > 0 and e.args[0] == 110)  # ETIMEDOUT
+
+def _recv(sock, pos, deadline):
+    """recv_into the ring, RECV_SLICE at a time so the idle hook keeps running."""
+    quiet = time.monotonic() + SOCK_TIMEOUT
+    while True:
+        _tick()
+        if time.monotonic() > deadline:
+            raise OSError("HTTP deadline exceeded")
+        try:
+            return sock.recv_into(_ring_mv[pos:_r1])
+        except OSError as e:
+            if not _timed_out(e) or time.monotonic() > quiet:
+                raise
+
+def _header_is(start, end, name):
+    """Case-insensitive check that the line at start begins with name."""
+    n = len(name)
+    if end - start < n:
+        return False
+    for i in range(n):
+        c = _ring[start + i]
+        if 65 <= c <= 90:
+            c += 32
+        if c != name[i]:
+            return False
+    return True
+
+def _parse_int(start, end, base):
+    v = 0
+    seen = False
+    for i in range(start, end):
+        c = _ring[i]
+        if 48 <= c <= 57:
+            d = c - 48
+        elif base == 16 and 97 <= (c | 32) <= 102:
+            d = (c | 32) - 87
+        elif c == 32 and not seen:
+            continue
+        else:
+            break
+        v = v * base + d
+        seen = True
+    if not seen:
+        raise ValueError("HTTP bad number")
+    return v
+
+def _exchange(sock, on_body, deadline, ep, t_sent):
+    """Read and parse one response; returns the HTTP status code."""
+    status = _parse(sock, on_body, deadline, ep, t_sent)
+    if _t_first >= 0:
+        tracing.span(ep, tracing.PH_BODY, _t_first)
+    return status
+
+def _parse(sock, on_body, deadline, ep, t_sent):
+    global _body_started, _t_first
+    _t_first = -1
+    state = _ST_STATUS
+    status = 0
+    chunked = False
+    remaining = -1  # identity: -1 = until close; chunked: left in chunk
+    skipping = False
+    start = end = _r0
+
+    while True:
+        if state == _ST_BODY or state == _ST_CHUNK_DATA:
+            if start < end:
+                n = end - start
+                if 0 <= remaining < n:
+                    n = remaining
+                _body_started = True
+                if on_body(_ring_mv[start:start + n]):
+                    return status
+                start += n
+                if remaining >= 0:
+                    remaining -= n
+                    if remaining == 0:
+                        if not chunked:
+                            return status
+                        state = _ST_CHUNK_CRLF
+                continue
+        else:
+            eol = _ring.find(b"\r\n", start, end)
+            if eol != -1:
+                if skipping:
+                    skipping = False
+                elif state == _ST_STATUS:
+                    sp = _ring.find(b" ", start, eol)
+                    if sp == -1:
+                        raise ValueError("HTTP bad status line")
+                    status = _parse_int(sp + 1, eol, 10)
+                    state = _ST_HEADERS
+                elif state == _ST_HEADERS:
+                    if eol == start:
+                        if chunked:
+                            state = _ST_CHUNK_SIZE
+                        elif remaining == 0 or status == 204 or status == 304:
+                            return status
+                        else:
+                            state = _ST_BODY
+                    elif _header_is(start, eol, _HDR_CONTENT_LENGTH):
+                        remaining = _parse_int(start + len(_HDR_CONTENT_LENGTH), eol, 10)
+                    elif _header_is(start, eol, _HDR_TRANSFER_ENCODING):
+                        chunked = _ring.find(b"chunked", start, eol) != -1
+                elif state == _ST_CHUNK_SIZE:
+                    remaining = _parse_int(start, eol, 16)
+                    if remaining == 0:
+                        return status  # trailers are ignored
+                    state = _ST_CHUNK_DATA
+                else:  # _ST_CHUNK_CRLF
+                    state = _ST_CHUNK_SIZE
+                start = eol + 2
+                continue
+            if start == _r0 and end == _r1:
+                if state != _ST_HEADERS:
+                    raise ValueError("HTTP line too long")
+                # Oversized header (cookies): drop it, keep a possible '\r'
+                skipping = True
+                _ring[_r0] = _ring[end - 1]
+                end = _r0 + 1
+
+        # Need more bytes: recycle or compact the ring, then read
+        if start == end:
+            start = end = _r0
+        elif end == _r1:
+            n = end - start
+            _ring[_r0:_r0 + n] = _ring_mv[start:end]
+            start = _r0
+            end = _r0 + n
+        try:
+            n = _recv(sock, end, deadline)
+        except OSError:
+            if state == _ST_BODY and remaining < 0:
+                return status  # identity body without length ends at close
+            raise
+        if n == 0:
+            if state == _ST_BODY and remaining < 0:
+                return status
+            raise OSError("HTTP connection closed early")
+        if _t_first < 0:
+            _t_first = tracing.span(ep, tracing.PH_TTFB, t_sent)
+        end += n
+
+def request(host, path, on_body, tls=False, headers=None,
+            timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, ep=tracing.EP_NONE, port=None):
+    """GET host+path, streaming the body into on_body(memoryview).
+
+    path is a str/bytes or a tuple of parts written back to back.
+    headers is a pre-encoded block of "Name: value\\r\\n" lines.
+    on_body may return True to stop reading early. Returns the status code.
+    ep is the tracing endpoint id the spans are filed under.
+    port=None means 443 with tls, else 80.
+    """
+    global _body_started, request_count, _t_tick
+    backoff = RETRY_BACKOFF
+    attempt = 0
+    while True:
+        _body_started = False
+        _t_tick = tracing.ticks_ms()
+        request_count += 1
+        ep_requests[ep] += 1
+        sock = None
+        try:
+            # Host gets ":port" only for a non-default port
+            n = _build_request(host, None if port == (443 if tls else 80) else port, path, headers)
+            deadline = time.monotonic() + timeout
+            sock = _open(host, port, tls, ep)
+            sock.send(_req[:n])
+            _feed()
+            return _exchange(sock, on_body, deadline, ep, tracing.start())
+        except (OSError, RuntimeError) as e:
+            # A partial body has already reached the parser; don't replay it
+            if attempt >= retries or _body_started:
+                raise
+            print("HTTP retry", attempt + 1, host, e)
+        finally:
+            if sock is not None:
+                try:
+                    sock.close()
+                except (OSError, RuntimeError):
+                    pass
+            _tick()
+            _t_tick = -1
+        attempt += 1
+        _sleep(backoff)
+        backoff *= 2
@@ -0,0 +1,220 @@
+# ============================================================
+# jsonscan.py
+# Streaming JSON scanner: one pass over the body, no dict tree
+#
+# - feed() takes the memoryview chunks http_client hands out, so a
+#   response is parsed while it arrives and never held in RAM
+# - on_event(ev) is called for every scalar (EV_VALUE) and when an
+#   object/array opens (EV_OPEN) or closes (EV_CLOSE)
+# - The position is a stack with one int per level: the hash of
+#   the current key (objects) or the element index (arrays).
+#   path((key("a"), 0, key("b"))) is True at a[0].b
+# - Scalars are copied into a fixed value buffer (cut at
+#   VALUE_SIZE); nothing is decoded unless the caller asks
+# ============================================================
+
+from array import array
+
+MAX_DEPTH = 12
+VALUE_SIZE = 96
+KEY_SIZE = 24
+
+EV_VALUE = 0
+EV_OPEN = 1
+EV_CLOSE = 2
+
+# value_kind
+T_STR = 0
+T_BARE = 1  # number, true, false, null
+T_OBJ = 2
+T_ARR = 3
+
+_S_VALUE = 0
+_S_STR = 1
+_S_ESC = 2
+_S_UNI = 3
+_S_BARE = 4
+
+_stack = array("L", [0] * MAX_DEPTH)
+_is_arr = bytearray(MAX_DEPTH)
+value = bytearray(VALUE_SIZE)
+value_len = 0
+value_kind = T_STR
+keybuf = bytearray(KEY_SIZE)  # text of the last key seen (cut at KEY_SIZE)
+key_len = 0
+depth = 0
+
+_on = None
+_state = _S_VALUE
+_want_key = False
+_in_key = False
+_hash = 0
+_uni = 0
+
+def key(name):
+    """Hash of a key, as stored on the stack (str or bytes)."""
+    h = 5381
+    for c in name.encode() if isinstance(name, str) else name:
+        h = (h & 0xFFFFFF) * 33 + c
+    return h
+
+def begin(on_event):
+    """Start a new document; on_event(ev) gets every event from feed()."""
+    global _on, _state, _want_key, _in_key, depth, value_len, key_len
+    _on = on_event
+    _state = _S_VALUE
+    _want_key = _in_key = False
+    depth = value_len = key_len = 0
+
+def at(level):
+    """Key hash or array index at a level (0 = inside the outermost container)."""
+    return _stack[level]
+
+def path(p):
+    """True if the current position is exactly p (tuple of key()/index)."""
+    n = len(p)
+    if n != depth or n > MAX_DEPTH:
+        return False
+    for i in range(n):
+        if _stack[i] != p[i]:
+            return False
+    return True
+
+def is_null():
+    return value_kind == T_BARE and value_len and value[0] == 110  # 'n'
+
+def number(scale=0):
+    """The scalar as an int scaled by 10**scale ("37.615" -> 3761500 at 5).
+
+    No floats are made; extra decimals are dropped. None if not a number.
+    """
+    i = 0
+    neg = False
+    if value_len and value[0] == 45:  # '-'
+        neg = True
+        i = 1
+    v = 0
+    frac = -1
+    seen = False
+    while i < value_len:
+        c = value[i]
+        if 48 <= c <= 57:
+            if frac < 0:
+                v = v * 10 + c - 48
+            elif frac < scale:
+                v = v * 10 + c - 48
+                frac += 1
+            seen = True
+        elif c == 46 and frac < 0:  # '.'
+            frac = 0
+        else:
+            break  # exponent or junk: keep what was read
+        i += 1
+    if not seen:
+        return None
+    if frac < 0:
+        frac = 0
+    while frac < scale:
+        v *= 10
+        frac += 1
+    return -v if neg else v
+
+def copy_value(dst, off, width):
+    """Copy up to width bytes of the scalar into dst[off:]; returns the count."""
+    n = value_len if value_len < width else width
+    dst[off:off + n] = value[:n]
+    return n
+
+def feed(mv):
+    """Scan one chunk. Events fire from inside this call."""
+    global _state, _want_key, _in_key, _hash, _uni, depth, value_len, value_kind, key_len
+    st = _state
+    vlen = value_len
+    for c in mv:
+        if st == _S_STR:
+            if c == 34:  # closing quote
+                st = _S_VALUE
+                if _in_key:
+                    if 0 < depth <= MAX_DEPTH:
+                        _stack[depth - 1] = _hash
+                    key_len = vlen if vlen < KEY_SIZE else KEY_SIZE
+                    _want_key = False
+                else:
+                    value_len = vlen
+                    value_kind = T_STR
+                    _on(EV_VALUE)
+            elif c == 92:  # backslash
+                st = _S_ESC
+            else:
+                if _in_key:
+                    _hash = (_hash & 0xFFFFFF) * 33 + c
+                    if vlen < KEY_SIZE:
+                        keybuf[vlen] = c
+                elif vlen < VALUE_SIZE:
+                    value[vlen] = c
+                vlen += 1
+            continue
+        if st == _S_ESC:
+            st = _S_STR
+            if c == 117:  # \uXXXX: skip the digits, keep a placeholder
+                st = _S_UNI
+                _uni = 4
+                c = 63
+            elif c == 110 or c == 116 or c == 114 or c == 98 or c == 102:
+                c = 32
+            if _in_key:
+                _hash = (_hash & 0xFFFFFF) * 33 + c
+                if vlen < KEY_SIZE:
+                    keybuf[vlen] = c
+            elif vlen < VALUE_SIZE:
+                value[vlen] = c
+            vlen += 1
+            continue
+        if st == _S_UNI:
+            _uni -= 1
+            if _uni == 0:
+                st = _S_STR
+            continue
+        if st == _S_BARE:
+            if not (c == 44 or c == 125 or c == 93 or c <= 32):
+                if vlen < VALUE_SIZE:
+                    value[vlen] = c
+                vlen += 1
+                continue
+            st = _S_VALUE
+            value_len = vlen
+            value_kind = T_BARE
+            _on(EV_VALUE)
+            # fall through: c is a delimiter
+        if c <= 32 or c == 58:  # whitespace, ':'
+            continue
+        if c == 34:
+            st = _S_STR
+            vlen = 0
+            _in_key = _want_key
+            _hash = 5381
+        elif c == 44:  # ','
+            if 0 < depth <= MAX_DEPTH and _is_arr[depth - 1]:
+                _stack[depth - 1] += 1
+            else:
+                _want_key = True
+        elif c == 123 or c == 91:  # '{' '['
+            value_kind = T_ARR if c == 91 else T_OBJ
+            _on(EV_OPEN)
+            if depth < MAX_DEPTH:
+                _is_arr[depth] = 1 if c == 91 else 0
+                _stack[depth] = 0
+            depth += 1
+            _want_key = c == 123
+        elif c == 125 or c == 93:  # '}' ']'
+            if depth:
+                depth -= 1
+            value_kind = T_ARR if c == 93 else T_OBJ
+            _want_key = False
+            _on(EV_CLOSE)
+        else:
+            st = _S_BARE
+            value[0] = c
+            vlen = 1
+    _state = st
+    value_len = vlen
@@ -0,0 +1,37 @@
+# ============================================================
+# modes.py
+# What each display mode keeps in the arena's mode region
+#
+# - enter() rewinds the region (arena.enter) and takes, in this
+#   order: the HTTP request buffer and receive ring, then the
+#   flight records (display + search candidate) and predict.py's
+#   three when prediction is on
+# - The same mode always lands its slots at the same offsets, so
+#   switching modes moves nothing on the heap
+# - BUDGET per mode: (region bytes it may take, heap that must be
+#   free after gc before it starts a fetch + parse)
+# ============================================================
+
+import arena
+import flights
+import http_client
+import predict
+
+HTTP_BYTES = http_client.REQ_SIZE + http_client.RING_SIZE
+FLIGHT_BYTES = HTTP_BYTES + 2 * flights.RECORD_SIZE + 3 * flights.RECORD_SIZE  # + predict
+
+BUDGET = {
+    "flight": (FLIGHT_BYTES, 8 * 1024),  # flight JSON is scanned as it streams in
+    "bus": (HTTP_BYTES, 16 * 1024),
+    "combined": (FLIGHT_BYTES, 20 * 1024),
+}
+REGION_SIZE = max(b[0] for b in BUDGET.values())
+
+def enter(mode):
+    """Start mode: everything the previous mode took is reclaimed and re-placed."""
+    arena.enter(mode, BUDGET[mode][0])
+    http_client.place(arena.take(http_client.REQ_SIZE), arena.buf, arena.take_at(http_client.RING_SIZE))
+    if mode != "bus":
+        flights.place(arena.take)
+        if predict.enabled:
+            predict.place(arena.take)
@@ -0,0 +1,79 @@
+# ============================================================
+# power.py
+# Idle accounting: time spent asleep vs awake, request counts
+#
+# - sleep() is time.sleep() that also adds up the slept time,
+#   so the CPU duty cycle can be reported (CircuitPython idles
+#   the core in time.sleep until the next tick/interrupt). Every
+#   wait on the board goes through it: poll waits, scrolling and
+#   animation frames, bus refresh ticks, HTTP retry backoff
+# - report() prints one "POWER,..." CSV line for host tooling:
+#     POWER,<tag>,<uptime_s>,<awake_pct>,<idle_s>,<requests>
+# - quiet-hours helpers ("23:00-06:00", wraps midnight)
+# ============================================================
+
+import time
+
+import http_client
+from tracing import ticks_ms, ticks_diff
+
+_start = time.monotonic()
+_slept_s = 0
+_slept_ms = 0  # ints, measured with ticks_ms: a sleep allocates nothing
+_idle_since = None
+_idle_total = 0.0
+
+def sleep(seconds):
+    global _slept_s, _slept_ms
+    t = ticks_ms()
+    time.sleep(seconds)
+    _slept_ms += ticks_diff(ticks_ms(), t)
+    if _slept_ms >= 1000:
+        _slept_s += _slept_ms // 1000
+        _slept_ms %= 1000
+
+def set_idle(on):
+    """Track how long the display has been dark."""
+    global _idle_since, _idle_total
+    now = time.monotonic()
+    if on and _idle_since is None:
+        _idle_since = now
+    elif not on and _idle_since is not None:
+        _idle_total += now - _idle_since
+        _idle_since = None
+
+def is_idle():
+    return _idle_since is not None
+
+def awake_pct():
+    up = time.monotonic() - _start
+    if up <= 0:
+        return 100
+    return int(100 * (up - _slept_s - _slept_ms / 1000) / up)
+
+def idle_seconds():
+    extra = time.monotonic() - _idle_since if _idle_since is not None else 0
+    return int(_idle_total + extra)
+
+def report(tag):
+    print("POWER", tag, int(time.monotonic() - _start), awake_pct(),
+          idle_seconds(), http_client.request_count, sep=",")
+
+def parse_hours(spec):
+    """"HH:MM-HH:MM" -> (start_min, end_min), or None if empty/invalid."""
+    try:
+        a, b = spec.split("-")
+        sh, sm = a.strip().split(":")
+        eh, em = b.strip().split(":")
+        return int(sh) * 60 + int(sm), int(eh) * 60 + int(em)
+    except (AttributeError, ValueError):
+        return None
+
+def in_hours(window, hh, mm):
+    if window is None:
+        return False
+    start, end = window
+    mins = hh * 60 + mm
+    if start <= end:
+        return start <= mins < end
+    return mins >= start or mins < end
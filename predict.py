@@ -0,0 +1,188 @@
+# ============================================================
+# predict.py
+# Which aircraft will enter the bounds box next, by integer
+# dead reckoning from the search feed
+#
+# - The search asks for a larger box (SCALE x the bounds box, same
+#   centre). Every aircraft the provider scans is passed to
+#   consider() while the response streams in
+# - Each one is moved along its track at its ground speed (ints
+#   only: permille sine table, 1e-5 degree units) to find when it
+#   enters the bounds box; the soonest within HORIZON seconds is
+#   copied to `ahead`
+# - code.py prefetches ahead's details while the current flight is
+#   on screen and shows it at `ahead_at` without another search
+# ============================================================
+
+import time
+from array import array
+
+import flights
+
+SCALE = 3          # search box = SCALE x the bounds box
+HORIZON = 120      # seconds; predictions further out are too rough
+KT_MILLI = 463     # 1 knot = 0.463 (1e-5 degree of latitude) per second
+
+# sin(0..90 degrees) in permille
+_SIN = array("H", [
+    0, 17, 35, 52, 70, 87, 105, 122, 139, 156, 174, 191, 208, 225, 242, 259,
+    276, 292, 309, 326, 342, 358, 375, 391, 407, 423, 438, 454, 469, 485, 500,
+    515, 530, 545, 559, 574, 588, 602, 616, 629, 643, 656, 669, 682, 695, 707,
+    719, 731, 743, 755, 766, 777, 788, 799, 809, 819, 829, 839, 848, 857, 866,
+    875, 883, 891, 899, 906, 914, 921, 927, 934, 940, 946, 951, 956, 961, 966,
+    970, 974, 978, 982, 985, 988, 990, 993, 995, 996, 998, 999, 999, 1000, 1000,
+])
+
+enabled = False
+box = None         # the bounds box (fixed ints, see flights.parse_box)
+search_box = None  # the larger box the search covers
+_cos_lat = 1000    # cos(box centre latitude), permille
+
+ahead = flights.unplaced()  # text in the arena, see place()
+ahead_in = -1      # seconds after the search it enters the box, -1 = none
+ahead_at = 0.0     # time.monotonic() of that moment
+ready = False      # ahead has its details
+_best = -1
+_best_rec = flights.unplaced()  # soonest candidate of the search in progress
+_exclude = flights.unplaced()
+hits = 0           # flights shown with prefetched details
+misses = 0         # flights that needed their own details fetch
+
+def sin_pm(deg):
+    deg %= 360
+    if deg <= 90:
+        return _SIN[deg]
+    if deg <= 180:
+        return _SIN[180 - deg]
+    if deg <= 270:
+        return -_SIN[deg - 180]
+    return -_SIN[360 - deg]
+
+def cos_pm(deg):
+    return sin_pm(deg + 90)
+
+def configure(bounds_box, scale=SCALE, horizon=HORIZON):
+    """Turn prediction on; returns the search box as a bounds_box string."""
+    global enabled, box, search_box, _cos_lat, SCALE, HORIZON
+    SCALE = scale
+    HORIZON = horizon
+    box = flights.parse_box(bounds_box)
+    half_h = (box[0] - box[1]) // 2
+    half_w = (box[3] - box[2]) // 2
+    clat = (box[0] + box[1]) // 2
+    clon = (box[2] + box[3]) // 2
+    search_box = (clat + half_h * scale, clat - half_h * scale,
+                  clon - half_w * scale, clon + half_w * scale)
+    _cos_lat = max(1, cos_pm(clat // 10 ** flights.SCALE))
+    enabled = True
+    return ",".join(flights.fmt_fixed(v) for v in search_box)
+
+def _axis(p, v, lo, hi):
+    """(t_in, t_out) seconds that p moving at v milli-units/s spends in [lo, hi]."""
+    if v == 0:
+        return (0, HORIZON + 1) if lo <= p <= hi else (1, 0)
+    a = (lo - p) * 1000 // v
+    b = (hi - p) * 1000 // v
+    return (a, b) if a <= b else (b, a)
+
+def entry_seconds(lat, lon, track, speed):
+    """Seconds until (lat, lon) enters the box on its track, 0 if inside, -1 never."""
+    v_lat = speed * cos_pm(track) * KT_MILLI // 1000
+    v_lon = speed * sin_pm(track) * KT_MILLI // _cos_lat
+    a_in, a_out = _axis(lat, v_lat, box[1], box[0])
+    b_in, b_out = _axis(lon, v_lon, box[2], box[3])
+    t_in = a_in if a_in > b_in else b_in
+    t_out = a_out if a_out < b_out else b_out
+    if t_in < 0:
+        t_in = 0
+    if t_in > t_out or t_out < 0:
+        return -1
+    return t_in
+
+def position_at(r, seconds, out):
+    """Dead-reckon record r forward; out[0], out[1] = lat, lon."""
+    nums = r[2]
+    speed = nums[flights.N_SPEED]
+    track = nums[flights.N_TRACK]
+    out[0] = nums[flights.N_LAT] + seconds * (speed * cos_pm(track) * KT_MILLI // 1000) // 1000
+    out[1] = nums[flights.N_LON] + seconds * (speed * sin_pm(track) * KT_MILLI // _cos_lat) // 1000
+
+def _same_id(a, b):
+    n = a[1][flights.F_ID]
+    if n != b[1][flights.F_ID]:
+        return False
+    for i in range(n):  # F_ID is the first text slot
+        if a[0][i] != b[0][i]:
+            return False
+    return True
+
+def exclude(r):
+    """Never predict r (the flight on screen)."""
+    flights.copy(_exclude, r)
+
+def begin():
+    """Called before each search."""
+    global _best
+    _best = -1
+
+def consider(r):
+    """flights.on_seen hook: keep the aircraft that enters the box soonest."""
+    global _best
+    nums = r[2]
+    if (nums[flights.N_LAT] == flights.NO_VALUE or nums[flights.N_LON] == flights.NO_VALUE
+            or nums[flights.N_SPEED] == flights.NO_VALUE or nums[flights.N_TRACK] == flights.NO_VALUE
+            or not r[1][flights.F_ID] or _same_id(r, _exclude)
+            or not flights.in_box(search_box, nums[flights.N_LAT], nums[flights.N_LON])):
+        return
+    t = entry_seconds(nums[flights.N_LAT], nums[flights.N_LON], nums[flights.N_TRACK], nums[flights.N_SPEED])
+    if t <= 0 or t > HORIZON:
+        return  # already inside (the search shows it) or too far out
+    if _best < 0 or t < _best:
+        _best = t
+        flights.copy(_best_rec, r)
+
+def end(now=None):
+    """After the search: publish the prediction (None = time.monotonic())."""
+    global ahead_in, ahead_at, ready
+    if now is None:
+        now = time.monotonic()
+    if _best < 0:
+        ahead_in = -1
+        ready = False
+        return
+    if ready and _same_id(ahead, _best_rec):
+        # same aircraft: keep the prefetched details, refresh where it is
+        for i in range(flights.N_NUMS):
+            ahead[2][i] = _best_rec[2][i]
+    else:
+        flights.copy(ahead, _best_rec)
+        ready = False
+    ahead_in = _best
+    ahead_at = now + _best
+
+def take(r):
+    """If r is the prefetched flight, copy the details into it (its position stays)."""
+    global hits, misses
+    if not ready or not _same_id(r, ahead):
+        misses += 1
+        return False
+    hits += 1
+    r[0][:] = ahead[0]
+    r[1][:] = ahead[1]
+    clear()
+    return True
+
+def clear():
+    global ahead_in, ready
+    ahead_in = -1
+    ready = False
+
+def place(take):
+    """Point ahead and the search's records at slots from take(n); forgets the prediction."""
+    flights.point(ahead, take(flights.RECORD_SIZE))
+    flights.point(_best_rec, take(flights.RECORD_SIZE))
+    flights.point(_exclude, take(flights.RECORD_SIZE))
+    clear()
+
+def pending():
+    return ahead_in >= 0
@@ -0,0 +1,174 @@
+# ============================================================
+# schedule.py
+# Which mode should be on screen, from windows in settings.toml
+#
+#   schedule = "bus mon-fri 07:15-08:15; combined sat,sun 09:00-11:00 5"
+#   schedule_holidays = "2026-11-26,2026-12-25"
+#
+# - A window is "<mode> <days> <HH:MM-HH:MM> [priority]". Days
+#   are names and ranges ("mon-fri", "sat,sun"), "daily", and
+#   "hol" for the dates in schedule_holidays. On a holiday only
+#   windows with "hol" apply. An end before the start runs past
+#   midnight. Overlaps go to the higher priority, then the
+#   earlier window
+# - update() works out the mode now and the moment it next
+#   changes (Pacific time, DST included), so check() in the
+#   loops is a single compare against time.monotonic()
+# - set_override() records a button / console choice; it holds
+#   until the next scheduled change
+# ============================================================
+
+from array import array
+
+from timeutil import dst_changes, pacific_offset, pacific_to_utc, parse_date
+
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+HOL = 0x80           # day-mask bit for holidays
+LOOKAHEAD_DAYS = 8   # a weekly schedule always changes within this
+NEVER = 1e30
+
+_mode = []                # per window
+_days = bytearray(0)      # day mask, bit 0 = Monday, HOL = holidays
+_start = array("H")       # minutes after local midnight
+_end = array("H")
+_prio = bytearray(0)
+_holidays = ()            # day numbers (local dates)
+
+active = None        # mode of the window in force, None = no window
+override = None      # set by buttons / console
+next_change = NEVER  # time.monotonic() of the next scheduled change
+_sync_epoch = None   # UTC epoch at _sync_mono
+_sync_mono = 0.0
+
+def _parse_days(spec):
+    mask = 0
+    for part in spec.lower().split(","):
+        if part == "daily":
+            mask |= 0x7F | HOL
+        elif part == "hol":
+            mask |= HOL
+        elif "-" in part:
+            a, b = part.split("-")
+            i, j = DAY_NAMES.index(a), DAY_NAMES.index(b)
+            while True:
+                mask |= 1 << i
+                if i == j:
+                    break
+                i = (i + 1) % 7  # "fri-mon" wraps over the weekend
+        elif part:
+            mask |= 1 << DAY_NAMES.index(part)
+    return mask
+
+def _parse_minutes(s):
+    hh, mm = s.split(":")
+    v = int(hh) * 60 + int(mm)
+    if not 0 <= v <= 24 * 60:
+        raise ValueError("bad time " + s)
+    return v
+
+def load(spec, holidays="", modes=None):
+    """Parse the windows; raises ValueError naming the bad window."""
+    global _mode, _days, _start, _end, _prio, _holidays, active, override, next_change
+    mode = []
+    days = bytearray(0)
+    start = array("H")
+    end = array("H")
+    prio = bytearray(0)
+    for w in spec.split(";"):
+        parts = w.split()
+        if not parts:
+            continue
+        try:
+            if len(parts) not in (3, 4) or (modes is not None and parts[0] not in modes):
+                raise ValueError
+            a, b = parts[2].split("-")
+            mode.append(parts[0])
+            days.append(_parse_days(parts[1]))
+            start.append(_parse_minutes(a))
+            end.append(_parse_minutes(b))
+            prio.append(int(parts[3]) if len(parts) == 4 else 0)
+        except ValueError:
+            raise ValueError("schedule: bad window \"" + w.strip() + "\"")
+    _mode, _days, _start, _end, _prio = mode, days, start, end, prio
+    _holidays = tuple(parse_date(d) for d in holidays.split(",") if d.strip())
+    active = None
+    override = None
+    next_change = NEVER
+    if _sync_epoch is not None:
+        update(_sync_mono)
+
+def _on(i, day):
+    """True if window i applies to the local day number `day`."""
+    if day in _holidays:
+        return _days[i] & HOL != 0
+    return _days[i] & (1 << ((day + 3) % 7)) != 0  # day 0 was a Thursday
+
+def mode_at(epoch):
+    """The scheduled mode at a UTC epoch (None = no window)."""
+    local = epoch + pacific_offset(epoch)
+    day = local // 86400
+    mins = (local % 86400) // 60
+    best = -1
+    for i in range(len(_mode)):
+        s = _start[i]
+        e = _end[i]
+        if s <= e:
+            hit = s <= mins < e and _on(i, day)
+        else:
+            hit = (mins >= s and _on(i, day)) or (mins < e and _on(i, day - 1))
+        if hit and (best < 0 or _prio[i] > _prio[best]):
+            best = i
+    return _mode[best] if best >= 0 else None
+
+def next_transition(epoch):
+    """UTC epoch after `epoch` at which mode_at() changes, or None."""
+    now = mode_at(epoch)
+    day = (epoch + pacific_offset(epoch)) // 86400
+    edges = []
+    for d in range(day, day + LOOKAHEAD_DAYS):
+        for i in range(len(_mode)):
+            for m in (_start[i], _end[i]):
+                t = pacific_to_utc(d * 86400 + m * 60)
+                if t > epoch:
+                    edges.append(t)
+    # a window edge in the hour skipped in spring really ends at the change
+    for t in dst_changes(epoch):
+        if t > epoch:
+            edges.append(t)
+    edges.sort()
+    for t in edges:
+        if mode_at(t) != now:
+            return t
+    return None
+
+def resync(epoch, mono):
+    """The clock was set: UTC `epoch` was time.monotonic() == mono."""
+    global _sync_epoch, _sync_mono
+    _sync_epoch = epoch
+    _sync_mono = mono
+    update(mono)
+
+def update(mono):
+    global active, next_change
+    epoch = _sync_epoch + int(mono - _sync_mono)
+    active = mode_at(epoch)
+    t = next_transition(epoch) if _mode else None
+    if t is None:
+        # nothing changes within the lookahead (only holiday windows)
+        next_change = NEVER if not _mode else mono + 86400
+    else:
+        next_change = mono + (t - epoch)
+
+def check(mono):
+    """Mode wanted now: the override, else the window in force (None = default)."""
+    global override
+    if mono >= next_change:
+        prev = active
+        update(mono)
+        if active != prev:
+            override = None  # a scheduled change ends a manual choice
+    return override if override is not None else active
+
+def set_override(mode):
+    global override
+    override = mode
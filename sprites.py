@@ -0,0 +1,120 @@
+# ============================================================
+# sprites.py
+# The plane sprite turned to 8 or 16 headings, all in one sheet,
+# and a straight path across the panel for each heading
+#
+# - build_sheet() rotates the hand-drawn plane (nose pointing
+#   west) once at boot into tiles side by side in one Bitmap;
+#   the animation then only changes a TileGrid's tile index
+#   and x/y, so a frame allocates nothing
+# - paths() works out, per heading, where the sprite starts
+#   (just off the panel), its step per frame (1 px along the
+#   main axis, 1/256 px fixed point) and the number of frames
+#   until it is off the other side
+# - fly() paces frames against ticks_ms(), so the time spent
+#   feeding the watchdog and polling buttons doesn't stretch
+#   the flight the way a fixed sleep per pixel did
+# - Works on anything indexed [x, y] with .x / .y, so host
+#   tools can build the same sheet and run the same loop
+# ============================================================
+
+import math
+from array import array
+
+import power
+from tracing import ticks_ms, ticks_diff, ticks_add
+
+SIZE = 12               # tile width and height
+CX2, CY2 = 11, 9        # twice the plane's centre in its tile (5.5, 4.5)
+SOURCE_HEADING = 270    # the drawn plane flies west
+FIX = 256               # path fixed point
+
+_frame_ms = 40
+_sleeps = ()  # _sleeps[ms] = ms / 1000, made once so a frame allocates no float
+
+def heading_index(track, n):
+    """Nearest of n headings for a track in degrees (None/NO_VALUE -> west)."""
+    if track is None or not 0 <= track <= 360:
+        track = SOURCE_HEADING
+    return (track * n + 180) // 360 % n
+
+def build_sheet(src, dst, n):
+    """Rotate src (SIZE x SIZE) into tiles 0..n-1 of dst (n*SIZE x SIZE).
+
+    A target pixel is set when at least 2 of its 4 sub-pixel samples,
+    turned back onto the source, land on a set pixel; that keeps
+    1 px lines joined at the diagonals.
+    """
+    for k in range(n):
+        a = math.radians(k * 360 / n - SOURCE_HEADING)
+        c = math.cos(a)
+        s = math.sin(a)
+        for y in range(SIZE):
+            for x in range(SIZE):
+                hits = 0
+                for sx, sy in ((0.25, 0.25), (0.75, 0.25), (0.25, 0.75), (0.75, 0.75)):
+                    # target offset from the centre, rotated back (clockwise on screen = +a)
+                    dx = x + sx - CX2 / 2
+                    dy = y + sy - CY2 / 2
+                    u = math.floor(dx * c + dy * s + CX2 / 2)
+                    v = math.floor(-dx * s + dy * c + CY2 / 2)
+                    if 0 <= u < SIZE and 0 <= v < SIZE and src[u, v]:
+                        hits += 1
+                dst[k * SIZE + x, y] = 1 if hits >= 2 else 0
+
+def paths(width, height, n):
+    """array("h"): per heading x0, y0 (tile top-left), dx, dy (1/FIX px), frames."""
+    out = array("h", [0] * (5 * n))
+    reach_x = width // 2 + SIZE // 2 + 2   # centre of the panel to off-screen
+    reach_y = height // 2 + SIZE // 2 + 2
+    for k in range(n):
+        a = math.radians(k * 360 / n)
+        ux = math.sin(a)
+        uy = -math.cos(a)  # screen y grows southwards
+        major = max(abs(ux), abs(uy))
+        dx = round(ux / major * FIX)
+        dy = round(uy / major * FIX)
+        # frames from the centre until the sprite has left along either axis
+        half = min(-(-reach_x * FIX // abs(dx)) if dx else 9999,
+                   -(-reach_y * FIX // abs(dy)) if dy else 9999)
+        i = 5 * k
+        out[i] = width // 2 - CX2 // 2 - half * dx // FIX
+        out[i + 1] = height // 2 - CY2 // 2 - half * dy // FIX
+        out[i + 2] = dx
+        out[i + 3] = dy
+        out[i + 4] = 2 * half + 1
+    return out
+
+def pace(frame_ms):
+    """Frame period for fly()."""
+    global _frame_ms, _sleeps
+    _frame_ms = frame_ms
+    _sleeps = tuple(i / 1000 for i in range(frame_ms + 1))
+
+def fly(tg, path, k, feed, stop):
+    """Move tg (tiles from build_sheet) along heading k of paths().
+
+    feed() runs every frame; returns False as soon as stop() is true.
+    """
+    i = 5 * k
+    x0 = path[i]
+    y0 = path[i + 1]
+    dx = path[i + 2]
+    dy = path[i + 3]
+    tg[0] = k
+    due = ticks_ms()
+    for f in range(path[i + 4]):
+        tg.x = x0 + f * dx // FIX
+        tg.y = y0 + f * dy // FIX
+        feed()
+        if stop():
+            return False
+        due = ticks_add(due, _frame_ms)
+        wait = ticks_diff(due, ticks_ms())
+        if wait > 0:
+            power.sleep(_sleeps[wait if wait <= _frame_ms else _frame_ms])
+        elif wait < -_frame_ms:
+            due = ticks_ms()  # held up (a long poll): carry on from here, don't race
+    return True
+
+pace(_frame_ms)
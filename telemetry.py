@@ -0,0 +1,265 @@
+# ============================================================
+# telemetry.py
+# Crash / reset telemetry kept in microcontroller.nvm
+#
+# - Counters: boots, recorded crashes, resets per reset_reason
+# - Ring of the last RING_LEN crashes: reset reason, phase, exception
+#   type, free heap, largest free block, uptime. The largest block
+#   is the last one measured (boot, console "heap"): probing it
+#   churns the heap, so a mode switch or crash never does
+# - The current phase lives in RAM; it is written to NVM at
+#   checkpoints (boot, mode switch, crash) and by net() before
+#   a network call (search, details, 511 fetch, time sync), so a
+#   watchdog reset in a hung fetch can name that fetch. Every NVM
+#   write is a flash erase, so nothing is written when the phase
+#   is the one already in NVM, net() writes at most once per
+#   NET_COMMIT_SECONDS, and a crash that repeats the last one
+#   (same exception, same phase) within EXC_REPEAT_SECONDS is
+#   only counted. A reset is filed under the last phase written.
+#   Set telemetry_breadcrumbs = "True" in settings.toml to also
+#   persist every other phase change on a unit under
+#   investigation (wears flash, don't leave it on).
+# - dump() prints everything at boot as "TELEM,..." CSV lines
+# ============================================================
+
+import gc
+import struct
+import time
+
+import microcontroller
+
+import arena
+
+NVM_BASE = 0
+NET_COMMIT_SECONDS = 1800  # net(): at most one flash write per half hour
+EXC_REPEAT_SECONDS = 600   # record_exception(): same crash again is only counted
+RING_LEN = 16
+REC_SIZE = 16
+_MAGIC = b"T1"
+_HDR_SIZE = 48
+IMAGE_SIZE = _HDR_SIZE + RING_LEN * REC_SIZE
+
+# header offsets
+_O_HEAD = 2
+_O_COUNT = 3
+_O_BOOTS = 4
+_O_CRASHES = 8
+_O_REASONS = 12  # u16 x 8
+_O_CK_PHASE = 28
+_O_CK_FREE = 32
+_O_CK_UPTIME = 36
+_O_CK_LARGEST = 40
+
+# record: kind, reset reason, phase, exception, free, largest, uptime
+_REC_FMT = "<BBBBIII"
+KIND_EXCEPTION = 0
+KIND_RESET = 1
+
+# phases
+PH_NONE = 0
+PH_BOOT = 1
+PH_TIME_SYNC = 2
+PH_FLIGHT_ENTER = 3
+PH_FLIGHT_SEARCH = 4
+PH_FLIGHT_DETAILS = 5
+PH_FLIGHT_PARSE = 6
+PH_FLIGHT_DISPLAY = 7
+PH_FLIGHT_WAIT = 8
+PH_BUS_ENTER = 9
+PH_BUS_FETCH = 10
+PH_BUS_PARSE = 11
+PH_BUS_WAIT = 12
+PH_COMBINED_ENTER = 13
+PHASE_NAMES = (
+    "none", "boot", "time_sync", "flight_enter", "get_flights", "get_flight_details",
+    "parse_details", "display_flight", "flight_wait", "bus_enter", "bus_fetch",
+    "bus_parse", "bus_wait", "combined_enter",
+)
+
+RESET_NAMES = (
+    "POWER_ON", "BROWNOUT", "SOFTWARE", "DEEP_SLEEP_ALARM",
+    "RESET_PIN", "WATCHDOG", "UNKNOWN", "RESCUE_DEBUG",
+)
+# Resets that mean "it crashed", as opposed to power-up or the reset button
+_CRASH_RESETS = ("BROWNOUT", "SOFTWARE", "WATCHDOG", "UNKNOWN")
+
+EXC_NAMES = (
+    "none", "MemoryError", "OSError", "RuntimeError", "ValueError", "KeyError",
+    "TypeError", "IndexError", "WatchDogTimeout", "other",
+)
+
+_image = bytearray(IMAGE_SIZE)
+_nvm = None
+_breadcrumbs = False
+_phase = PH_NONE
+_persisted_phase = PH_NONE
+nvm_writes = 0  # since boot
+_net_at = None  # time.monotonic() of net()'s last write
+_exc_last = -1  # (exception index << 8 | phase) of the last crash written
+_exc_at = 0.0
+reset_reason = 6  # UNKNOWN until boot()
+
+def _reset_reason_index():
+    try:
+        reason = microcontroller.cpu.reset_reason
+        for i in range(len(RESET_NAMES)):
+            if reason == getattr(microcontroller.ResetReason, RESET_NAMES[i], None):
+                return i
+    except (AttributeError, NotImplementedError):
+        pass
+    return 6
+
+def _exc_index(e):
+    if e is None:
+        return 0
+    name = type(e).__name__
+    for i in range(1, len(EXC_NAMES) - 1):
+        if EXC_NAMES[i] == name:
+            return i
+    return len(EXC_NAMES) - 1
+
+def _u16(off):
+    return _image[off] | (_image[off + 1] << 8)
+
+def _u32(off):
+    return struct.unpack_from("<I", _image, off)[0]
+
+def _commit():
+    """Write the RAM image to NVM: one flash write per call."""
+    global nvm_writes
+    if _nvm is not None:
+        _nvm[NVM_BASE:NVM_BASE + IMAGE_SIZE] = _image
+        nvm_writes += 1
+
+def _checkpoint_fields(phase, largest=0):
+    _image[_O_CK_PHASE] = phase
+    struct.pack_into("<III", _image, _O_CK_FREE, _mem_free(), int(time.monotonic()), largest)
+
+def _mem_free():
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return 0
+
+def _append(kind, reason, phase, exc, free, largest, uptime):
+    head = _image[_O_HEAD]
+    struct.pack_into(_REC_FMT, _image, _HDR_SIZE + head * REC_SIZE,
+                     kind, reason, phase, exc, free, largest, uptime)
+    _image[_O_HEAD] = (head + 1) % RING_LEN
+    if _image[_O_COUNT] < RING_LEN:
+        _image[_O_COUNT] += 1
+
+def boot(breadcrumbs=False):
+    """Load the ring, account for this boot's reset reason, persist once."""
+    global _nvm, _breadcrumbs, reset_reason, _phase, _persisted_phase
+    _breadcrumbs = breadcrumbs
+    try:
+        _nvm = microcontroller.nvm
+        if _nvm is not None and len(_nvm) < NVM_BASE + IMAGE_SIZE:
+            _nvm = None
+    except AttributeError:
+        _nvm = None
+    if _nvm is not None:
+        _image[:] = _nvm[NVM_BASE:NVM_BASE + IMAGE_SIZE]
+    if _image[0:2] != _MAGIC:
+        for i in range(IMAGE_SIZE):
+            _image[i] = 0
+        _image[0:2] = _MAGIC
+
+    reset_reason = _reset_reason_index()
+    struct.pack_into("<I", _image, _O_BOOTS, _u32(_O_BOOTS) + 1)
+    off = _O_REASONS + reset_reason * 2
+    n = min(_u16(off) + 1, 0xFFFF)
+    _image[off] = n & 0xFF
+    _image[off + 1] = n >> 8
+
+    if RESET_NAMES[reset_reason] in _CRASH_RESETS:
+        # Nothing ran after the crash; the last checkpoint is the best we have
+        _append(KIND_RESET, reset_reason, _image[_O_CK_PHASE], 0,
+                _u32(_O_CK_FREE), _u32(_O_CK_LARGEST), _u32(_O_CK_UPTIME))
+
+    _phase = _persisted_phase = PH_BOOT
+    _checkpoint_fields(PH_BOOT)
+    _commit()
+
+def phase(p):
+    """Mark the current phase (RAM only unless breadcrumbs are on)."""
+    global _phase, _persisted_phase
+    _phase = p
+    if _breadcrumbs and p != _persisted_phase:
+        _persisted_phase = p
+        _checkpoint_fields(p)
+        _commit()
+
+def net(p):
+    """Mark the phase of a network call about to start.
+
+    Persisted if it changed, at most once per NET_COMMIT_SECONDS.
+    """
+    global _phase, _persisted_phase, _net_at
+    _phase = p
+    if p == _persisted_phase:
+        return
+    now = time.monotonic()
+    if _net_at is not None and now - _net_at < NET_COMMIT_SECONDS:
+        return
+    _net_at = now
+    _persisted_phase = p
+    _checkpoint_fields(p, arena.largest)
+    _commit()
+
+def checkpoint(p):
+    """Mark a phase and persist it (if not already), for rare events such as mode switches."""
+    global _phase, _persisted_phase
+    _phase = p
+    if p == _persisted_phase:
+        return  # re-entering the same mode, e.g. after a caught error
+    _persisted_phase = p
+    _checkpoint_fields(p, arena.largest)
+    _commit()
+
+def current_phase():
+    return _phase
+
+def record_exception(e):
+    """Record a caught crash with the heap state right now.
+
+    A repeat of the last one (same exception and phase) within
+    EXC_REPEAT_SECONDS is only counted; the count reaches NVM with
+    the next write.
+    """
+    global _exc_last, _exc_at, _persisted_phase
+    struct.pack_into("<I", _image, _O_CRASHES, _u32(_O_CRASHES) + 1)
+    key = _exc_index(e) << 8 | _phase
+    now = time.monotonic()
+    if key == _exc_last and now - _exc_at < EXC_REPEAT_SECONDS:
+        return
+    _exc_last = key
+    _exc_at = now
+    largest = arena.largest
+    _append(KIND_EXCEPTION, reset_reason, _phase, key >> 8,
+            _mem_free(), largest, int(now))
+    _persisted_phase = _phase
+    _checkpoint_fields(_phase, largest)
+    _commit()
+
+def dump():
+    """Print counters and the crash ring, oldest first."""
+    print("TELEM,boots," + str(_u32(_O_BOOTS)) + ",crashes," + str(_u32(_O_CRASHES))
+          + ",reset," + RESET_NAMES[reset_reason])
+    for i in range(len(RESET_NAMES)):
+        n = _u16(_O_REASONS + i * 2)
+        if n:
+            print("TELEM,reason," + RESET_NAMES[i] + "," + str(n))
+    count = _image[_O_COUNT]
+    head = _image[_O_HEAD]
+    for i in range(count):
+        slot = (head - count + i) % RING_LEN
+        kind, reason, ph, exc, free, largest, uptime = struct.unpack_from(
+            _REC_FMT, _image, _HDR_SIZE + slot * REC_SIZE)
+        print("TELEM,crash,{},{},{},{},{},{},{},{}".format(
+            i, "exception" if kind == KIND_EXCEPTION else "reset",
+            RESET_NAMES[reason] if reason < len(RESET_NAMES) else reason,
+            PHASE_NAMES[ph] if ph < len(PHASE_NAMES) else ph,
+            EXC_NAMES[exc] if exc < len(EXC_NAMES) else exc,
+            free, largest, uptime))
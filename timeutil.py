@@ -0,0 +1,103 @@
+# ============================================================
+# timeutil.py
+# UTC epoch / ISO-8601 helpers and Pacific local time
+# (no hardware imports, so host tools can use it too)
+# ============================================================
+
+def _is_leap(y):
+    return (y % 4 == 0 and y % 100 != 0) or (y % 400 == 0)
+
+_year_days_cache = {}
+
+def _days_before_year(y):
+    if y in _year_days_cache:
+        return _year_days_cache[y]
+    d = 0
+    for yy in range(1970, y):
+        d += 366 if _is_leap(yy) else 365
+    _year_days_cache[y] = d
+    return d
+
+def _days_before_month(y, m):
+    mdays = [31, 28 + (1 if _is_leap(y) else 0), 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    s = 0
+    for i in range(m - 1):
+        s += mdays[i]
+    return s
+
+def iso8601_to_epoch(s):
+    y = int(s[0:4]); mo = int(s[5:7]); d = int(s[8:10])
+    hh = int(s[11:13]); mm = int(s[14:16]); ss = int(s[17:19])
+    tz = s[19:]
+    off = 0
+    if tz not in ("", "Z"):
+        sign = -1 if tz[0] == "-" else 1
+        off = sign * (int(tz[1:3]) * 60 + int(tz[4:6]))
+    days = _days_before_year(y) + _days_before_month(y, mo) + (d - 1)
+    return days * 86400 + hh * 3600 + mm * 60 + ss - off * 60
+
+def _year_of_day(days_total):
+    """Year that day number (days since 1970-01-01) falls in."""
+    year = 1970 + days_total // 365
+    while _days_before_year(year + 1) <= days_total:
+        year += 1
+    while _days_before_year(year) > days_total:
+        year -= 1
+    return year
+
+def day_number(y, m, d):
+    """Days since 1970-01-01 for a calendar date."""
+    return _days_before_year(y) + _days_before_month(y, m) + (d - 1)
+
+def parse_date(s):
+    """"2026-12-25" -> day number."""
+    s = s.strip()
+    return day_number(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+
+_PST = -8 * 3600
+_PDT = -7 * 3600
+_dst_cache = {}
+
+def _dst_range(year):
+    """(start, end) UTC epochs of US daylight time: 2nd Sunday of March 2:00 PST
+    to 1st Sunday of November 2:00 PDT."""
+    if year in _dst_cache:
+        return _dst_cache[year]
+    mar1 = day_number(year, 3, 1)
+    nov1 = day_number(year, 11, 1)
+    start = mar1 + (6 - (mar1 + 3) % 7) % 7 + 7  # day 0 was a Thursday
+    end = nov1 + (6 - (nov1 + 3) % 7) % 7
+    r = (start * 86400 + 2 * 3600 - _PST, end * 86400 + 2 * 3600 - _PDT)
+    _dst_cache[year] = r
+    return r
+
+def dst_changes(epoch):
+    """(start, end) UTC epochs of daylight time in the year of `epoch`."""
+    return _dst_range(_year_of_day(epoch // 86400))
+
+def pacific_offset(epoch):
+    """Seconds to add to a UTC epoch for Pacific local time (-8 h or -7 h)."""
+    start, end = _dst_range(_year_of_day(epoch // 86400))
+    return _PDT if start <= epoch < end else _PST
+
+def pacific_to_utc(local):
+    """Pacific local epoch -> UTC epoch. A time skipped in spring is read as
+    standard time; a repeated one in autumn is its first (daylight) instance."""
+    utc = local - _PST
+    if pacific_offset(utc - 3600) == _PDT:
+        utc -= 3600
+    return utc
+
+def get_pacific_hm_wday(epoch):
+    """Return (hour, minute, weekday) in Pacific time. weekday: 0=Mon, 6=Sun."""
+    local_epoch = epoch + pacific_offset(epoch)
+    hh = (local_epoch % 86400) // 3600
+    mm = (local_epoch % 3600) // 60
+    wday = (local_epoch // 86400 + 3) % 7  # 0=Mon, 4=Fri, 6=Sun
+    return int(hh), int(mm), int(wday)
+
+def fmt_pacific_time(epoch):
+    hh, mm, _ = get_pacific_hm_wday(epoch)
+    ampm = "AM" if hh < 12 else "PM"
+    h12 = hh % 12 or 12
+    return "{:d}:{:02d}{}".format(h12, mm, ampm)
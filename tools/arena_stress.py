@@ -0,0 +1,161 @@
+# ============================================================
+# arena_stress.py
+# Switch flight <-> bus thousands of times under a small heap
+# and track the largest free block.
+#
+#   micropython -X heapsize=96k tools/arena_stress.py arena 5000
+#   micropython -X heapsize=96k tools/arena_stress.py legacy 5000
+#
+# "legacy" replays the old pattern (bytearray(json_size) on every
+# flight entry, dropped in bus mode, 511 body joined from chunks);
+# "arena" switches with modes.enter() like code.py does, so the
+# HTTP ring and flight records are placed the real way, and the
+# bodies come in through that ring. CPython runs too, but its
+# largest-block numbers are meaningless.
+# ============================================================
+
+import sys
+import gc
+import json
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+import arena
+import flights
+import http_client
+import modes
+import predict
+
+JSON_SIZE = 14336
+ARENA_SIZE = JSON_SIZE + modes.REGION_SIZE
+BOUNDS_BOX = "37.95,37.75,-122.35,-122.05"
+PROBE_LIMIT = 64 * 1024
+DRIFT_LIMIT = 1024  # arena run fails if the block shrinks more than this
+
+def details_body(i):
+    return (
+        '{"identification":{"number":{"default":"UA' + str(i % 997) + '"},"callsign":"UAL' + str(i) + '"},'
+        '"aircraft":{"model":{"code":"B738","text":"Boeing 737-824"}},"airline":{"name":"United Airlines"},'
+        '"airport":{"origin":{"name":"San Francisco International Airport","code":{"iata":"SFO"}},'
+        '"destination":{"name":"Denver International Airport","code":{"iata":"DEN"}}},'
+        '"pad":"' + "x" * (3000 + (i * 37) % 2000) + '",'
+        '"trail":[{"lat":37.9,"lng":-122.1,"alt":' + str(9000 + i % 3000) + ',"spd":' + str(300 + i % 90) + ',"hd":270}]}'
+    ).encode()
+
+def bus_body(i):
+    visits = []
+    for k in range(10):
+        visits.append(
+            '{"MonitoredVehicleJourney":{"LineRef":"1X","MonitoredCall":{"ExpectedArrivalTime":'
+            '"2026-10-19T14:' + str(10 + k) + ':00Z","Extra":"' + "y" * (400 + (i + k) % 300) + '"}}}'
+        )
+    return (
+        '{"ServiceDelivery":{"ResponseTimestamp":"2026-10-19T14:00:00Z","StopMonitoringDelivery":'
+        '{"MonitoredStopVisit":[' + ",".join(visits) + ']}}}'
+    ).encode()
+
+def loads(mv):
+    try:
+        return json.loads(mv)
+    except TypeError:  # CPython wants bytes
+        return json.loads(bytes(mv))
+
+# Long-lived strings, like label texts that survive a mode switch
+labels = ["", "", ""]
+
+def parse_details(d):
+    labels[0] = d["identification"]["number"]["default"]
+    labels[1] = d["airport"]["origin"]["code"]["iata"] + "-" + d["airport"]["destination"]["code"]["iata"]
+    labels[2] = str(d["trail"][0]["alt"])
+
+def parse_bus(d):
+    v = d["ServiceDelivery"]["StopMonitoringDelivery"]["MonitoredStopVisit"]
+    labels[1] = "1X:" + str(len(v))
+
+def cycle_legacy(i, state):
+    # flight mode entry re-allocates the big buffer
+    gc.collect()
+    state["body"] = bytearray(JSON_SIZE)
+    src = details_body(i)
+    state["body"][0:len(src)] = src
+    parse_details(loads(memoryview(state["body"])[:len(src)]))
+    # bus mode entry frees it; the 511 body is joined from 1K chunks
+    state["body"] = None
+    gc.collect()
+    src = bus_body(i)
+    chunks = []
+    for k in range(0, len(src), 1024):
+        chunks.append(bytes(src[k:k + 1024]))
+    raw = b"".join(chunks)
+    chunks = None
+    parse_bus(loads(raw))
+    raw = None
+
+def through_ring(src, body):
+    """Copy src into body one ring-full at a time, the way http_client delivers it."""
+    ring = http_client._ring_mv[http_client._r0:http_client._r1]
+    size = len(ring)
+    for k in range(0, len(src), size):
+        n = min(size, len(src) - k)
+        ring[0:n] = src[k:k + n]
+        body[k:k + n] = ring[0:n]
+
+def cycle_arena(i, state):
+    body = arena.buf
+    modes.enter("flight")
+    src = details_body(i)
+    through_ring(src, body)
+    parse_details(loads(memoryview(body)[:len(src)]))
+    b = labels[0].encode()
+    flights.put_bytes(flights.rec, flights.F_FLIGHT, b, len(b))
+    flights.copy(predict.ahead, flights.rec)
+    modes.enter("bus")
+    src = bus_body(i)
+    through_ring(src, body)
+    parse_bus(loads(memoryview(body)[:len(src)]))
+
+def mem_free():
+    try:
+        return gc.mem_free()
+    except AttributeError:
+        return -1
+
+def main():
+    strategy = sys.argv[1] if len(sys.argv) > 1 else "arena"
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    report = max(1, cycles // 20)
+    if strategy == "arena":
+        predict.configure(BOUNDS_BOX)
+        arena.init(ARENA_SIZE, JSON_SIZE)
+        step = cycle_arena
+    elif strategy == "legacy":
+        step = cycle_legacy
+    else:
+        print("usage: arena_stress.py [arena|legacy] [cycles]")
+        sys.exit(2)
+
+    state = {}
+    first = None
+    lowest = None
+    print("cycle,strategy,largest_free,mem_free")
+    for i in range(cycles):
+        try:
+            step(i, state)
+        except MemoryError as e:
+            print("MemoryError at cycle " + str(i) + ": " + str(e))
+            sys.exit(1)
+        if i % report == 0 or i == cycles - 1:
+            lf = arena.largest_free_block(PROBE_LIMIT)
+            if first is None:
+                first = lf
+            if lowest is None or lf < lowest:
+                lowest = lf
+            print("{},{},{},{}".format(i, strategy, lf, mem_free()))
+
+    drift = first - lowest
+    print("summary: first={} lowest={} drift={}".format(first, lowest, drift))
+    if strategy == "arena" and drift > DRIFT_LIMIT:
+        print("FAIL: largest free block shrank by " + str(drift) + " bytes")
+        sys.exit(1)
+
+main()
@@ -0,0 +1,83 @@
+# ============================================================
+# console_collect.py
+# Send console commands (console.py) to one or more boards and
+# print the CON,... replies as CSV rows
+#
+#   python3 tools/console_collect.py --port COM5 --port COM6 heap quota
+#   python3 tools/console_collect.py --port /dev/ttyACM0 --every 60 heap cache
+#   python3 tools/console_collect.py --port COM5 "poll flight 60" "mode bus"
+#
+# Output: port,unix_time,cmd,key,value (one row per field),
+# errors as port,unix_time,cmd,ERR,reason.
+# Needs pyserial (pip install pyserial).
+# ============================================================
+
+import argparse
+import sys
+import time
+
+def parse_reply(line):
+    """"CON,heap,free=1,alloc=2" -> ("heap", [("free", "1"), ("alloc", "2")]), or None."""
+    i = line.find("CON,")
+    if i == -1:
+        return None
+    parts = line[i:].strip().split(",")
+    if len(parts) < 3:
+        return None
+    if parts[1] == "ERR":
+        return parts[2], [("ERR", ",".join(parts[3:]))]
+    fields = []
+    for p in parts[2:]:
+        k, _, v = p.partition("=")
+        fields.append((k, v))
+    return parts[1], fields
+
+def ask(ser, command, timeout):
+    """Send one command and return its parsed reply (other output is skipped)."""
+    ser.reset_input_buffer()
+    ser.write(command.encode() + b"\r\n")
+    end = time.time() + timeout
+    want = command.split()[0].lower()
+    while time.time() < end:
+        raw = ser.readline()
+        if not raw:
+            continue
+        r = parse_reply(raw.decode("utf-8", "replace"))
+        if r is not None and r[0] == want:
+            return r
+    return want, [("ERR", "no reply")]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="collect console metrics from boards")
+    ap.add_argument("commands", nargs="+", help="console commands, e.g. heap quota cache")
+    ap.add_argument("--port", action="append", required=True, help="serial port (repeat for more boards)")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--timeout", type=float, default=5, help="seconds to wait for each reply")
+    ap.add_argument("--every", type=float, default=0, help="repeat every N seconds (0 = once)")
+    args = ap.parse_args(argv)
+
+    import serial  # pyserial
+    boards = [(p, serial.Serial(p, args.baud, timeout=0.5)) for p in args.port]
+    out = sys.stdout
+    out.write("port,time,cmd,key,value\n")
+    try:
+        while True:
+            for port, ser in boards:
+                for command in args.commands:
+                    cmd, fields = ask(ser, command, args.timeout)
+                    now = int(time.time())
+                    for k, v in fields:
+                        out.write("{},{},{},{},{}\n".format(port, now, cmd, k, v))
+                    out.flush()
+            if not args.every:
+                break
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _, ser in boards:
+            ser.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# ============================================================
+# eta_eval.py
+# Offline evaluation of eta_model.py against recorded 511 responses
+#
+# Record (polls 511 from a computer; mind the 60 calls/hour limit):
+#   API_KEY_511=... python3 tools/eta_eval.py record stop13876.jsonl --every 90
+#
+# Evaluate (replays the recording like the board would):
+#   python3 tools/eta_eval.py eval stop13876.jsonl --refresh 120,240,360
+#
+# For each refresh interval the board only "sees" one response per
+# interval and counts down in between. Every recorded response that
+# is not a refresh is ground truth for the countdown at that moment.
+# Reports mean absolute ETA error (seconds) with and without the model.
+# ============================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eta_model
+from bus511 import extract_etas_seconds
+from timeutil import iso8601_to_epoch, get_pacific_hm_wday
+
+URL_511 = (
+    "https://api.511.org/transit/StopMonitoring?api_key={key}&agency={agency}"
+    "&stopCode={stop}&format=json&MaximumStopVisits=10"
+)
+
+def load_responses(path, route):
+    """[(resp_epoch, [eta, eta, eta]), ...] sorted by time, bad lines skipped."""
+    out = []
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip().lstrip("\ufeff")
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                epoch = iso8601_to_epoch(data["ServiceDelivery"]["ResponseTimestamp"])
+                out.append((epoch, extract_etas_seconds(data, route)))
+            except (ValueError, KeyError, TypeError):
+                continue
+    out.sort(key=lambda r: r[0])
+    return out
+
+def _abs_errors(pred, truth, errors):
+    """Pair each predicted bus with the nearest true one, collect |error|."""
+    used = set()
+    for p in pred:
+        if p is None:
+            continue
+        best = None
+        for j, t in enumerate(truth):
+            if t is None or j in used:
+                continue
+            if best is None or abs(t - p) < abs(truth[best] - p):
+                best = j
+        if best is not None and abs(truth[best] - p) <= eta_model.MATCH_SECONDS:
+            used.add(best)
+            errors.append(abs(truth[best] - p))
+
+def replay(responses, refresh, stop=0):
+    """Returns (baseline_errors, model_errors, refreshes)."""
+    eta_model.load(None)
+    eta_model.reset()
+    eta_model.enabled = True
+    zero = [0, 0, 0]
+    rate = [0, 0, 0]
+    raw = None
+    raw_epoch = None
+    base_err = []
+    model_err = []
+    refreshes = 0
+    shown = [None, None, None]
+    for epoch, etas in responses:
+        hour = get_pacific_hm_wday(epoch)[0]
+        if raw is None or epoch - raw_epoch >= refresh:
+            if raw is not None:
+                eta_model.observe(stop, hour, raw, etas, epoch - raw_epoch)
+            raw = list(etas)
+            raw_epoch = epoch
+            eta_model.rates(stop, hour, raw, rate)
+            refreshes += 1
+            continue
+        elapsed = epoch - raw_epoch
+        eta_model.project(raw, elapsed, zero, shown)
+        _abs_errors(shown, etas, base_err)
+        eta_model.project(raw, elapsed, rate, shown)
+        _abs_errors(shown, etas, model_err)
+    return base_err, model_err, refreshes
+
+def cmd_eval(args):
+    responses = load_responses(args.recording, args.route)
+    if len(responses) < 3:
+        print("need at least 3 usable responses, got " + str(len(responses)))
+        return 1
+    span_h = (responses[-1][0] - responses[0][0]) / 3600.0
+    print("{} responses over {:.1f} h, route {}".format(len(responses), span_h, args.route))
+    print("{:>9} {:>9} {:>9} {:>12} {:>12} {:>8}".format(
+        "refresh_s", "refreshes", "samples", "mae_plain_s", "mae_model_s", "gain"))
+    for refresh in [int(x) for x in args.refresh.split(",")]:
+        base, model, refreshes = replay(responses, refresh)
+        if not base:
+            print("{:>9} {:>9} {:>9}  (no samples between refreshes)".format(refresh, refreshes, 0))
+            continue
+        mae_b = sum(base) / len(base)
+        mae_m = sum(model) / len(model) if model else float("nan")
+        gain = (1 - mae_m / mae_b) * 100 if mae_b else 0.0
+        print("{:>9} {:>9} {:>9} {:>12.1f} {:>12.1f} {:>7.1f}%".format(
+            refresh, refreshes, len(base), mae_b, mae_m, gain))
+    return 0
+
+def cmd_record(args):
+    key = args.key or os.environ.get("API_KEY_511")
+    if not key:
+        print("set API_KEY_511 or pass --key")
+        return 1
+    url = URL_511.format(key=key, agency=args.agency, stop=args.stop)
+    n = 0
+    while args.count <= 0 or n < args.count:
+        try:
+            with urllib.request.urlopen(url, timeout=20) as resp:
+                body = resp.read().decode("utf-8-sig")
+            with open(args.recording, "a", encoding="utf-8") as f:
+                f.write(json.dumps(json.loads(body), separators=(",", ":")) + "\n")
+            n += 1
+            print("recorded " + str(n))
+        except (OSError, ValueError) as e:
+            print("fetch error:", e)
+        time.sleep(args.every)
+    return 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="evaluate the bus ETA correction model offline")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ev = sub.add_parser("eval", help="replay a recording")
+    ev.add_argument("recording", help="JSONL file, one 511 StopMonitoring response per line")
+    ev.add_argument("--route", default="1X")
+    ev.add_argument("--refresh", default="120,240,360", help="comma-separated refresh intervals (s)")
+
+    rec = sub.add_parser("record", help="append live 511 responses to a JSONL file")
+    rec.add_argument("recording")
+    rec.add_argument("--stop", default="13876")
+    rec.add_argument("--agency", default="SF")
+    rec.add_argument("--key", help="511 API key (default: $API_KEY_511)")
+    rec.add_argument("--every", type=float, default=90, help="seconds between calls")
+    rec.add_argument("--count", type=int, default=0, help="stop after this many (0 = forever)")
+
+    args = ap.parse_args(argv)
+    return cmd_eval(args) if args.cmd == "eval" else cmd_record(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# ============================================================
+# feed_bench.py
+# Peak memory of the FR24 search parse, streaming (fr24.py) vs
+# the old whole-body json.loads, on recorded feed.js responses
+#
+# Record feeds with 1..200 flights (real FR24, a running
+# flight_mock.py serve, or generated straight from its traffic):
+#   python3 tools/feed_bench.py record feeds/ --live --box 38.5,37.3,-123,-121.5
+#   python3 tools/feed_bench.py record feeds/ --mock 127.0.0.1:8080
+#   python3 tools/feed_bench.py record feeds/ --synth
+# Replay them:
+#   python3 tools/feed_bench.py run feeds/*.json
+#
+# Bodies go to the parser in http_client-sized chunks copied
+# through one ring buffer. Peaks come from tracemalloc (CPython
+# objects, so compare the two columns rather than reading them
+# as board bytes). The streaming peak should not grow with the
+# number of flights; the json.loads one grows with the body.
+# ============================================================
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import flights
+import fr24
+from flight_mock import Traffic, DEFAULT_BOX
+
+RING_SIZE = 1024  # http_client.RING_SIZE
+
+def _get(host, port, tls, path):
+    cls = http.client.HTTPSConnection if tls else http.client.HTTPConnection
+    conn = cls(host, port, timeout=20)
+    hdrs = {"Connection": "close"}
+    for line in fr24.HEADERS.decode().split("\r\n"):
+        if ":" in line:
+            k, v = line.split(":", 1)
+            hdrs[k.strip()] = v.strip()
+    conn.request("GET", path, headers=hdrs)
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError("HTTP {} for {}".format(resp.status, path))
+    return body
+
+def cmd_record(args):
+    os.makedirs(args.dir, exist_ok=True)
+    limits = [int(x) for x in args.limits.split(",")]
+    traffic = Traffic(args.box, args.aircraft, args.seed) if args.synth else None
+    for limit in limits:
+        path = fr24.SEARCH_HEAD + args.box + fr24.SEARCH_TAIL + str(limit)
+        if traffic is not None:
+            # the whole area the fake traffic flies in, not just the box
+            area = (traffic.clat + traffic.span, traffic.clat - traffic.span,
+                    traffic.clon - traffic.span, traffic.clon + traffic.span)
+            body = json.dumps(traffic.fr24_feed(t=0, box=area, limit=limit)).encode()
+        elif args.mock:
+            host, _, port = args.mock.partition(":")
+            body = _get(host, int(port or 80), False, path)
+        else:
+            body = _get(fr24.SEARCH_HOST, 443, True, path)
+            time.sleep(args.pause)
+        name = os.path.join(args.dir, "feed_{:03d}.json".format(limit))
+        with open(name, "wb") as f:
+            f.write(body)
+        print("{}: {} bytes, {} flights".format(name, len(body), _count(body)))
+    return 0
+
+def _count(body):
+    doc = json.loads(body)
+    return sum(1 for k, v in doc.items() if isinstance(v, list))
+
+_ring = bytearray(RING_SIZE)
+_ring_mv = memoryview(_ring)
+
+def stream(body):
+    """The board's path: ring-sized chunks into fr24.search_sink."""
+    fr24.search_begin()
+    mv = memoryview(body)
+    for i in range(0, len(body), RING_SIZE):
+        n = min(RING_SIZE, len(body) - i)
+        _ring_mv[:n] = mv[i:i + n]
+        if fr24.search_sink(_ring_mv[:n]):
+            break
+    return fr24.search_end(200)
+
+def whole(body):
+    """The old path: whole body in memory, then a dict of every flight."""
+    buf = bytearray()
+    for i in range(0, len(body), RING_SIZE):
+        buf += body[i:i + RING_SIZE]
+    doc = json.loads(buf)
+    for k, v in doc.items():
+        if isinstance(v, list) and len(v) >= 14:
+            return k
+    return False
+
+def peak(fn, body):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(body)
+    p = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return p
+
+def best_ms(fn, body, rounds):
+    best = None
+    for _ in range(rounds):
+        t = time.perf_counter()
+        fn(body)
+        dt = (time.perf_counter() - t) * 1000
+        best = dt if best is None or dt < best else best
+    return best
+
+def cmd_run(args):
+    flights.place(flights.heap)  # the records modes.enter() would take from the arena
+    fr24.configure(args.box, limit=args.limit)
+    flights.on_seen = None
+    rows = []
+    print("{:<24} {:>8} {:>7} {:>7} {:>7} {:>12} {:>12} {:>9} {:>9}".format(
+        "feed", "bytes", "flights", "scanned", "dropped", "stream_peak", "loads_peak", "stream_ms", "loads_ms"))
+    for name in args.feeds:
+        with open(name, "rb") as f:
+            body = f.read()
+        stream(body)  # warm up: key hashes, first-use allocations
+        sp = peak(stream, body)
+        seen, dropped = fr24.aircraft_seen, fr24.aircraft_dropped
+        lp = peak(whole, body)
+        rows.append((sp, lp))
+        print("{:<24} {:>8} {:>7} {:>7} {:>7} {:>12} {:>12} {:>9.2f} {:>9.2f}".format(
+            os.path.basename(name), len(body), _count(body), seen, dropped, sp, lp,
+            best_ms(stream, body, args.rounds), best_ms(whole, body, args.rounds)))
+    if rows:
+        sps = [r[0] for r in rows]
+        lps = [r[1] for r in rows]
+        print("stream peak {}..{} bytes, json.loads peak {}..{} bytes over {} feeds".format(
+            min(sps), max(sps), min(lps), max(lps), len(rows)))
+    return 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="FR24 search parse memory: streaming vs json.loads")
+    ap.add_argument("--box", default=DEFAULT_BOX, help="bounds_box as in settings.toml")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    rc = sub.add_parser("record", help="save feed.js responses for a range of limits")
+    rc.add_argument("dir")
+    rc.add_argument("--limits", default="1,10,25,50,100,200")
+    src = rc.add_mutually_exclusive_group(required=True)
+    src.add_argument("--live", action="store_true", help="the real FR24 feed (use a large --box)")
+    src.add_argument("--mock", help="host:port of tools/flight_mock.py serve")
+    src.add_argument("--synth", action="store_true", help="generate from flight_mock's traffic")
+    rc.add_argument("--aircraft", type=int, default=400, help="--synth: fake aircraft")
+    rc.add_argument("--seed", type=int, default=1)
+    rc.add_argument("--pause", type=float, default=2.0, help="--live: seconds between requests")
+
+    rn = sub.add_parser("run", help="parse recorded feeds both ways")
+    rn.add_argument("feeds", nargs="+")
+    rn.add_argument("--limit", type=int, default=fr24.MAX_LIMIT,
+                    help="fr24.configure limit (above 1: scan everything, nearest in the box wins)")
+    rn.add_argument("--rounds", type=int, default=5, help="timing repeats (best is shown)")
+    args = ap.parse_args(argv)
+    return cmd_record(args) if args.cmd == "record" else cmd_run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
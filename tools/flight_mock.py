@@ -0,0 +1,496 @@
+# ============================================================
+# flight_mock.py
+# Local mock of every flight data provider, plus parser checks
+# and a latency comparison, all run on a computer
+#
+# Serve fake traffic that moves over the bounds box:
+#   python3 tools/flight_mock.py serve --port 8080 --aircraft 120
+# then on the board (settings.toml), with any flight_provider:
+#   flight_mock = "192.168.1.20:8080"
+#   trace = "True"        # TR lines for tools/trace_report.py
+#
+# Check the streaming parsers against json.loads on the same
+# payloads, fed in random chunk sizes:
+#   python3 tools/flight_mock.py check --rounds 200
+#
+# Time search (+details) per provider over real sockets:
+#   python3 tools/flight_mock.py compare --mock 127.0.0.1:8080
+#   python3 tools/flight_mock.py compare --live --local 192.168.1.30:8080
+# ============================================================
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import adsb
+import flights
+import fr24
+
+DEFAULT_BOX = "37.97,37.87,-122.15,-122.0"
+AIRLINES = (
+    ("UA", "UAL", "United Airlines"), ("AS", "ASA", "Alaska Airlines"),
+    ("WN", "SWA", "Southwest Airlines"), ("DL", "DAL", "Delta Air Lines"),
+    ("NH", "ANA", "All Nippon Airways"), ("LH", "DLH", "Lufthansa"),
+)
+TYPES = (("B738", "Boeing 737-800"), ("A320", "Airbus A320-214"), ("B77W", "Boeing 777-300ER"),
+         ("E75L", "Embraer E175LR"), ("A21N", "Airbus A321neo"), ("C172", "Cessna 172 Skyhawk"))
+AIRPORTS = (("SFO", "San Francisco International Airport"), ("OAK", "Oakland International Airport"),
+            ("SJC", "Norman Y. Mineta San Jose International Airport"), ("LAX", "Los Angeles International Airport"),
+            ("SEA", "Seattle-Tacoma International Airport"), ("NRT", "Tokyo Narita Airport"),
+            ("ZRH", "Zürich Airport"))
+
+class Traffic:
+    """Deterministic fake aircraft moving in straight lines around the box."""
+
+    def __init__(self, box_spec, count, seed=1):
+        self.box_spec = box_spec
+        self.box = [float(x) for x in box_spec.split(",")]
+        top, bottom, left, right = self.box
+        self.clat = (top + bottom) / 2
+        self.clon = (left + right) / 2
+        self.span = max(top - bottom, right - left) * 2
+        rnd = random.Random(seed)
+        self.aircraft = []
+        for i in range(count):
+            al = rnd.choice(AIRLINES)
+            ty = rnd.choice(TYPES)
+            orig, dest = rnd.sample(AIRPORTS, 2)
+            num = str(rnd.randint(10, 2999))
+            self.aircraft.append({
+                "fr24_id": "%08x" % rnd.getrandbits(32),
+                "hex": "%06x" % rnd.getrandbits(24),
+                "number": al[0] + num if rnd.random() > 0.1 else None,
+                "callsign": al[1] + num,
+                "reg": "N%d%s" % (rnd.randint(100, 999), rnd.choice("ABCDEFGHJK")),
+                "airline": al[2], "type": ty[0], "model": ty[1],
+                "orig": orig, "dest": dest,
+                "lat0": self.clat + rnd.uniform(-self.span, self.span),
+                "lon0": self.clon + rnd.uniform(-self.span, self.span),
+                "track": rnd.randint(0, 359),
+                "gs": rnd.randint(120, 480) + rnd.random(),
+                "alt": rnd.choice((0, 1500, 3500, 12000, 24000, 36000)) + rnd.randint(0, 99) * 25,
+                "ground": rnd.random() < 0.05,
+                "seen_pos": rnd.choice((0.1, 0.4, 1.2, 3.0, 45.0)),
+            })
+        self.t0 = time.time()
+
+    def latlon(self, a, t):
+        """Where aircraft a is at time t (wrapping inside 2x the box)."""
+        dist = a["gs"] / 3600.0 * t / 60.0  # degrees travelled (1 nm ~ 1/60 deg)
+        lat = a["lat0"] + dist * math.cos(math.radians(a["track"]))
+        lon = a["lon0"] + dist * math.sin(math.radians(a["track"])) / math.cos(math.radians(self.clat))
+        lat = self.clat - self.span + (lat - self.clat + self.span) % (2 * self.span)
+        lon = self.clon - self.span + (lon - self.clon + self.span) % (2 * self.span)
+        return round(lat, 5), round(lon, 5)
+
+    def positions(self, t=None):
+        """Aircraft with lat/lon at time t."""
+        t = time.time() - self.t0 if t is None else t
+        out = []
+        for a in self.aircraft:
+            b = dict(a)
+            b["lat"], b["lon"] = self.latlon(a, t)
+            out.append(b)
+        return out
+
+    def in_box(self, a, box=None):
+        top, bottom, left, right = box or self.box
+        return bottom <= a["lat"] <= top and left <= a["lon"] <= right
+
+    # --- payloads, shaped like the real services -----------------
+
+    def fr24_feed(self, t=None, box=None, limit=1):
+        doc = {"full_count": len(self.aircraft), "version": 4}
+        n = 0
+        for a in self.positions(t):
+            if n < limit and self.in_box(a, box) and not a["ground"]:
+                n += 1
+                doc[a["fr24_id"]] = [
+                    a["hex"].upper(), a["lat"], a["lon"], a["track"], a["alt"], int(a["gs"]),
+                    "1200", "F-KSFO1", a["type"], a["reg"], int(time.time()), a["orig"][0], a["dest"][0],
+                    a["number"] or "", 0, 0, a["callsign"], 0, a["callsign"][:3],
+                ]
+        return doc
+
+    def fr24_details(self, fid, t=None):
+        for a in self.positions(t):
+            if a["fr24_id"] == fid:
+                break
+        else:
+            return None
+        trail = [{"lat": a["lat"] - i * 0.003, "lng": a["lon"] - i * 0.003, "alt": max(0, a["alt"] - i * 50),
+                  "spd": int(a["gs"]), "ts": int(time.time()) - i * 10, "hd": a["track"]} for i in range(300)]
+        return {
+            "identification": {"id": fid, "row": 5500000000,
+                               "number": {"default": a["number"], "alternative": None} if a["number"] else None,
+                               "callsign": a["callsign"]},
+            "status": {"live": True, "text": "Estimated- 14:32", "icon": "green",
+                       "generic": {"status": {"text": "estimated", "type": "arrival", "color": "green"}}},
+            "aircraft": {"model": {"code": a["type"], "text": a["model"]}, "countryId": 3,
+                         "registration": a["reg"], "hex": a["hex"], "age": None, "msn": None,
+                         "images": {"thumbnails": [{"src": "https://example.invalid/t.jpg", "copyright": "x \"quoted\" \\ path"}]}},
+            "airline": {"name": a["airline"], "short": a["airline"].split()[0],
+                        "code": {"iata": a["callsign"][:2], "icao": a["callsign"][:3]}},
+            "owner": None, "airspace": None,
+            "airport": {
+                "origin": {"name": a["orig"][1], "code": {"iata": a["orig"][0], "icao": "K" + a["orig"][0]},
+                           "position": {"latitude": 37.6, "longitude": -122.3, "altitude": 13,
+                                        "country": {"name": "United States", "code": "US"}}},
+                "destination": {"name": a["dest"][1], "code": {"iata": a["dest"][0], "icao": "K" + a["dest"][0]},
+                                "position": {"latitude": 33.9, "longitude": -118.4, "altitude": 125}},
+                "real": None,
+            },
+            "flightHistory": {"aircraft": [{"identification": {"id": "x", "number": {"default": "ZZ1"}}}]},
+            "trail": trail,
+            "firstTimestamp": 1690000000,
+        }
+
+    def _adsb_entry(self, a):
+        e = {"hex": a["hex"], "type": "adsb_icao", "flight": (a["callsign"] + "        ")[:8],
+             "r": a["reg"], "t": a["type"], "desc": a["model"].upper(),
+             "alt_baro": "ground" if a["ground"] else a["alt"], "alt_geom": a["alt"] + 100,
+             "gs": round(a["gs"], 1), "track": a["track"] + 0.25, "squawk": "1200",
+             "lat": a["lat"], "lon": a["lon"], "seen_pos": a["seen_pos"], "seen": 0.2,
+             "messages": 12345, "rssi": -21.4, "nav_modes": ["autopilot", "tcas"]}
+        if a["airline"]:
+            e["ownOp"] = a["airline"]
+        return e
+
+    def adsb_api(self, lat, lon, dist_nm, t=None):
+        ac = []
+        for a in self.positions(t):
+            dlat = (a["lat"] - lat) * 60
+            dlon = (a["lon"] - lon) * 60 * math.cos(math.radians(lat))
+            if math.hypot(dlat, dlon) <= dist_nm:
+                ac.append(self._adsb_entry(a))
+        return {"ac": ac, "msg": "No error", "now": int(time.time() * 1000), "total": len(ac),
+                "ctime": int(time.time() * 1000), "ptime": 3}
+
+    def aircraft_json(self, t=None):
+        return {"now": round(time.time(), 1), "messages": 123456789,
+                "aircraft": [self._adsb_entry(a) for a in self.positions(t)]}
+
+# ------------------------------------------------------------
+# serve
+# ------------------------------------------------------------
+
+def make_handler(traffic, args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *a):
+            pass
+
+        def do_GET(self):
+            t = time.perf_counter()
+            url = urlparse(self.path)
+            doc = None
+            if url.path.endswith("/feed.js"):
+                q = parse_qs(url.query)
+                try:
+                    box = [float(x) for x in q.get("bounds", [""])[0].split(",")]
+                    limit = int(q.get("limit", ["1"])[0])
+                except ValueError:
+                    box, limit = None, 1
+                doc = traffic.fr24_feed(box=box if len(box or ()) == 4 else None, limit=limit)
+            elif url.path.startswith("/clickhandler"):
+                doc = traffic.fr24_details(parse_qs(url.query).get("flight", [""])[0])
+            elif url.path.startswith("/v2/lat/"):
+                p = url.path.strip("/").split("/")
+                try:
+                    doc = traffic.adsb_api(float(p[2]), float(p[4]), float(p[6]))
+                except (IndexError, ValueError):
+                    doc = None
+            elif url.path.endswith("aircraft.json"):
+                doc = traffic.aircraft_json()
+            if doc is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                return
+            body = json.dumps(doc, ensure_ascii=False).encode()
+            if args.delay_ms:
+                time.sleep(args.delay_ms / 1000.0)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Connection", "close")
+            if args.chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(body), 512):
+                    part = body[i:i + 512]
+                    self.wfile.write(b"%x\r\n" % len(part) + part + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            print("{} {} {} bytes {:.1f} ms".format(self.client_address[0], url.path, len(body),
+                                                   (time.perf_counter() - t) * 1000))
+            self.close_connection = True
+    return Handler
+
+def cmd_serve(args):
+    traffic = Traffic(args.box, args.aircraft, args.seed)
+    server = ThreadingHTTPServer((args.bind, args.port), make_handler(traffic, args))
+    print("mock flight providers on {}:{} ({} aircraft, box {})".format(
+        args.bind, args.port, args.aircraft, args.box))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+# ------------------------------------------------------------
+# check: streaming parsers vs json.loads
+# ------------------------------------------------------------
+
+def _feed(body, sink, rnd):
+    """Feed body to sink in random chunk sizes, like http_client's ring."""
+    i = 0
+    while i < len(body):
+        n = rnd.choice((1, 2, 7, 64, 300, 1024))
+        if sink(memoryview(body)[i:i + n]):
+            return True
+        i += n
+    return False
+
+def _fixed(v):
+    return flights.parse_fixed(repr(v))
+
+def _expect_adsb(doc, box_spec):
+    """Nearest airborne, fresh aircraft in the box, the way adsb.py picks it."""
+    box = flights.parse_box(box_spec)
+    best = None
+    for e in doc.get("ac", doc.get("aircraft", [])):
+        if isinstance(e.get("alt_baro"), str) or e.get("seen_pos", 0) > adsb.MAX_SEEN_POS:
+            continue
+        lat, lon = _fixed(e["lat"]), _fixed(e["lon"])
+        if not flights.in_box(box, lat, lon):
+            continue
+        d = flights.box_distance(box, lat, lon)
+        if best is None or d < best[0]:
+            best = (d, e)
+    return best[1] if best else None
+
+def _check_field(errors, what, got, want):
+    if got != want:
+        errors.append("{}: got {!r}, want {!r}".format(what, got, want))
+
+def check_fr24(traffic, rnd, errors):
+    doc = traffic.fr24_feed(t=rnd.uniform(0, 3600))
+    body = json.dumps(doc).encode()
+    fr24.search_begin()
+    _feed(body, fr24.search_sink, rnd)
+    fid = fr24.search_end(200)
+    ids = [k for k in doc if k not in ("full_count", "version")]
+    _check_field(errors, "fr24 search id", fid, ids[0] if ids else False)
+    if not fid:
+        return
+    r = flights.rec
+    arr = doc[fid]
+    _check_field(errors, "fr24 search lat", r[2][flights.N_LAT], _fixed(arr[1]))
+    _check_field(errors, "fr24 search type", flights.text(r, flights.F_TYPE), arr[8])
+
+    det = traffic.fr24_details(fid)
+    body = json.dumps(det, ensure_ascii=rnd.random() < 0.5).encode()
+    fr24.details_begin()
+    stopped = _feed(body, fr24.details_sink, rnd)
+    _check_field(errors, "fr24 details stopped at trail[0]", stopped, True)
+    _check_field(errors, "fr24 details ok", fr24.details_end(200), True)
+    num = det["identification"]["number"]
+    _check_field(errors, "fr24 number", flights.text(r, flights.F_FLIGHT), (num or {}).get("default") or "")
+    _check_field(errors, "fr24 callsign", flights.text(r, flights.F_CALLSIGN), det["identification"]["callsign"])
+    _check_field(errors, "fr24 airline", flights.text(r, flights.F_AIRLINE), det["airline"]["name"])
+    _check_field(errors, "fr24 model", flights.text(r, flights.F_MODEL), det["aircraft"]["model"]["text"])
+    _check_field(errors, "fr24 orig", flights.text(r, flights.F_ORIG), det["airport"]["origin"]["code"]["iata"])
+    _check_field(errors, "fr24 dest", flights.text(r, flights.F_DEST), det["airport"]["destination"]["code"]["iata"])
+    orig_name = det["airport"]["origin"]["name"]
+    if orig_name.isascii():
+        _check_field(errors, "fr24 orig name", flights.text(r, flights.F_ORIG_NAME),
+                     orig_name[:flights.WIDTHS[flights.F_ORIG_NAME]].rstrip())
+    _check_field(errors, "fr24 alt", r[2][flights.N_ALT], det["trail"][0]["alt"])
+    _check_field(errors, "fr24 spd", r[2][flights.N_SPEED], det["trail"][0]["spd"])
+
+def check_adsb(traffic, rnd, errors, local):
+    t = rnd.uniform(0, 3600)
+    if local:
+        adsb.configure_local(traffic.box_spec, "127.0.0.1")
+        doc = traffic.aircraft_json(t)
+    else:
+        adsb.configure_api(traffic.box_spec, host="127.0.0.1")
+        doc = traffic.adsb_api(traffic.clat, traffic.clon, 50, t)
+    body = json.dumps(doc).encode()
+    adsb.search_begin()
+    _feed(body, adsb.search_sink, rnd)
+    got = adsb.search_end(200)
+    want = _expect_adsb(doc, traffic.box_spec)
+    name = adsb.NAME
+    _check_field(errors, name + " id", got, want["hex"] if want else False)
+    _check_field(errors, name + " aircraft scanned", adsb.aircraft_seen, len(doc.get("ac", doc.get("aircraft", []))))
+    if not want:
+        return
+    r = flights.rec
+    _check_field(errors, name + " callsign", flights.text(r, flights.F_CALLSIGN), want["flight"].strip())
+    _check_field(errors, name + " reg", flights.text(r, flights.F_REG), want["r"])
+    _check_field(errors, name + " alt", r[2][flights.N_ALT], want["alt_baro"])
+    _check_field(errors, name + " gs", r[2][flights.N_SPEED], int(want["gs"]))
+    _check_field(errors, name + " lon", r[2][flights.N_LON], _fixed(want["lon"]))
+
+def cmd_check(args):
+    rnd = random.Random(args.seed)
+    traffic = Traffic(args.box, args.aircraft, args.seed)
+    fr24.configure(args.box)
+    flights.place(flights.heap)  # code.py puts these in the arena
+    errors = []
+    for i in range(args.rounds):
+        check_fr24(traffic, rnd, errors)
+        check_adsb(traffic, rnd, errors, local=False)
+        check_adsb(traffic, rnd, errors, local=True)
+        if errors:
+            break
+    for e in errors[:20]:
+        print("FAIL " + e)
+    print("{} rounds x 3 providers: {}".format(args.rounds, "FAILED" if errors else "ok"))
+    return 1 if errors else 0
+
+# ------------------------------------------------------------
+# compare: search (+details) latency per provider
+# ------------------------------------------------------------
+
+def _timed_get(target, sink, read_size=1024):
+    """(status, connect_ms, ttfb_ms, total_ms, parse_ms, bytes) for one request."""
+    host, path, port, tls, headers, _ep = target
+    path = "".join(path) if isinstance(path, tuple) else path
+    t0 = time.perf_counter()
+    cls = http.client.HTTPSConnection if tls else http.client.HTTPConnection
+    conn = cls(host, port, timeout=20)
+    hdrs = {"Connection": "close"}
+    for line in headers.decode().split("\r\n"):
+        if ":" in line:
+            k, v = line.split(":", 1)
+            hdrs[k.strip()] = v.strip()
+    conn.connect()
+    t1 = time.perf_counter()
+    conn.request("GET", path, headers=hdrs)
+    resp = conn.getresponse()
+    t2 = time.perf_counter()
+    parse = 0.0
+    total = 0
+    while True:
+        chunk = resp.read(read_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        p = time.perf_counter()
+        stop = sink(memoryview(chunk))
+        parse += time.perf_counter() - p
+        if stop:
+            break
+    conn.close()
+    t3 = time.perf_counter()
+    return resp.status, (t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t0) * 1000, parse * 1000, total
+
+def _pct(vals, p):
+    vals = sorted(vals)
+    return vals[max(0, min(len(vals) - 1, math.ceil(p / 100.0 * len(vals)) - 1))] if vals else 0
+
+def cmd_compare(args):
+    runs = []
+    if args.mock:
+        host, port = args.mock.split(":")
+        port = int(port)
+        runs.append(("fr24 (mock)", fr24, lambda: fr24.configure(args.box, host=host, details_host=host,
+                                                                 port=port, tls=False)))
+        runs.append(("adsb_api (mock)", adsb, lambda: adsb.configure_api(args.box, host=host, port=port, tls=False)))
+        runs.append(("local (mock)", adsb, lambda: adsb.configure_local(args.box, host, port)))
+    if args.live:
+        runs.append(("fr24", fr24, lambda: fr24.configure(args.box)))
+        runs.append(("adsb_api", adsb, lambda: adsb.configure_api(args.box, host=args.adsb_host)))
+    if args.local:
+        h, p = (args.local.split(":") + ["80"])[:2]
+        runs.append(("local", adsb, lambda: adsb.configure_local(args.box, h, int(p), args.local_path)))
+    if not runs:
+        print("nothing to compare: pass --mock, --live and/or --local")
+        return 1
+
+    print("{:<18} {:>4} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+        "provider", "n", "conn_p50", "ttfb_p50", "total_p50", "total_p95", "parse_p50", "kbytes"))
+    for name, mod, setup in runs:
+        setup()
+        conn, ttfb, total, parse, size = [], [], [], [], []
+        fails = 0
+        for i in range(args.count):
+            try:
+                mod.search_begin()
+                st, c, f, t, p, n = _timed_get(mod.search, mod.search_sink)
+                fid = mod.search_end(st)
+                if fid and mod.HAS_DETAILS:
+                    mod.details_begin()
+                    st2, c2, f2, t2, p2, n2 = _timed_get(mod.details_target(fid), mod.details_sink)
+                    t += t2
+                    p += p2
+                    n += n2
+            except (OSError, http.client.HTTPException) as e:
+                fails += 1
+                print("  {} error: {}".format(name, e))
+                continue
+            conn.append(c)
+            ttfb.append(f)
+            total.append(t)
+            parse.append(p)
+            size.append(n)
+            time.sleep(args.pause)
+        if not total:
+            print("{:<18} all {} requests failed".format(name, fails))
+            continue
+        print("{:<18} {:>4} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.2f} {:>8.1f}".format(
+            name, len(total), _pct(conn, 50), _pct(ttfb, 50), _pct(total, 50), _pct(total, 95),
+            _pct(parse, 50), sum(size) / len(size) / 1024))
+    print("(host timings; parse_p50 is the scanner on CPython, the board is ~100x slower)")
+    return 0
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="mock flight data providers, parser checks, latency comparison")
+    ap.add_argument("--box", default=DEFAULT_BOX, help="bounds_box as in settings.toml")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--aircraft", type=int, default=120, help="fake aircraft in the area")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sv = sub.add_parser("serve", help="serve FR24, ADS-B API and aircraft.json look-alikes")
+    sv.add_argument("--bind", default="0.0.0.0")
+    sv.add_argument("--port", type=int, default=8080)
+    sv.add_argument("--delay-ms", type=int, default=0, help="extra server think time per request")
+    sv.add_argument("--chunked", action="store_true", help="send bodies with chunked encoding")
+
+    ck = sub.add_parser("check", help="streaming parsers vs json.loads, random chunking")
+    ck.add_argument("--rounds", type=int, default=200)
+
+    cp = sub.add_parser("compare", help="time search (+details) per provider")
+    cp.add_argument("--mock", help="host:port of a running 'serve'")
+    cp.add_argument("--live", action="store_true", help="also hit the real FR24 and ADS-B API endpoints")
+    cp.add_argument("--adsb-host", default=adsb.API_HOST)
+    cp.add_argument("--local", help="host[:port] of a dump1090/readsb box")
+    cp.add_argument("--local-path", default=adsb.LOCAL_PATH)
+    cp.add_argument("--count", type=int, default=10)
+    cp.add_argument("--pause", type=float, default=1.0, help="seconds between requests")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "serve":
+        return cmd_serve(args)
+    if args.cmd == "check":
+        return cmd_check(args)
+    return cmd_compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
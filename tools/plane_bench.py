@@ -0,0 +1,178 @@
+# ============================================================
+# plane_bench.py
+# The plane animation before and after the sprite sheet:
+# frame time and allocations per frame, plus what building the
+# sheet costs at boot
+#
+#   micropython tools/plane_bench.py [headings] [work_ms] [width] [height]
+#   python3 tools/plane_bench.py 16 8
+#   python3 tools/plane_bench.py 8 0 64 32 show
+#
+# "old" is the loop code.py had: move the group one pixel right
+# to left, then sleep PLANE_SPEED. "new" is sprites.fly(). work_ms
+# is busy time added to every frame (display refresh, polls), so
+# the old loop's frames stretch to PLANE_SPEED + work_ms while
+# the new one stays on PLANE_SPEED. Allocations are counted with
+# a zero frame time (no sleeps): gc.mem_alloc() on the unix
+# port, tracemalloc's peak on CPython (it boxes every int above
+# 256, so quote the unix port's numbers). "show" prints the
+# sheet as text.
+# ============================================================
+
+import sys
+import gc
+import time
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+import sprites
+
+PLANE_SPEED = 0.04  # code.py
+FRAME_MS = 40
+
+class Bitmap:
+    def __init__(self, width, height, colors=2):
+        self.width = width
+        self.height = height
+        self.px = bytearray(width * height)
+
+    def __setitem__(self, xy, v):
+        self.px[xy[1] * self.width + xy[0]] = v
+
+    def __getitem__(self, xy):
+        return self.px[xy[1] * self.width + xy[0]]
+
+class Layer:
+    """Stands in for a Group / TileGrid: x, y and one tile index."""
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.tile = 0
+
+    def __setitem__(self, i, v):
+        self.tile = v
+
+def plane_bitmap():
+    """The 12x12 plane code.py draws, pixel for pixel."""
+    b = Bitmap(12, 12)
+    for x, y in ((6, 0), (6, 1), (5, 1), (4, 2), (5, 2), (6, 2), (9, 3), (5, 3), (4, 3), (3, 3),
+                 (9, 6), (5, 6), (4, 6), (3, 6), (6, 9), (6, 8), (5, 8), (4, 7), (5, 7), (6, 7)):
+        b[x, y] = 1
+    for x in range(1, 10):
+        b[x, 4] = b[x, 5] = 1
+    return b
+
+def ticks():
+    try:
+        return time.ticks_ms()
+    except AttributeError:
+        return int(time.monotonic() * 1000)
+
+def busy(ms):
+    end = ticks() + ms
+    while ticks() < end:
+        pass
+
+def old_animation(g, width, feed, stop, speed=PLANE_SPEED):
+    for i in range(width + 24, -12, -1):
+        g.x = i
+        feed()
+        if stop():
+            return False
+        time.sleep(speed)
+    return True
+
+def new_animation(tg, path, k, feed, stop, frame_ms=FRAME_MS):
+    sprites.pace(frame_ms)
+    return sprites.fly(tg, path, k, feed, stop)
+
+# frame times seen by feed(): one call per frame in both loops
+_stamps = []
+
+def stamp():
+    _stamps.append(ticks())
+
+def frame_times():
+    d = [_stamps[i + 1] - _stamps[i] for i in range(len(_stamps) - 1)]
+    d.sort()
+    if not d:
+        return 0, 0, 0, 0
+    return len(d) + 1, sum(d) / len(d), d[len(d) * 95 // 100], _stamps[-1] - _stamps[0]
+
+def no_feed():
+    pass
+
+def allocated(fn):
+    """Bytes allocated while fn() runs (fn runs with a zero frame time)."""
+    fn()  # warm up: first-use allocations
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        a = gc.mem_alloc()
+        fn()
+        used = gc.mem_alloc() - a
+        gc.enable()
+        return used
+    import tracemalloc
+    tracemalloc.start()
+    a = tracemalloc.get_traced_memory()[0]
+    fn()
+    used = tracemalloc.get_traced_memory()[1] - a
+    tracemalloc.stop()
+    return used
+
+def main():
+    headings = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    work_ms = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    height = int(sys.argv[4]) if len(sys.argv) > 4 else 32
+    src = plane_bitmap()
+
+    gc.collect()
+    t = ticks()
+    sheet = Bitmap(sprites.SIZE * headings, sprites.SIZE)
+    sprites.build_sheet(src, sheet, headings)
+    path = sprites.paths(width, height, headings)
+    print("sheet: {} headings, {}x{} px, built in {} ms at boot".format(
+        headings, sheet.width, sheet.height, ticks() - t))
+    if "show" in sys.argv:
+        for y in range(sprites.SIZE):
+            print(" ".join("".join("#" if sheet[k * sprites.SIZE + x, y] else "."
+                                   for x in range(sprites.SIZE)) for k in range(headings)))
+
+    g = Layer()
+    tg = Layer()
+    west = sprites.heading_index(270, headings)
+    never = lambda: False
+    work = lambda: busy(work_ms) or False
+
+    print("anim,frames,alloc_bytes,alloc_per_frame,frame_ms_mean,frame_ms_p95,total_ms")
+    rows = (
+        ("old", lambda: old_animation(g, width, no_feed, never, 0),
+         lambda: old_animation(g, width, stamp, work)),
+        ("new", lambda: new_animation(tg, path, west, no_feed, never, 0),
+         lambda: new_animation(tg, path, west, stamp, work)),
+    )
+    for name, quiet, timed in rows:
+        used = allocated(quiet)
+        del _stamps[:]
+        timed()
+        frames, mean, p95, total = frame_times()
+        per = "{:.1f}".format(used / max(frames, 1)) if hasattr(gc, "mem_alloc") else "-"
+        print("{},{},{},{},{:.1f},{},{}".format(name, frames, used, per, mean, p95, total))
+
+    # every heading's path must start and end with the sprite off the panel
+    bad = 0
+    for k in range(headings):
+        i = 5 * k
+        for f in (0, path[i + 4] - 1):
+            x = path[i] + f * path[i + 2] // sprites.FIX
+            y = path[i + 1] + f * path[i + 3] // sprites.FIX
+            if x > -sprites.SIZE and x < width and y > -sprites.SIZE and y < height:
+                bad += 1
+                print("heading {}: frame {} at ({}, {}) is on the panel".format(k, f, x, y))
+    print("paths: " + ("ok" if not bad else str(bad) + " on-panel ends"))
+    sys.exit(1 if bad else 0)
+
+main()
@@ -0,0 +1,211 @@
+# ============================================================
+# predict_replay.py
+# Time-to-display benchmark for predictive mode (predict.py)
+#
+#   python3 tools/predict_replay.py --hours 3 --provider fr24
+#   python3 tools/predict_replay.py --provider local --poll 10
+#
+# Replays the flight mode loop on a virtual clock over the fake
+# traffic from flight_mock.py. Every search response is generated
+# for that moment and goes through the real provider parser and
+# predict.py, once with prediction off and once with it on.
+# Searches, details fetches and the plane/row animation cost the
+# seconds given on the command line.
+#
+# Reports, for aircraft that crossed the bounds box:
+#   caught     share that was shown at all
+#   ttd p50/90 seconds from entering the box to being on screen
+#   early      shown before it entered (the prediction ran ahead)
+#   missed     shown by prediction but never entered within 60 s
+# ============================================================
+
+import argparse
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import adsb
+import flights
+import fr24
+import predict
+from flight_mock import Traffic, DEFAULT_BOX
+
+def _feed(mod, doc):
+    body = json.dumps(doc).encode()
+    for i in range(0, len(body), 1024):
+        if mod.search_sink(memoryview(body)[i:i + 1024]):
+            break
+
+class Replay:
+    def __init__(self, args, use_predict):
+        self.args = args
+        self.use_predict = use_predict
+        self.traffic = Traffic(args.box, args.aircraft, args.seed)
+        self.ids = {}  # provider id -> aircraft dict
+        for a in self.traffic.aircraft:
+            self.ids[a["fr24_id"] if args.provider == "fr24" else a["hex"]] = a
+        search_box = None
+        flights.on_seen = None
+        predict.enabled = False
+        predict.clear()
+        flights.place(flights.heap)  # code.py puts these in the arena
+        if use_predict:
+            search_box = predict.configure(args.box, args.scale, args.horizon)
+            predict.place(flights.heap)
+            flights.on_seen = predict.consider
+            predict.exclude(flights.new_record())
+        self.search_box = [float(x) for x in (search_box or args.box).split(",")]
+        if args.provider == "fr24":
+            self.mod = fr24
+            fr24.configure(args.box, search_box=search_box)
+        else:
+            self.mod = adsb
+            adsb.configure_local(args.box, "replay", search_box=search_box)
+
+    def search(self, t):
+        """One search at virtual time t; returns the id in the box or False."""
+        if self.use_predict:
+            predict.begin()
+        self.mod.search_begin()
+        if self.mod is fr24:
+            limit = fr24.PREDICT_LIMIT if self.use_predict else 1
+            doc = self.traffic.fr24_feed(t, box=self.search_box, limit=limit)
+        else:
+            doc = self.traffic.aircraft_json(t)
+        _feed(self.mod, doc)
+        found = self.mod.search_end(200)
+        if self.use_predict:
+            predict.end(now=t)
+        return found
+
+    def in_box(self, fid, t):
+        lat, lon = self.traffic.latlon(self.ids[fid], t)
+        top, bottom, left, right = self.traffic.box
+        return bottom <= lat <= top and left <= lon <= right
+
+    def run(self):
+        """[(id, shown_at)] over the replay."""
+        a = self.args
+        details = a.details if self.mod.HAS_DETAILS else 0.0
+        t = 0.0
+        end = a.hours * 3600
+        last = ""
+        shown = []
+        searches = fetches = 0
+        while t < end:
+            fid = self.search(t)
+            searches += 1
+            t += a.search
+            if fid and fid != last:
+                if not (self.use_predict and predict.take(flights.rec)):
+                    t += details
+                    fetches += 1 if details else 0
+                shown.append((fid, t))
+                if self.use_predict:
+                    predict.exclude(flights.rec)
+                t += a.show
+                last = fid
+            elif not fid:
+                last = ""
+            if self.use_predict and predict.pending() and not predict.ready:
+                t += details
+                fetches += 1 if details else 0
+                predict.ready = True
+            wait = a.poll
+            if self.use_predict and predict.pending() and predict.ready:
+                due = max(0.0, predict.ahead_at - t)
+                if due < wait:
+                    t += due
+                    flights.copy(flights.rec, predict.ahead)
+                    fid = flights.text(flights.rec, flights.F_ID)
+                    predict.take(flights.rec)
+                    shown.append((fid, t))
+                    predict.exclude(flights.rec)
+                    t += a.show
+                    last = fid
+                    continue
+            t += wait
+        self.searches = searches
+        self.fetches = fetches
+        return shown
+
+def crossings(traffic, hours, step):
+    """{aircraft index: [entry times]} from sampling the fake traffic."""
+    top, bottom, left, right = traffic.box
+    out = {}
+    for i, a in enumerate(traffic.aircraft):
+        if a["ground"]:
+            continue
+        inside = False
+        t = 0.0
+        while t < hours * 3600:
+            lat, lon = traffic.latlon(a, t)
+            now = bottom <= lat <= top and left <= lon <= right
+            if now and not inside and t > 0:
+                out.setdefault(i, []).append(t)
+            inside = now
+            t += step
+    return out
+
+def score(rep, shown, truth, step):
+    index = {id(a): i for i, a in enumerate(rep.traffic.aircraft)}
+    ttd = []
+    early = missed = 0
+    caught = set()
+    for fid, at in shown:
+        i = index[id(rep.ids[fid])]
+        entries = truth.get(i, [])
+        # the crossing this display belongs to: last entry before it, or one just after
+        best = None
+        for e in entries:
+            if e <= at + 60 and (best is None or abs(at - e) < abs(at - best)):
+                best = e
+        if best is None:
+            missed += 1
+            continue
+        caught.add((i, best))
+        if at < best:
+            early += 1
+        ttd.append(max(0.0, at - best))
+    total = sum(len(v) for v in truth.values())
+    ttd.sort()
+
+    def pct(p):
+        return ttd[max(0, min(len(ttd) - 1, math.ceil(p / 100.0 * len(ttd)) - 1))] if ttd else float("nan")
+    return total, len(caught), pct(50), pct(90), early, missed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="replay benchmark of time-to-display with and without prediction")
+    ap.add_argument("--box", default=DEFAULT_BOX)
+    ap.add_argument("--aircraft", type=int, default=120)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--hours", type=float, default=3)
+    ap.add_argument("--provider", choices=("fr24", "local"), default="fr24")
+    ap.add_argument("--poll", type=float, default=35, help="seconds between searches (QUERY_DELAY + 5)")
+    ap.add_argument("--search", type=float, default=1.5, help="seconds per search request")
+    ap.add_argument("--details", type=float, default=2.5, help="seconds per details request (fr24)")
+    ap.add_argument("--show", type=float, default=25, help="seconds of plane animation + row scrolls")
+    ap.add_argument("--scale", type=int, default=predict.SCALE)
+    ap.add_argument("--horizon", type=int, default=predict.HORIZON)
+    ap.add_argument("--step", type=float, default=2, help="ground truth sampling step (s)")
+    args = ap.parse_args(argv)
+
+    truth = crossings(Traffic(args.box, args.aircraft, args.seed), args.hours, args.step)
+    print("{:.1f} h of {} aircraft, provider {}, poll {} s".format(args.hours, args.aircraft, args.provider, args.poll))
+    print("{:<10} {:>9} {:>9} {:>8} {:>8} {:>8} {:>6} {:>7} {:>9} {:>8}".format(
+        "mode", "crossings", "caught", "caught%", "ttd_p50", "ttd_p90", "early", "missed", "searches", "details"))
+    for use in (False, True):
+        rep = Replay(args, use)
+        shown = rep.run()
+        total, caught, p50, p90, early, missed = score(rep, shown, truth, args.step)
+        print("{:<10} {:>9} {:>9} {:>7.0f}% {:>8.1f} {:>8.1f} {:>6} {:>7} {:>9} {:>8}".format(
+            "predict" if use else "baseline", total, caught, 100.0 * caught / total if total else 0,
+            p50, p90, early, missed, rep.searches, rep.fetches))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
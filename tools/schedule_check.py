@@ -0,0 +1,175 @@
+# ============================================================
+# schedule_check.py
+# Host checks for schedule.py and the Pacific time helpers
+#
+#   python3 tools/schedule_check.py
+#   python3 tools/schedule_check.py --schedule "bus mon-fri 07:15-08:15; combined sat,sun 22:00-02:00 5"
+#
+# - Fixed cases: weekday window, week wrap, a window past
+#   midnight, holidays, priorities, both DST changes, overrides
+# - Then, over a year of random start times, next_transition()
+#   must match a minute-by-minute scan of mode_at(), and
+#   timeutil must agree with Python's America/Los_Angeles zone
+# Exits 1 on the first failure.
+# ============================================================
+
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import schedule
+import timeutil
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except ImportError:  # Python < 3.9
+    PACIFIC = None
+
+MODES = ("flight", "bus", "combined")
+failures = 0
+
+def local(y, mo, d, hh=0, mm=0):
+    """UTC epoch of a Pacific wall-clock time (first instance if repeated)."""
+    if PACIFIC is not None:
+        return int(datetime.datetime(y, mo, d, hh, mm, tzinfo=PACIFIC).timestamp())
+    return timeutil.pacific_to_utc(timeutil.day_number(y, mo, d) * 86400 + hh * 3600 + mm * 60)
+
+def expect(name, got, want):
+    global failures
+    if got != want:
+        failures += 1
+        print("FAIL {}: got {!r}, want {!r}".format(name, got, want))
+
+def fixed_cases():
+    schedule.load("bus mon-fri 07:15-08:15", "", MODES)
+    # 2026-10-19 is a Monday
+    expect("weekday in window", schedule.mode_at(local(2026, 10, 19, 7, 30)), "bus")
+    expect("weekday before", schedule.mode_at(local(2026, 10, 19, 7, 14)), None)
+    expect("window end is exclusive", schedule.mode_at(local(2026, 10, 19, 8, 15)), None)
+    expect("saturday", schedule.mode_at(local(2026, 10, 24, 7, 30)), None)
+    expect("friday -> monday", schedule.next_transition(local(2026, 10, 23, 9, 0)), local(2026, 10, 26, 7, 15))
+    expect("sunday night -> monday", schedule.next_transition(local(2026, 10, 25, 23, 59)), local(2026, 10, 26, 7, 15))
+
+    schedule.load("combined sun 23:00-01:00", "", MODES)
+    expect("past midnight, sunday", schedule.mode_at(local(2026, 10, 25, 23, 30)), "combined")
+    expect("past midnight, monday", schedule.mode_at(local(2026, 10, 26, 0, 30)), "combined")
+    expect("past midnight, ended", schedule.mode_at(local(2026, 10, 26, 1, 0)), None)
+    expect("past midnight, saturday", schedule.mode_at(local(2026, 10, 24, 23, 30)), None)
+    expect("past midnight, end", schedule.next_transition(local(2026, 10, 25, 23, 30)), local(2026, 10, 26, 1, 0))
+
+    schedule.load("bus mon-fri 07:15-08:15; flight hol 07:00-09:00", "2026-11-26", MODES)
+    expect("holiday skips weekday window", schedule.mode_at(local(2026, 11, 26, 7, 30)), "flight")
+    expect("day after holiday", schedule.mode_at(local(2026, 11, 27, 7, 30)), "bus")
+    expect("wed -> holiday window", schedule.next_transition(local(2026, 11, 25, 9, 0)), local(2026, 11, 26, 7, 0))
+
+    schedule.load("bus daily 07:00-09:00; combined mon-fri 07:30-08:00 5", "", MODES)
+    expect("priority wins", schedule.mode_at(local(2026, 10, 19, 7, 45)), "combined")
+    expect("priority ends", schedule.next_transition(local(2026, 10, 19, 7, 45)), local(2026, 10, 19, 8, 0))
+    expect("lower priority elsewhere", schedule.mode_at(local(2026, 10, 24, 7, 45)), "bus")
+
+    # DST starts 2026-03-08 02:00 (clocks go to 03:00), ends 2026-11-01 02:00 (back to 01:00)
+    schedule.load("bus daily 07:15-08:15", "", MODES)
+    expect("spring forward, 07:15 PDT", schedule.next_transition(local(2026, 3, 7, 12, 0)), local(2026, 3, 8, 7, 15))
+    expect("spring forward, utc", local(2026, 3, 8, 7, 15) - local(2026, 3, 7, 7, 15), 23 * 3600)
+    expect("fall back, 07:15 PST", schedule.next_transition(local(2026, 10, 31, 12, 0)), local(2026, 11, 1, 7, 15))
+    expect("fall back, utc", local(2026, 11, 1, 7, 15) - local(2026, 10, 31, 7, 15), 25 * 3600)
+    schedule.load("flight sun 01:30-03:30", "", MODES)
+    expect("window over the skipped hour", schedule.mode_at(local(2026, 3, 8, 3, 15)), "flight")
+    expect("window over the repeated hour", schedule.mode_at(local(2026, 11, 1, 1, 45) + 3600), "flight")
+    schedule.load("flight sun 01:30-02:30", "", MODES)
+    expect("window ending in the skipped hour", schedule.next_transition(local(2026, 3, 8, 1, 45)), local(2026, 3, 8, 3, 0))
+
+    expect("bad window", _raises("bus someday 07:00-08:00"), True)
+    expect("unknown mode", _raises("radar mon 07:00-08:00"), True)
+    expect("bad time", _raises("bus mon 25:00-26:00"), True)
+
+    # check(): one compare per call, recompute at the change, overrides end there
+    schedule.load("bus mon-fri 07:15-08:15", "", MODES)
+    t0 = local(2026, 10, 19, 7, 0)
+    schedule.resync(t0, 1000.0)
+    expect("before window", schedule.check(1000.0), None)
+    expect("next change", schedule.next_change, 1000.0 + 15 * 60)
+    schedule.set_override("bus")
+    expect("override", schedule.check(1500.0), "bus")
+    expect("override cleared by window start", schedule.check(1000.0 + 15 * 60), "bus")
+    expect("override is gone", schedule.override, None)
+    schedule.set_override("flight")
+    expect("DOWN in the window", schedule.check(1000.0 + 30 * 60), "flight")
+    expect("window end", schedule.check(1000.0 + 75 * 60), None)
+    schedule.resync(t0 + 7 * 86400, 5000.0)
+    expect("resync recomputes", schedule.next_change, 5000.0 + 15 * 60)
+
+def _raises(spec):
+    try:
+        schedule.load(spec, "", MODES)
+    except ValueError:
+        return True
+    return False
+
+def scan_next(t, limit):
+    """Brute force: first whole minute after t where mode_at() changes."""
+    now = schedule.mode_at(t)
+    m = t - t % 60 + 60
+    while m <= t + limit:
+        if schedule.mode_at(m) != now:
+            return m
+        m += 60
+    return None
+
+def random_cases(spec, n, seed):
+    global failures
+    rng = random.Random(seed)
+    schedule.load(spec, "2026-11-26,2026-12-25", MODES)
+    year = local(2026, 1, 1)
+    for _ in range(n):
+        t = year + rng.randrange(365 * 86400)
+        if rng.random() < 0.2:  # the days around both DST changes
+            t = rng.choice((local(2026, 3, 8), local(2026, 11, 1))) + rng.randrange(-8 * 86400, 86400)
+        want = scan_next(t, 8 * 86400)
+        got = schedule.next_transition(t)
+        if want is not None and got != want:
+            failures += 1
+            print("FAIL next_transition({}): got {}, want {} ({})".format(t, got, want, spec))
+            return
+
+def clock_cases(n, seed):
+    global failures
+    if PACIFIC is None:
+        print("no zoneinfo; skipping the timeutil comparison")
+        return
+    rng = random.Random(seed)
+    for _ in range(n):
+        t = rng.randrange(local(2007, 1, 1), local(2037, 12, 31))
+        d = datetime.datetime.fromtimestamp(t, PACIFIC)
+        got = timeutil.get_pacific_hm_wday(t)
+        if got != (d.hour, d.minute, d.weekday()):
+            failures += 1
+            print("FAIL get_pacific_hm_wday({}): got {}, want {}".format(t, got, d))
+            return
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="check schedule.py and the Pacific time helpers")
+    ap.add_argument("--schedule", action="append",
+                    help="extra schedule to compare against a brute-force scan (repeatable)")
+    ap.add_argument("--samples", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    fixed_cases()
+    specs = ["bus mon-fri 07:15-08:15",
+             "bus mon-fri 07:15-08:15; combined sat,sun 22:00-02:00 5; flight hol 00:00-24:00 9",
+             "flight fri-mon 01:30-02:30; bus daily 01:00-03:00 1",
+             "combined sun 02:15-02:45; bus sun 01:00-01:30"]
+    for spec in specs + (args.schedule or []):
+        random_cases(spec, args.samples, args.seed)
+    clock_cases(20000, args.seed)
+    print("schedule_check: " + ("ok" if not failures else str(failures) + " failed"))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,970 @@
+# ============================================================
+# soak.py
+# Run code.py's main loop for simulated days on a computer:
+# fake hardware, recorded responses, a virtual clock, random
+# button presses and injected network errors
+#
+# Record flight responses once (CPython, from flight_mock's
+# traffic):
+#   python3 tools/soak.py record soak/
+# Soak on the unix port with the heap capped near the M4's:
+#   micropython -X heapsize=160k tools/soak.py run soak/ --hours 72
+#   python3 tools/soak.py run soak/ --hours 24 --set predict=True
+#
+# - time.sleep() and time.monotonic() move a virtual clock, so
+#   a day takes seconds; the watchdog is the real 16 s against
+#   that clock. A starved watchdog "resets" the board: every
+#   repo module is thrown away and code.py boots again with
+#   the same NVM and reset_reason WATCHDOG
+# - 511 bodies come from one template patched in place with the
+#   virtual time; FR24 feeds / details are the recorded files,
+#   read straight into the caller's buffer
+# - Errors: connect / DNS failures, stalls past the socket
+#   timeout, resets and early closes mid-body, HTTP 500 / 429,
+#   dropped Wi-Fi (--errors scales all the rates, 0 = none)
+# - Output, CSV like the board's own lines:
+#     SOAK,watchdog,<hour>,<phase>      SOAK,memory_error,<hour>,<msg>
+#     SOAK,hour,<h>,<mode>,<requests>,<free_min>,<largest_min>
+#     SOAK,summary,...  SOAK,requests,...  SOAK,injected,...
+#     SOAK,power,awake_pct=..,dark_s=..,requests_per_h=..
+# Exits 1 on a MemoryError, a watchdog reset, a crash out of
+# code.py, more than --max-top-errors "Top level error" lines
+# (code.py caught something and restarted its loop), more than
+# --max-nvm-per-day NVM writes (flash wear), or the largest free
+# block shrinking more than --max-drop between the first and
+# last hour. -X heapsize also
+# holds the harness and code.py's bytecode (compiled into the
+# heap on the board too); size it to what the board reports
+# free at boot plus ~20 KB. CPython runs the same loop but its
+# heap numbers are meaningless, so the drop check is skipped.
+# ============================================================
+
+import sys
+import gc
+import math
+import random
+import time as _time
+import os as _os
+
+_here = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+ROOT = _here + "/.."
+sys.path.insert(0, ROOT)
+sys.path.insert(0, _here)
+
+MICROPYTHON = sys.implementation.name == "micropython"
+
+SNAPSHOT_SECONDS = 30    # one recorded FR24 feed per 30 s of traffic
+CALL_COST = 0.0005       # virtual seconds per time.monotonic() call (CPU time)
+LINK_BYTES_PER_S = 40000 # ESP32SPI throughput
+CONNECT_S = 0.15
+TLS_S = 0.6
+SAMPLE_SECONDS = 600     # heap sample every 10 virtual minutes
+PRESS_SECONDS = 0.3
+PROBE_LIMIT = 64 * 1024
+
+# Error rates per request (per connect for Wi-Fi drops), scaled by --errors
+RATES = (
+    ("connect", 0.02),   # OSError / RuntimeError from connect or DNS
+    ("stall", 0.02),     # nothing arrives for longer than the socket timeout
+    ("reset", 0.01),     # OSError half way through the body
+    ("truncate", 0.01),  # connection closed before Content-Length
+    ("http500", 0.01),
+    ("http429", 0.005),
+    ("wifi", 0.005),     # the AP drops us; connect_AP may fail a few times
+)
+
+class SoakDone(BaseException):
+    pass
+
+class SoakReset(BaseException):
+    pass
+
+def usage():
+    print("usage: soak.py record <dir> [--box b] [--aircraft n] [--minutes m] [--seed s]")
+    print("       soak.py run <dir> [--hours h] [--start 2026-10-19T13:00:00Z] [--seed s]")
+    print("                  [--errors x] [--press-minutes m] [--max-drop bytes]")
+    print("                  [--max-top-errors n] [--max-nvm-per-day n]")
+    print("                  [--set key=value ...] [--verbose]")
+    sys.exit(2)
+
+def options(argv, defaults):
+    """--key value pairs into a dict (no argparse on the unix port)."""
+    opts = dict(defaults)
+    sets = []
+    pos = []
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == "--verbose":
+            opts["verbose"] = True
+        elif a == "--set":
+            i += 1
+            sets.append(argv[i])
+        elif a.startswith("--"):
+            k = a[2:].replace("-", "_")
+            if k not in defaults or i + 1 >= len(argv):
+                usage()
+            i += 1
+            opts[k] = type(defaults[k])(argv[i])
+        else:
+            pos.append(a)
+        i += 1
+    opts["set"] = sets
+    return pos, opts
+
+# ------------------------------------------------------------
+# record (CPython)
+# ------------------------------------------------------------
+
+def cmd_record(argv):
+    import json
+    from flight_mock import Traffic, DEFAULT_BOX
+    pos, o = options(argv, {"box": DEFAULT_BOX, "aircraft": 150, "minutes": 120, "seed": 1})
+    if len(pos) != 1:
+        usage()
+    out = pos[0]
+    try:
+        _os.mkdir(out)
+    except OSError:
+        pass
+    traffic = Traffic(o["box"], o["aircraft"], o["seed"])
+    # predict's default search box (3x), so predict=True has traffic to work with
+    area = (traffic.clat + traffic.span * 0.75, traffic.clat - traffic.span * 0.75,
+            traffic.clon - traffic.span * 0.75, traffic.clon + traffic.span * 0.75)
+    count = o["minutes"] * 60 // SNAPSHOT_SECONDS
+    quiet = count - count // 5  # the last fifth is empty sky, for the idle path
+    fids = {}
+    for i in range(count):
+        t = i * SNAPSHOT_SECONDS
+        doc = traffic.fr24_feed(t=t, box=area, limit=30 if i < quiet else 0)
+        for k, v in doc.items():
+            if isinstance(v, list):
+                fids.setdefault(k, t)
+        with open("{}/feed_{:03d}.json".format(out, i), "w") as f:
+            json.dump(doc, f, separators=(",", ":"))
+    size = 0
+    for fid, t in fids.items():
+        d = traffic.fr24_details(fid, t)
+        d["trail"] = d["trail"][:60]
+        body = json.dumps(d, separators=(",", ":"))
+        size += len(body)
+        with open("{}/d_{}.json".format(out, fid), "w") as f:
+            f.write(body)
+    print("{}: {} feeds ({} with traffic), {} details, {} KB of details".format(
+        out, count, quiet, len(fids), size // 1024))
+    return 0
+
+# ------------------------------------------------------------
+# virtual clock, watchdog, scheduled events
+# ------------------------------------------------------------
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.end = 0.0
+        self.last_feed = self.now
+        self.dead = None     # SoakReset / SoakDone once raised: keep raising it
+        self.next_event = 0.0
+        self.on_event = None
+
+    def advance(self, dt):
+        self.now += dt
+        if self.dead is not None:
+            raise self.dead()
+        if self.now >= self.end:
+            self.dead = SoakDone
+            raise SoakDone()
+        if self.now - self.last_feed > wdt.timeout:
+            self.dead = SoakReset
+            raise SoakReset()
+        if self.now >= self.next_event:
+            self.on_event()
+
+clock = Clock()
+
+def _sleep(seconds):
+    clock.advance(max(0.0, seconds))
+
+def _monotonic():
+    clock.advance(CALL_COST)
+    return clock.now
+
+def _epoch():
+    return start_epoch + int(clock.now - run_start)
+
+start_epoch = 0
+run_start = clock.now
+
+# ------------------------------------------------------------
+# fake hardware
+# ------------------------------------------------------------
+
+class _Obj:
+    pass
+
+def new_module(name, **attrs):
+    try:
+        m = type(sys)(name)
+    except TypeError:
+        m = _Obj()  # unix port: modules can't be created, any object will do
+    for k in attrs:
+        setattr(m, k, attrs[k])
+    sys.modules[name] = m
+    return m
+
+def copy_module(real, name):
+    m = new_module(name)
+    for k in dir(real):
+        if not k.startswith("__"):
+            try:
+                setattr(m, k, getattr(real, k))
+            except (AttributeError, TypeError):
+                pass
+    return m
+
+class Watchdog:
+    def __init__(self):
+        self.timeout = 16
+        self.mode = None
+
+    def feed(self):
+        clock.last_feed = clock.now
+
+wdt = Watchdog()
+
+class _Pins:
+    def __getattr__(self, name):
+        return name
+
+press_pin = None
+press_until = 0.0
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = None
+        self.pull = None
+
+    @property
+    def value(self):
+        return not (self.pin == press_pin and clock.now < press_until)
+
+class Bitmap:
+    def __init__(self, width, height, colors):
+        self.width = width
+        self.height = height
+        self._px = bytearray(width * height)
+
+    def __setitem__(self, xy, v):
+        self._px[xy[1] * self.width + xy[0]] = v
+
+    def __getitem__(self, xy):
+        return self._px[xy[1] * self.width + xy[0]]
+
+class Palette:
+    def __init__(self, n):
+        self._c = [0] * n
+
+    def __setitem__(self, i, v):
+        self._c[i] = v
+
+    def __getitem__(self, i):
+        return self._c[i]
+
+    def __len__(self):
+        return len(self._c)
+
+class Layer:
+    def __init__(self, *args, x=0, y=0, **kwargs):
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.in_group = False
+
+class TileGrid(Layer):
+    def __init__(self, bitmap, pixel_shader=None, width=1, height=1,
+                 tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        Layer.__init__(self, x=x, y=y)
+        self.bitmap = bitmap
+        self._tiles = bytearray(width * height)
+        for i in range(width * height):
+            self._tiles[i] = default_tile
+
+    def __setitem__(self, i, v):
+        self._tiles[i if isinstance(i, int) else i[0]] = v
+
+    def __getitem__(self, i):
+        return self._tiles[i if isinstance(i, int) else i[0]]
+
+class Group(Layer):
+    def __init__(self, scale=1, x=0, y=0):
+        Layer.__init__(self, x=x, y=y)
+        self._items = []
+
+    def append(self, layer):
+        if layer.in_group:
+            raise ValueError("Layer already in a group")
+        layer.in_group = True
+        self._items.append(layer)
+
+    def pop(self, i=-1):
+        layer = self._items.pop(i)
+        layer.in_group = False
+        return layer
+
+    def __len__(self):
+        return len(self._items)
+
+class Label(Layer):
+    def __init__(self, font, text="", color=0, x=0, y=0, **kwargs):
+        Layer.__init__(self, x=x, y=y)
+        self.color = color
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, s):
+        self._text = s
+        self.bounding_box = (0, -6, 6 * len(s), 12)  # terminalio: 6 px a character
+
+class Matrix:
+    def __init__(self, width=64, height=32, **kwargs):
+        self.width = width
+        self.height = height
+        self.brightness = 1.0
+
+class Display:
+    def __init__(self, matrix, auto_refresh=True):
+        self.width = matrix.width
+        self.height = matrix.height
+        self.auto_refresh = auto_refresh
+        self._root = None
+
+    @property
+    def root_group(self):
+        return self._root
+
+    @root_group.setter
+    def root_group(self, g):
+        # displayio: the root counts as being in a group until it is replaced
+        if g is self._root:
+            return
+        if g is not None and g.in_group:
+            raise ValueError("Group already used")
+        if self._root is not None:
+            self._root.in_group = False
+        if g is not None:
+            g.in_group = True
+        self._root = g
+
+class NeoPixel:
+    def __init__(self, pin, n, brightness=1.0):
+        self._px = [(0, 0, 0)] * n
+
+    def __setitem__(self, i, v):
+        self._px[i] = v
+
+    def show(self):
+        pass
+
+# ------------------------------------------------------------
+# fake radio and recorded server
+# ------------------------------------------------------------
+
+injected = {}
+for _k, _r in RATES:
+    injected[_k] = 0
+rates = {}
+
+def chance(kind):
+    if random.random() < rates[kind]:
+        injected[kind] += 1
+        return True
+    return False
+
+wifi_up = False
+wifi_retries = 0
+
+class Radio:
+    TLS_MODE = 2
+
+    def __init__(self, *args):
+        pass
+
+    @property
+    def is_connected(self):
+        return wifi_up
+
+    def connect_AP(self, ssid, password):
+        global wifi_up, wifi_retries
+        clock.advance(1.5)
+        if wifi_retries:
+            wifi_retries -= 1
+            raise ConnectionError("No such ssid")
+        wifi_up = True
+
+    def reset(self):
+        global wifi_up
+        clock.advance(0.5)
+        wifi_up = False
+
+    def get_host_by_name(self, host):
+        clock.advance(0.05)
+        return "10.0.0.1"
+
+_hdr = bytearray(128)
+_req = bytearray(1024)
+
+class Source:
+    """One response: a header block, then a file or the 511 template."""
+
+    def __init__(self):
+        self.file = None
+        self.body = None  # memoryview for template bodies
+        self.hdr_len = self.hdr_pos = 0
+        self.left = 0
+        self.fail_at = -1  # body bytes left when the injected failure hits
+        self.fail = None
+
+def _put(buf, pos, s):
+    buf[pos:pos + len(s)] = s
+    return pos + len(s)
+
+def _put_int(buf, pos, v, width=0):
+    n = 1
+    while v >= 10 ** n:
+        n += 1
+    n = max(n, width)
+    for i in range(n - 1, -1, -1):
+        buf[pos + i] = 48 + v % 10
+        v //= 10
+    return pos + n
+
+def _header(status, length):
+    p = _put(_hdr, 0, b"HTTP/1.1 ")
+    p = _put_int(_hdr, p, status)
+    p = _put(_hdr, p, b" X\r\nContent-Type: application/json\r\nContent-Length: ")
+    p = _put_int(_hdr, p, length)
+    return _put(_hdr, p, b"\r\nConnection: close\r\n\r\n")
+
+class Socket:
+    def __init__(self, *args):
+        self.src = None
+
+    def settimeout(self, t):
+        self.timeout = t
+
+    def connect(self, addr, mode=None):
+        clock.advance(TLS_S if mode else CONNECT_S)
+        if not wifi_up:
+            raise OSError(113)  # EHOSTUNREACH
+        if chance("connect"):
+            if random.random() < 0.5:
+                raise RuntimeError("Failed to request hostname")
+            raise OSError(113)
+
+    def send(self, mv):
+        global wifi_up, wifi_retries
+        n = len(mv)
+        _req[0:n] = mv
+        self.src = server.open(_req, n)
+        if chance("wifi"):
+            wifi_up = False
+            wifi_retries = random.randint(0, 4)
+        return n
+
+    def recv_into(self, buf, nbytes=0):
+        s = self.src
+        n = nbytes or len(buf)
+        if s.hdr_pos < s.hdr_len:
+            n = min(n, s.hdr_len - s.hdr_pos)
+            buf[0:n] = _hdr_snap[s.hdr_pos:s.hdr_pos + n]
+            s.hdr_pos += n
+            return n
+        if s.fail == "stall" and s.left <= s.fail_at:
+            # the server goes quiet for good: every read waits out its timeout
+            clock.advance(self.timeout)
+            raise OSError(110)  # ETIMEDOUT
+        if s.fail is not None and s.left <= s.fail_at:
+            kind = s.fail
+            s.fail = None
+            if kind == "reset":
+                raise OSError(104)  # ECONNRESET
+            s.left = 0  # truncate: the server closes early
+        if s.left <= 0:
+            return 0
+        n = min(n, s.left)
+        if s.fail is not None and s.left - n < s.fail_at:
+            n = s.left - s.fail_at
+        if s.file is not None:
+            n = s.file.readinto(memoryview(buf)[0:n])
+        else:
+            buf[0:n] = s.body[0:n]
+            s.body = s.body[n:]
+        s.left -= n
+        clock.advance(n / LINK_BYTES_PER_S)
+        return n
+
+    def close(self):
+        if self.src is not None and self.src.file is not None:
+            self.src.file.close()
+        self.src = None
+
+_hdr_snap = memoryview(_hdr)
+
+class Server:
+    """Routes a request to a recorded file or the patched 511 template."""
+
+    def __init__(self, path):
+        self.dir = path
+        names = _os.listdir(path)
+        self.feeds = 0
+        while "feed_{:03d}.json".format(self.feeds) in names:
+            self.feeds += 1
+        self.details = set(n for n in names if n.startswith("d_"))
+        if not self.feeds or not self.details:
+            raise ValueError(path + ": no recorded feeds / details (soak.py record first)")
+        self.default_details = sorted(self.details)[0]
+        self.tpl = None
+        self.slots = []
+        self.bus_template()
+
+    def bus_template(self):
+        ts = "2000-01-01T00:00:00Z"
+        visits = []
+        for k in range(10):
+            visits.append(
+                '{"RecordedAtTime":"' + ts + '","MonitoredVehicleJourney":{"LineRef":"' +
+                ("1X" if k % 3 != 2 else "38R") + '","DirectionRef":"IB","FramedVehicleJourneyRef":'
+                '{"DataFrameRef":"2026-10-19","DatedVehicleJourneyRef":"1166' + str(k) + '"},'
+                '"PublishedLineName":"CALIFORNIA EXPRESS","OperatorRef":"SF","OriginRef":"13879",'
+                '"OriginName":"Drumm St & Clay St","DestinationRef":"13876","DestinationName":'
+                '"Fremont St & Mission St","Monitored":true,"VehicleLocation":{"Longitude":"-122.45",'
+                '"Latitude":"37.78"},"Bearing":"90.0","Occupancy":"seatsAvailable","VehicleRef":"85' +
+                str(k) + '","MonitoredCall":{"StopPointRef":"13876","StopPointName":"California St & '
+                'Presidio Ave","VehicleLocationAtStop":"","VehicleAtStop":"","DestinationDisplay":'
+                '"Financial District","AimedArrivalTime":"' + ts + '","ExpectedArrivalTime":"' + ts +
+                '","AimedDepartureTime":null,"ExpectedDepartureTime":null,"Distances":""}}}')
+        body = ('\ufeff{"ServiceDelivery":{"ResponseTimestamp":"' + ts + '","ProducerRef":"SF",'
+                '"Status":true,"StopMonitoringDelivery":{"version":"1.4","ResponseTimestamp":"' + ts +
+                '","Status":true,"MonitoredStopVisit":[' + ",".join(visits) + ']}}}').encode()
+        self.tpl = bytearray(body)
+        i = self.tpl.find(ts.encode())
+        while i != -1:
+            self.slots.append(i)
+            i = self.tpl.find(ts.encode(), i + 1)
+
+    def patch_bus(self):
+        """Stamp the template with now and arrivals every 10 minutes (+ jitter)."""
+        now = _epoch()
+        first = now - now % 600 + 600
+        put_iso(self.tpl, self.slots[0], now)
+        put_iso(self.tpl, self.slots[1], now)
+        for k in range(10):
+            at = first + k * 600 + random.randint(-90, 90)
+            for j in range(3):  # recorded, aimed, expected
+                put_iso(self.tpl, self.slots[2 + k * 3 + j], at if j else now)
+
+    def open(self, req, n):
+        s = Source()
+        status = 200
+        if chance("http500"):
+            status = 500
+        elif chance("http429"):
+            status = 429
+        if status != 200:
+            s.body = memoryview(b'{"error":"injected"}')
+            s.left = len(s.body)
+        elif req.find(b"StopMonitoring", 0, n) != -1:
+            self.patch_bus()
+            s.body = memoryview(self.tpl)
+            s.left = len(self.tpl)
+        else:
+            if req.find(b"/feed.js", 0, n) != -1:
+                i = _epoch() // SNAPSHOT_SECONDS % self.feeds
+                name = "feed_{:03d}.json".format(i)
+            else:
+                i = req.find(b"flight=", 0, n)
+                j = req.find(b" ", i, n)
+                name = "d_" + bytes(req[i + 7:j]).decode() + ".json"
+                if name not in self.details:
+                    name = self.default_details
+            path = self.dir + "/" + name
+            s.left = _os.stat(path)[6]
+            s.file = open(path, "rb")
+        s.hdr_len = _header(status, s.left)
+        if s.left > 64:
+            if chance("stall"):
+                s.fail = "stall"
+            elif chance("reset"):
+                s.fail = "reset"
+            elif chance("truncate"):
+                s.fail = "truncate"
+            s.fail_at = s.left // 2
+        return s
+
+def put_iso(buf, off, epoch):
+    """Write epoch as YYYY-MM-DDTHH:MM:SS in place (civil-from-days)."""
+    days = epoch // 86400
+    secs = epoch % 86400
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + 3 if mp < 10 else mp - 9
+    y = yoe + era * 400 + (1 if m <= 2 else 0)
+    _put_int(buf, off, y, 4)
+    _put_int(buf, off + 5, m, 2)
+    _put_int(buf, off + 8, d, 2)
+    _put_int(buf, off + 11, secs // 3600, 2)
+    _put_int(buf, off + 14, secs // 60 % 60, 2)
+    _put_int(buf, off + 17, secs % 60, 2)
+
+server = None
+
+# ------------------------------------------------------------
+# settings, print hook, module setup
+# ------------------------------------------------------------
+
+def load_settings(overrides):
+    """settings.toml as os.getenv sees it (unquoted numbers are ints)."""
+    env = {}
+    with open(ROOT + "/settings.toml") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] == "#" or "=" not in line:
+                continue
+            k, v = line.split("=", 1)
+            env[k.strip()] = _value(v.strip())
+    env["CIRCUITPY_WIFI_SSID"] = "soak"
+    env["API_KEY_511"] = "soak"
+    for kv in overrides:
+        k, v = kv.split("=", 1)
+        env[k] = _value(v)
+    return env
+
+def _value(v):
+    if v[:1] == '"':
+        return v[1:v.index('"', 1)]
+    try:
+        return int(v)
+    except ValueError:
+        return v
+
+tally = {}
+memory_errors = []
+verbose = False
+_print = print
+
+def soak_print(*args, **kwargs):
+    for a in args:
+        if isinstance(a, MemoryError):
+            memory_errors.append((clock.now, str(a)))
+            _print("SOAK,memory_error,{:.2f},{}".format(hours(), a))
+    if args and isinstance(args[0], str):
+        s = args[0]
+        for key in ("HTTP retry", "Flight search error", "Bus fetch error", "Top level error",
+                    "Watchdog timeout", "TIME SYNC ERROR", "MEM:", "error loading details",
+                    "could not connect"):
+            if s.startswith(key):
+                tally[key] = tally.get(key, 0) + 1
+    if verbose:
+        _print(*args, **kwargs)
+
+def hours():
+    return (clock.now - run_start) / 3600
+
+def install(env, nvm, reason):
+    """Fake every module code.py needs that the unix port doesn't have."""
+    t = copy_module(_time, "time")
+    t.sleep = _sleep
+    t.monotonic = _monotonic
+    t.time = _epoch
+    o = copy_module(_os, "os")
+    o.getenv = lambda k, d=None: env.get(k, d)
+    if not MICROPYTHON:
+        g = copy_module(gc, "gc")
+        g.collect = lambda: 0  # no real heap to compact; keep it fast
+        g.mem_free = lambda: 128 * 1024
+        g.mem_alloc = lambda: 0
+        import json as _json
+        j = copy_module(_json, "json")
+        j.loads = lambda s, _l=_json.loads: _l(bytes(s) if isinstance(s, memoryview) else s)
+
+    pins = _Pins()
+    b = new_module("board")
+    for name in ("MTX_ADDRA", "MTX_ADDRB", "MTX_ADDRC", "MTX_ADDRD", "MTX_ADDRE",
+                 "MTX_R1", "MTX_G1", "MTX_B1", "MTX_R2", "MTX_G2", "MTX_B2",
+                 "MTX_CLK", "MTX_LAT", "MTX_OE", "ESP_CS", "ESP_BUSY", "ESP_RESET",
+                 "SCK", "MOSI", "MISO", "NEOPIXEL", "BUTTON_UP", "BUTTON_DOWN"):
+        setattr(b, name, getattr(pins, name))
+    new_module("displayio", Bitmap=Bitmap, Palette=Palette, TileGrid=TileGrid, Group=Group,
+               release_displays=lambda: None)
+    new_module("framebufferio", FramebufferDisplay=Display)
+    new_module("rgbmatrix", RGBMatrix=Matrix)
+    new_module("terminalio", FONT=object())
+    new_module("vectorio", Rectangle=Layer)
+    new_module("adafruit_display_text", label=new_module("adafruit_display_text.label", Label=Label))
+    new_module("busio", SPI=lambda *a: None)
+    direction = _Obj()
+    direction.INPUT, direction.OUTPUT = 0, 1
+    pull = _Obj()
+    pull.UP, pull.DOWN = 1, 2
+    new_module("digitalio", DigitalInOut=DigitalInOut, Direction=direction, Pull=pull)
+    new_module("neopixel", NeoPixel=NeoPixel)
+
+    rr = _Obj()
+    for name in ("POWER_ON", "BROWNOUT", "SOFTWARE", "DEEP_SLEEP_ALARM",
+                 "RESET_PIN", "WATCHDOG", "UNKNOWN", "RESCUE_DEBUG"):
+        setattr(rr, name, name)
+    cpu = _Obj()
+    cpu.reset_reason = reason
+    new_module("microcontroller", nvm=nvm, cpu=cpu, ResetReason=rr, watchdog=wdt)
+    mode = _Obj()
+    mode.RAISE, mode.RESET = "RAISE", "RESET"
+
+    class WatchDogTimeout(Exception):
+        pass
+
+    new_module("watchdog", WatchDogMode=mode, WatchDogTimeout=WatchDogTimeout)
+    runtime = _Obj()
+    runtime.serial_bytes_available = 0
+    new_module("supervisor", runtime=runtime, ticks_ms=lambda: int(clock.now * 1000) & 0x1FFFFFFF)
+    pool = _Obj()
+    pool.AF_INET, pool.SOCK_STREAM = 2, 1
+    pool.socket = Socket
+    new_module("adafruit_esp32spi", adafruit_esp32spi=new_module(
+        "adafruit_esp32spi.adafruit_esp32spi", ESP_SPIcontrol=Radio))
+    new_module("adafruit_esp32spi.adafruit_esp32spi_socketpool", SocketPool=lambda radio: pool)
+
+def repo_modules():
+    return [n[:-3] for n in _os.listdir(ROOT) if n.endswith(".py") and n != "code.py"]
+
+def purge():
+    for name in repo_modules():
+        if name in sys.modules:
+            del sys.modules[name]
+
+# ------------------------------------------------------------
+# run
+# ------------------------------------------------------------
+
+class Stats:
+    def __init__(self):
+        self.requests = {}
+        self.total = 0
+        self.stall_max_ms = 0  # http_client: longest the idle hook was held off
+        self.slept = 0.0       # power.sleep() seconds, all boots
+        self.dark = 0          # power.idle_seconds(), all boots
+        self.nvm_writes = 0    # telemetry.nvm_writes, all boots
+        self.hour = []      # per hour: [mode counts, requests at start, free min, largest min]
+        self.samples = 0
+
+stats = Stats()
+
+def requests_now():
+    hc = sys.modules.get("http_client")
+    return stats.total + (hc.request_count if hc is not None else 0)
+
+def bank_requests():
+    """Add this boot's per-endpoint counts before its modules are dropped."""
+    hc = sys.modules.get("http_client")
+    tr = sys.modules.get("tracing")
+    pw = sys.modules.get("power")
+    tm = sys.modules.get("telemetry")
+    if tm is not None:
+        stats.nvm_writes += tm.nvm_writes
+    if pw is not None:
+        stats.slept += pw._slept_s + pw._slept_ms / 1000
+        stats.dark += pw.idle_seconds()
+    if hc is None or tr is None:
+        return
+    stats.total += hc.request_count
+    stats.stall_max_ms = max(stats.stall_max_ms, hc.stall_max_ms)
+    for i in range(1, len(tr.EP_NAMES)):
+        name = tr.EP_NAMES[i]
+        stats.requests[name] = stats.requests.get(name, 0) + hc.ep_requests[i]
+
+def sample():
+    ar = sys.modules.get("arena")
+    co = sys.modules.get("console")
+    gc.collect()
+    largest = ar.largest_free_block(PROBE_LIMIT) if ar is not None else 0
+    free = gc.mem_free() if MICROPYTHON else -1
+    h = int(hours())
+    while len(stats.hour) <= h:
+        stats.hour.append([{}, requests_now(), None, None])
+        if len(stats.hour) > 1:
+            report_hour(len(stats.hour) - 2)
+    row = stats.hour[h]
+    mode = co.current if co is not None else None
+    row[0][mode] = row[0].get(mode, 0) + 1
+    row[2] = free if row[2] is None else min(row[2], free)
+    row[3] = largest if row[3] is None else min(row[3], largest)
+
+def report_hour(h):
+    row = stats.hour[h]
+    nxt = stats.hour[h + 1][1] if h + 1 < len(stats.hour) else requests_now()
+    mode = "-"
+    best = 0
+    for m in row[0]:
+        if row[0][m] > best:
+            mode, best = m, row[0][m]
+    _print("SOAK,hour,{},{},{},{},{}".format(h, mode, nxt - row[1], row[2], row[3]))
+
+def on_event():
+    global press_pin, press_until
+    now = clock.now
+    if now >= next_sample[0]:
+        next_sample[0] = now + SAMPLE_SECONDS
+        sample()
+    if press_mean and now >= next_press[0]:
+        press_pin = "BUTTON_UP" if random.random() < 0.5 else "BUTTON_DOWN"
+        press_until = now + PRESS_SECONDS
+        next_press[0] = now - math.log(1.0 - random.random()) * press_mean
+    clock.next_event = min(next_sample[0], next_press[0] if press_mean else next_sample[0])
+
+next_sample = [0.0]
+next_press = [0.0]
+press_mean = 0
+
+def boot(src, env, nvm, reason):
+    install(env, nvm, reason)
+    g = {"__name__": "__main__"}
+    exec(src, g)
+
+def cmd_run(argv):
+    global server, start_epoch, run_start, verbose, press_mean
+    pos, o = options(argv, {"hours": 24.0, "start": "2026-10-19T13:00:00Z", "seed": 1,
+                            "errors": 1.0, "press_minutes": 20.0, "max_drop": 2048,
+                            "max_top_errors": 0, "max_nvm_per_day": 200.0, "verbose": False})
+    if len(pos) != 1:
+        usage()
+    random.seed(o["seed"])
+    verbose = o["verbose"]
+    for k, r in RATES:
+        rates[k] = r * o["errors"]
+    press_mean = o["press_minutes"] * 60
+    from timeutil import iso8601_to_epoch
+    start_epoch = iso8601_to_epoch(o["start"])
+    server = Server(pos[0])
+    env = load_settings(o["set"])
+    with open(ROOT + "/code.py") as f:
+        src = f.read()
+    import builtins
+    if not hasattr(builtins, "ConnectionError"):
+        builtins.ConnectionError = OSError  # unix port: CircuitPython has it
+    builtins.print = soak_print
+    nvm = bytearray(8192)
+
+    run_start = clock.now
+    clock.end = clock.now + o["hours"] * 3600
+    clock.on_event = on_event
+    next_sample[0] = clock.now
+    next_press[0] = clock.now + press_mean
+    clock.next_event = clock.now
+    wall = _time.time()
+    boots = 0
+    resets = []
+    crash = None
+    reason = "POWER_ON"
+    while True:
+        boots += 1
+        clock.dead = None
+        clock.last_feed = clock.now
+        try:
+            boot(src, env, nvm, reason)
+            crash = "code.py returned"
+        except SoakDone:
+            break
+        except SoakReset:
+            tm = sys.modules.get("telemetry")
+            phase = tm.PHASE_NAMES[tm.current_phase()] if tm is not None else "-"
+            _print("SOAK,watchdog,{:.2f},{}".format(hours(), phase))
+            resets.append((clock.now, phase))
+            reason = "WATCHDOG"
+            bank_requests()
+            purge()
+            gc.collect()
+            continue
+        except Exception as e:
+            crash = "{}: {}".format(type(e).__name__, e)
+            if isinstance(e, MemoryError):
+                memory_errors.append((clock.now, str(e)))
+        break
+    builtins.print = _print
+    clock.dead = None
+    clock.end = 1e30
+    if crash:
+        _print("SOAK,crash,{:.2f},{}".format(hours(), crash))
+    sample()
+    for h in range(len(stats.hour) - 1, len(stats.hour)):
+        report_hour(h)
+    bank_requests()
+    return report(o, boots, resets, crash, _time.time() - wall)
+
+def report(o, boots, resets, crash, wall):
+    h = hours()
+    _print("SOAK,summary,hours={:.1f},wall_s={:.1f},speedup={},boots={},watchdog={},memory_errors={},crash={},nvm_writes={}".format(
+        h, wall, int(h * 3600 / max(wall, 0.001)), boots, len(resets), len(memory_errors), int(bool(crash)),
+        stats.nvm_writes))
+    out = "SOAK,requests,total={},stall_max_ms={}".format(stats.total, stats.stall_max_ms)
+    for name in sorted(stats.requests):
+        out += ",{}={}".format(name, stats.requests[name])
+    _print(out)
+    up = max(clock.now - run_start, 0.001)
+    _print("SOAK,power,awake_pct={:.1f},dark_s={},requests_per_h={:.1f}".format(
+        100 * (up - stats.slept) / up, stats.dark, stats.total * 3600 / up))
+    out = "SOAK,injected"
+    for k, r in RATES:
+        out += ",{}={}".format(k, injected[k])
+    _print(out)
+    out = "SOAK,errors"
+    for k in sorted(tally):
+        out += ",{}={}".format(k.replace(" ", "_").rstrip(":"), tally[k])
+    _print(out)
+
+    # largest free block: least squares over the hourly minimums, skipping boot
+    pts = [(i, stats.hour[i][3]) for i in range(1, len(stats.hour)) if stats.hour[i][3] is not None]
+    drop = 0
+    if len(pts) >= 2:
+        n = len(pts)
+        mx = sum(p[0] for p in pts) / n
+        my = sum(p[1] for p in pts) / n
+        sxx = sum((p[0] - mx) ** 2 for p in pts)
+        slope = sum((p[0] - mx) * (p[1] - my) for p in pts) / sxx if sxx else 0
+        drop = pts[0][1] - pts[-1][1]
+        _print("SOAK,largest,first={},last={},min={},drop={},slope_per_day={}".format(
+            pts[0][1], pts[-1][1], min(p[1] for p in pts), drop, int(slope * 24)))
+    fails = []
+    if memory_errors:
+        fails.append("memory_error")
+    if resets:
+        fails.append("watchdog")
+    if crash:
+        fails.append("crash")
+    if tally.get("Top level error", 0) > o["max_top_errors"]:
+        fails.append("top_level_errors")
+    if stats.nvm_writes * 24 / max(h, 1.0) > o["max_nvm_per_day"]:
+        fails.append("nvm_writes")
+    if MICROPYTHON and drop > o["max_drop"]:
+        fails.append("largest_drop")
+    _print("SOAK,result," + ("ok" if not fails else "FAIL:" + "+".join(fails)))
+    return 1 if fails else 0
+
+def main():
+    if len(sys.argv) < 3:
+        usage()
+    if sys.argv[1] == "record":
+        return cmd_record(sys.argv[2:])
+    if sys.argv[1] == "run":
+        return cmd_run(sys.argv[2:])
+    usage()
+
+sys.exit(main())
@@ -0,0 +1,124 @@
+# ============================================================
+# trace_report.py
+# Host-side latency report for the TR,... span lines that
+# tracing.py prints when trace = "True" in settings.toml.
+#
+#   python3 tools/trace_report.py serial.log [more.log ...]
+#   python3 tools/trace_report.py --port COM5 --seconds 3600 --save serial.log
+#
+# Prints p50/p95/p99 per endpoint+phase and per phase, in ms.
+# --port needs pyserial (pip install pyserial).
+# ============================================================
+
+import argparse
+import math
+import sys
+
+PHASE_ORDER = ("dns", "connect", "tls", "ttfb", "body", "parse", "render")
+
+def parse_lines(lines):
+    """Yield (endpoint, phase, dur_ms) from TR lines, ignoring everything else."""
+    for line in lines:
+        line = line.strip()
+        # serial logs often carry timestamps/prefixes before the record
+        i = line.find("TR,")
+        if i == -1:
+            continue
+        parts = line[i:].split(",")
+        if len(parts) != 6:
+            continue
+        try:
+            yield parts[2], parts[3], int(parts[5])
+        except ValueError:
+            continue
+
+def percentile(sorted_vals, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+def _phase_key(phase):
+    return PHASE_ORDER.index(phase) if phase in PHASE_ORDER else len(PHASE_ORDER)
+
+def summarize(samples):
+    """samples: {key: [dur, ...]} -> list of (key, n, p50, p95, p99, max)."""
+    rows = []
+    for key, vals in samples.items():
+        vals = sorted(vals)
+        rows.append((key, len(vals), percentile(vals, 50), percentile(vals, 95),
+                     percentile(vals, 99), vals[-1]))
+    return rows
+
+def report(records, out=sys.stdout):
+    by_ep = {}
+    by_phase = {}
+    for ep, phase, dur in records:
+        by_ep.setdefault((ep, phase), []).append(dur)
+        by_phase.setdefault(phase, []).append(dur)
+
+    if not by_phase:
+        out.write("no TR lines found\n")
+        return
+
+    header = "{:<14} {:<8} {:>6} {:>7} {:>7} {:>7} {:>7}\n"
+    row = "{:<14} {:<8} {:>6} {:>7} {:>7} {:>7} {:>7}\n"
+    out.write("per endpoint (ms)\n")
+    out.write(header.format("endpoint", "phase", "n", "p50", "p95", "p99", "max"))
+    for (ep, phase), n, p50, p95, p99, mx in sorted(
+            summarize(by_ep), key=lambda r: (r[0][0], _phase_key(r[0][1]))):
+        out.write(row.format(ep, phase, n, p50, p95, p99, mx))
+
+    out.write("\nper phase, all endpoints (ms)\n")
+    out.write(header.format("", "phase", "n", "p50", "p95", "p99", "max"))
+    for phase, n, p50, p95, p99, mx in sorted(summarize(by_phase), key=lambda r: _phase_key(r[0])):
+        out.write(row.format("", phase, n, p50, p95, p99, mx))
+
+def read_serial(port, baud, seconds, save):
+    import time
+    import serial  # pyserial
+
+    lines = []
+    end = time.time() + seconds
+    with serial.Serial(port, baud, timeout=1) as ser:
+        log = open(save, "a") if save else None
+        try:
+            while time.time() < end:
+                raw = ser.readline()
+                if not raw:
+                    continue
+                line = raw.decode("utf-8", "replace")
+                if log:
+                    log.write(line)
+                lines.append(line)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if log:
+                log.close()
+    return lines
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="p50/p95/p99 latency report from TR span lines")
+    ap.add_argument("logs", nargs="*", help="serial log files (default: stdin)")
+    ap.add_argument("--port", help="read live from this serial port instead")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--seconds", type=float, default=600, help="how long to read --port")
+    ap.add_argument("--save", help="append the raw serial log here while reading --port")
+    args = ap.parse_args(argv)
+
+    if args.port:
+        lines = read_serial(args.port, args.baud, args.seconds, args.save)
+    elif args.logs:
+        lines = []
+        for path in args.logs:
+            with open(path, errors="replace") as f:
+                lines.extend(f.readlines())
+    else:
+        lines = sys.stdin.readlines()
+
+    report(list(parse_lines(lines)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# ============================================================
+# tracing.py
+# Fixed-size latency spans for network / parse / render phases
+#
+# - Spans live in a preallocated ring (no allocation per span)
+# - Times are supervisor.ticks_ms() (small ints, no long-int allocs)
+# - When enabled, each span is also printed as one CSV line:
+#     TR,<seq>,<endpoint>,<phase>,<start_ms>,<dur_ms>
+#   tools/trace_report.py turns a serial log into p50/p95/p99
+# ============================================================
+
+import time
+from array import array
+
+try:
+    from supervisor import ticks_ms
+except ImportError:
+    try:
+        from time import ticks_ms  # MicroPython unix port
+    except ImportError:
+        def ticks_ms():
+            return int(time.monotonic() * 1000) & _TICKS_MASK
+
+_TICKS_MASK = 0x1FFFFFFF
+RING_LEN = 64
+
+# endpoints
+EP_NONE = 0
+EP_FR24_FEED = 1
+EP_FR24_DETAILS = 2
+EP_511_STOP = 3
+EP_511_TIME = 4
+EP_ADSB_API = 5
+EP_LOCAL_FEED = 6
+EP_NAMES = ("none", "fr24_feed", "fr24_details", "511_stop", "511_time", "adsb_api", "local_feed")
+
+# phases
+PH_DNS = 0
+PH_CONNECT = 1
+PH_TLS = 2       # ESP32 firmware does TCP connect + TLS handshake in one call
+PH_TTFB = 3
+PH_BODY = 4
+PH_PARSE = 5
+PH_RENDER = 6
+PHASE_NAMES = ("dns", "connect", "tls", "ttfb", "body", "parse", "render")
+
+_ep = bytearray(RING_LEN)
+_ph = bytearray(RING_LEN)
+_start = array("L", [0] * RING_LEN)
+_dur = array("L", [0] * RING_LEN)
+_head = 0
+_count = 0
+seq = 0
+enabled = False
+
+def set_enabled(on):
+    global enabled
+    enabled = bool(on)
+
+def start():
+    return ticks_ms()
+
+def ticks_diff(end, begin):
+    """end - begin in ms (signed), across a ticks_ms() wrap."""
+    d = (end - begin) & _TICKS_MASK
+    return d - _TICKS_MASK - 1 if d > _TICKS_MASK >> 1 else d
+
+def ticks_add(t, ms):
+    return (t + ms) & _TICKS_MASK
+
+def span(ep, ph, t0):
+    """Record ep/ph from t0 until now; returns now so spans can be chained."""
+    global _head, _count, seq
+    now = ticks_ms()
+    dur = (now - t0) & _TICKS_MASK
+    i = _head
+    _ep[i] = ep
+    _ph[i] = ph
+    _start[i] = t0
+    _dur[i] = dur
+    _head = (i + 1) % RING_LEN
+    if _count < RING_LEN:
+        _count += 1
+    seq += 1
+    if enabled:
+        print("TR", seq, EP_NAMES[ep], PHASE_NAMES[ph], t0, dur, sep=",")
+    return now
+
+def dump():
+    """Print the spans still in the ring, oldest first."""
+    first = seq - _count + 1
+    for k in range(_count):
+        i = (_head - _count + k) % RING_LEN
+        print("TR", first + k, EP_NAMES[_ep[i]], PHASE_NAMES[_ph[i]], _start[i], _dur[i], sep=",")